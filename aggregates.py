@@ -0,0 +1,109 @@
+"""
+Streaming aggregations over transaction chunks
+
+These helpers sum amounts by month, category or type while reading the
+transactions chunk by chunk (see DataManager.iter_transactions). Only the
+running totals are kept between chunks, so summaries over very large
+histories run in memory bounded by the chunk size and the number of groups.
+"""
+
+import pandas as pd
+
+# Keys that amounts can be summed by
+AGGREGATE_KEYS = ('month', 'category', 'type')
+
+def _group_key(chunk, key):
+    """Get the values of a grouping key for a chunk
+    
+    Args:
+        chunk (DataFrame): Transactions
+        key (str): 'month' or a column name
+    
+    Returns:
+        Series: Key values, as plain strings for categorical columns
+    """
+    if key == 'month':
+        return chunk['date'].dt.strftime('%Y-%m').rename('month')
+    # Categories differ from chunk to chunk, so align on plain values
+    return chunk[key].astype(object)
+
+def sum_amounts(chunks, by):
+    """Sum the amounts of streamed transactions by one or more keys
+    
+    Args:
+        chunks (iterable): DataFrames with 'amount' and the key columns
+            ('date' for 'month')
+        by (list): Keys to group by, from AGGREGATE_KEYS
+    
+    Returns:
+        DataFrame: One row per group with the key columns and 'amount',
+            sorted by the keys
+    
+    Raises:
+        ValueError: If a key is not one of AGGREGATE_KEYS
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    for key in by:
+        if key not in AGGREGATE_KEYS:
+            raise ValueError(f"Cannot aggregate by '{key}'")
+    
+    totals = None
+    for chunk in chunks:
+        sums = chunk.groupby([_group_key(chunk, key) for key in by])['amount'].sum()
+        totals = sums if totals is None else totals.add(sums, fill_value=0)
+    
+    if totals is None:
+        return pd.DataFrame(columns=by + ['amount'])
+    
+    return totals.sort_index().rename('amount').reset_index()
+
+def _columns_for(by):
+    """List the columns needed to sum by the given keys"""
+    return ['amount'] + ['date' if key == 'month' else key for key in by]
+
+def sum_by_month(data_manager, chunk_size=None, **filters):
+    """Sum a user's transaction amounts by month and type
+    
+    Args:
+        data_manager (DataManager): Manager of the user's transactions
+        chunk_size (int): Rows per chunk (default: the manager's default)
+        **filters: Filters accepted by DataManager.iter_transactions
+    
+    Returns:
+        DataFrame: Columns 'month' (YYYY-MM), 'type' and 'amount'
+    """
+    return _sum_by(data_manager, ['month', 'type'], chunk_size, filters)
+
+def sum_by_category(data_manager, chunk_size=None, **filters):
+    """Sum a user's transaction amounts by category
+    
+    Args:
+        data_manager (DataManager): Manager of the user's transactions
+        chunk_size (int): Rows per chunk (default: the manager's default)
+        **filters: Filters accepted by DataManager.iter_transactions,
+            e.g. types=['expense']
+    
+    Returns:
+        DataFrame: Columns 'category' and 'amount'
+    """
+    return _sum_by(data_manager, ['category'], chunk_size, filters)
+
+def sum_by_type(data_manager, chunk_size=None, **filters):
+    """Sum a user's transaction amounts by type (income/expense)
+    
+    Args:
+        data_manager (DataManager): Manager of the user's transactions
+        chunk_size (int): Rows per chunk (default: the manager's default)
+        **filters: Filters accepted by DataManager.iter_transactions
+    
+    Returns:
+        DataFrame: Columns 'type' and 'amount'
+    """
+    return _sum_by(data_manager, ['type'], chunk_size, filters)
+
+def _sum_by(data_manager, by, chunk_size, filters):
+    """Stream a user's transactions and sum them by the given keys"""
+    if chunk_size is not None:
+        filters['chunk_size'] = chunk_size
+    chunks = data_manager.iter_transactions(columns=_columns_for(by), **filters)
+    return sum_amounts(chunks, by)
@@ -0,0 +1,273 @@
+"""
+Memory-mapped Arrow snapshots of parsed transactions shared across processes
+
+When the app runs several Streamlit server processes, each of them would
+parse and hold its own copy of the same user's transactions. With snapshots
+enabled (EROPIA_ARROW_SNAPSHOTS=1), the first process to read a version of
+a store writes the parsed frame once as an Arrow IPC file under
+`data/snapshots/`, named after the store's version number and signature.
+Every process then memory-maps that file and builds its DataFrame on top of
+the mapped buffers, so the pages are shared through the OS page cache
+instead of being copied into each process, and a cold read skips parsing
+entirely.
+
+Snapshots are immutable: a write to the store bumps its version, so the
+next read publishes a new file and lower versions of the same store are
+removed. A process that finishes reading an old version after a newer one
+was published leaves the newer snapshot alone. DataManager also keeps the
+last few versions a caller pinned with current_version() under
+`data/pinned/`, so any process can read them after newer writes. Frames handed out are
+copy-on-write views on pandas 3 (or with copy-on-write turned on) and full
+copies otherwise, so callers are free to modify them.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import pandas as pd
+from file_lock import atomic_write
+
+# Environment variable that turns shared Arrow snapshots on
+ARROW_SNAPSHOTS_ENV = "EROPIA_ARROW_SNAPSHOTS"
+
+def arrow_snapshots_enabled():
+    """Check whether shared Arrow snapshots are turned on
+    
+    Returns:
+        bool: True if EROPIA_ARROW_SNAPSHOTS is set to 1, true or yes
+    """
+    return os.getenv(ARROW_SNAPSHOTS_ENV, "").strip().lower() in ("1", "true", "yes")
+
+def _digest(value):
+    """Hash a store identity or signature into a file name
+    
+    Args:
+        value: Tuple of strings and numbers
+    
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha1(json.dumps(value, default=str).encode('utf-8')).hexdigest()
+
+def _copy_on_write():
+    """Check whether shallow copies of frames are copy-on-write
+    
+    Returns:
+        bool: True on pandas 3 or with pandas' copy_on_write mode turned on
+    """
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.get_option('mode.copy_on_write') is True
+
+def _version_of(name):
+    """Get the store version a snapshot file was published for
+    
+    Args:
+        name (str): Snapshot file name
+    
+    Returns:
+        int: Version number, or None if the name is not a snapshot's
+    """
+    number, _, rest = name.partition('-')
+    if not number.isdigit() or not rest.endswith('.arrow'):
+        return None
+    return int(number)
+
+class ArrowSnapshots:
+    """Directory of memory-mapped Arrow IPC snapshots, one per store version"""
+    
+    # Mapped frames shared by every instance in the process, by store directory
+    _mapped = {}
+    _lock = threading.Lock()
+    
+    def __init__(self, data_dir="data", name="snapshots", keep=1):
+        """Initialize the snapshot directory
+        
+        Args:
+            data_dir (str): Base directory for data storage
+            name (str): Name of the snapshot directory under data_dir
+            keep (int): Number of the newest versions of a store kept
+        
+        Raises:
+            ImportError: If pyarrow is not installed
+        """
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("Arrow snapshots require pyarrow (pip install pyarrow)")
+        
+        self.directory = os.path.join(data_dir, name)
+        self.keep = keep
+    
+    def get(self, identity, version, signature=None):
+        """Get the frame of a store version from its snapshot
+        
+        Args:
+            identity (tuple): Identifies the store (backend, location, user)
+            version (int): Version of the store (see versions.py)
+            signature (tuple): Signature of the store at that version
+                (default: any snapshot of the version)
+        
+        Returns:
+            DataFrame: A copy of the mapped frame the caller may modify, or
+                None if no snapshot of this version has been published
+        """
+        store = _digest(identity)
+        if signature is None:
+            path = self._find(store, version)
+            if path is None:
+                return None
+        else:
+            path = self._path(store, version, signature)
+        
+        with self._lock:
+            entry = self._mapped.get(os.path.dirname(path))
+            if entry is None or entry[0] != path:
+                try:
+                    df = self._map(path)
+                except FileNotFoundError:
+                    return None
+                entry = (path, df)
+                self._mapped[os.path.dirname(path)] = entry
+            df = entry[1]
+        
+        return self._copy(df)
+    
+    def publish(self, identity, version, signature, df):
+        """Write the frame of a store version as a snapshot and map it
+        
+        Nothing is written if this version or a newer one of the store has
+        already been published, as the frame is then out of date.
+        
+        Args:
+            identity (tuple): Identifies the store (backend, location, user)
+            version (int): Version of the store the frame was read at
+            signature (tuple): Signature of the store the frame was read at
+            df (DataFrame): Parsed transactions
+        
+        Returns:
+            DataFrame: A copy of the mapped frame the caller may modify, or
+                df itself if a newer version was published
+        """
+        import pyarrow as pa
+        
+        store = _digest(identity)
+        path = self._path(store, version, signature)
+        newest = self._newest(os.path.dirname(path))
+        if newest > version:
+            return df
+        if newest == version and os.path.exists(path):
+            published = self.get(identity, version, signature)
+            if published is not None:
+                return published
+        
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        with atomic_write(path, 'wb') as f:
+            with pa.ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+        
+        self._remove_older(path, version)
+        
+        mapped = self._map(path)
+        with self._lock:
+            self._mapped[os.path.dirname(path)] = (path, mapped)
+        return self._copy(mapped)
+    
+    def _path(self, store, version, signature):
+        """Get the snapshot path of a store version
+        
+        Args:
+            store (str): Digest of the store identity
+            version (int): Version of the store
+            signature (tuple): Signature of the store
+        
+        Returns:
+            str: Path of the Arrow IPC file
+        """
+        return os.path.join(self.directory, store, f"{version:012d}-{_digest(signature)}.arrow")
+    
+    def _find(self, store, version):
+        """Find a snapshot of a store version whatever its signature
+        
+        Args:
+            store (str): Digest of the store identity
+            version (int): Version of the store
+        
+        Returns:
+            str: Path of the Arrow IPC file, or None if there is none
+        """
+        directory = os.path.join(self.directory, store)
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return None
+        for name in names:
+            if _version_of(name) == version:
+                return os.path.join(directory, name)
+        return None
+    
+    def _copy(self, df):
+        """Copy a mapped frame for a caller
+        
+        Args:
+            df (DataFrame): Frame built on a mapped snapshot
+        
+        Returns:
+            DataFrame: A copy-on-write view where pandas supports it, or a
+                full copy so that changes never reach the shared frame
+        """
+        return df.copy(deep=not _copy_on_write())
+    
+    def _newest(self, directory):
+        """Get the newest version of a store with a published snapshot
+        
+        Args:
+            directory (str): Snapshot directory of the store
+        
+        Returns:
+            int: Version number, or -1 if nothing has been published
+        """
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return -1
+        versions = [_version_of(name) for name in names]
+        return max((version for version in versions if version is not None), default=-1)
+    
+    def _map(self, path):
+        """Memory-map a snapshot and build a DataFrame on its buffers
+        
+        Args:
+            path (str): Path of the Arrow IPC file
+        
+        Returns:
+            DataFrame: Frame whose numeric and string columns point into the
+                mapped file
+        """
+        import pyarrow as pa
+        
+        source = pa.memory_map(path, 'r')
+        table = pa.ipc.open_file(source).read_all()
+        # Keep every column in its own block so pandas does not copy to consolidate
+        return table.to_pandas(split_blocks=True)
+    
+    def _remove_older(self, path, version):
+        """Remove snapshots of the same store older than the versions kept
+        
+        Processes that still map an old file keep reading it until they
+        unmap it.
+        
+        Args:
+            path (str): Path of the newly published snapshot
+            version (int): Version of the newly published snapshot
+        """
+        directory = os.path.dirname(path)
+        for name in os.listdir(directory):
+            other = _version_of(name)
+            if other is None or other > version - self.keep:
+                continue
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,188 @@
+"""
+Platform-wide analytics over every user's transactions
+
+Finds every user with stored transactions (flat CSV files, or the stores of
+the configured backend), aggregates each user's history in a pool of worker
+processes and merges the small per-user partial results:
+
+- spend and income per category across all users, with the number of
+  transactions and of users contributing, and
+- income, expenses, transactions and active users per month.
+
+Each worker streams its user's transactions in chunks, so memory stays
+bounded by the chunk size whatever the size of a history, and users are
+independent, so the run scales with the number of cores.
+
+Usage:
+    python batch_analytics.py [--data-dir data] [--backend csv] [--workers N] [--output-dir reports]
+"""
+
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from data_manager import DataManager, DEFAULT_CHUNK_SIZE
+from storage import list_storage_users
+
+def _key(value):
+    """Convert a grouping value to a plain, picklable key
+    
+    Args:
+        value: Category, type or month as read
+    
+    Returns:
+        str: The value, or None if it is missing
+    """
+    return None if pd.isna(value) else str(value)
+
+def _accumulate(totals, sums):
+    """Add grouped sums and counts to running totals
+    
+    Args:
+        totals (dict): Key tuple -> [amount, count], updated in place
+        sums (DataFrame): Grouped 'sum' and 'count' of amounts
+    """
+    for key, (amount, count) in sums.iterrows():
+        entry = totals.setdefault(tuple(_key(value) for value in key), [0.0, 0])
+        entry[0] += float(amount)
+        entry[1] += int(count)
+
+def user_aggregates(username, data_dir="data", backend=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Aggregate one user's transactions
+    
+    Args:
+        username (str): Username (None for the shared store)
+        data_dir (str): Base directory for data storage
+        backend (str): Storage backend name (default: EROPIA_STORAGE_BACKEND or 'csv')
+        chunk_size (int): Rows per chunk
+    
+    Returns:
+        dict: 'categories' and 'months', mapping (category, type) and
+            (month, type) to [amount, count], or 'error' if the user's
+            store could not be read
+    """
+    partial = {'categories': {}, 'months': {}}
+    try:
+        data_manager = DataManager(username=username, data_dir=data_dir, backend=backend)
+        chunks = data_manager.iter_transactions(chunk_size=chunk_size, columns=['date', 'amount', 'type', 'category'])
+        for chunk in chunks:
+            chunk = chunk.assign(
+                # Periods are much cheaper than formatting every date; str() gives YYYY-MM
+                month=chunk['date'].dt.to_period('M'),
+                category=chunk['category'].astype(object),
+                type=chunk['type'].astype(object)
+            )
+            _accumulate(partial['categories'], chunk.groupby(['category', 'type'], dropna=False)['amount'].agg(['sum', 'count']))
+            _accumulate(partial['months'], chunk.groupby(['month', 'type'], dropna=False)['amount'].agg(['sum', 'count']))
+    except Exception as e:
+        print(f"Error aggregating transactions of {username or 'shared store'}: {e}")
+        return {'error': str(e)}
+    
+    return partial
+
+def merge_aggregates(partials):
+    """Merge per-user partial aggregates into platform-wide tables
+    
+    Args:
+        partials (iterable): Results of user_aggregates
+    
+    Returns:
+        dict: 'categories' DataFrame (category, type, amount, transactions,
+            users), 'months' DataFrame (month, income, expense,
+            transactions, active_users), and the number of 'users' and
+            'failed' users
+    """
+    categories = {}
+    months = {}
+    result = {'users': 0, 'failed': 0}
+    
+    for partial in partials:
+        if 'error' in partial:
+            result['failed'] += 1
+            continue
+        result['users'] += 1
+        
+        for key, (amount, count) in partial['categories'].items():
+            entry = categories.setdefault(key, [0.0, 0, 0])
+            entry[0] += amount
+            entry[1] += count
+            entry[2] += 1
+        
+        # A user is active in a month if they have any transaction in it
+        for month in {month for month, _ in partial['months']}:
+            entry = months.setdefault(month, {'income': 0.0, 'expense': 0.0, 'transactions': 0, 'active_users': 0})
+            entry['active_users'] += 1
+        for (month, kind), (amount, count) in partial['months'].items():
+            entry = months[month]
+            if kind in ('income', 'expense'):
+                entry[kind] += amount
+            entry['transactions'] += count
+    
+    result['categories'] = pd.DataFrame(
+        [[category, kind, round(amount, 2), count, users] for (category, kind), (amount, count, users) in categories.items()],
+        columns=['category', 'type', 'amount', 'transactions', 'users']
+    ).sort_values(['type', 'amount', 'category'], ascending=[True, False, True], ignore_index=True)
+    
+    result['months'] = pd.DataFrame(
+        [[month, round(entry['income'], 2), round(entry['expense'], 2), entry['transactions'], entry['active_users']]
+         for month, entry in months.items()],
+        columns=['month', 'income', 'expense', 'transactions', 'active_users']
+    ).sort_values('month', ignore_index=True)
+    
+    return result
+
+def run(data_dir="data", backend=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Aggregate every user's transactions in parallel
+    
+    Args:
+        data_dir (str): Base directory for data storage
+        backend (str): Storage backend name (default: EROPIA_STORAGE_BACKEND or 'csv')
+        workers (int): Number of worker processes (default: number of CPUs);
+            1 runs in this process
+        chunk_size (int): Rows per chunk
+    
+    Returns:
+        dict: Merged aggregates (see merge_aggregates)
+    """
+    users = list_storage_users(backend, data_dir)
+    workers = workers or os.cpu_count() or 1
+    
+    if workers == 1 or len(users) <= 1:
+        partials = [user_aggregates(username, data_dir, backend, chunk_size) for username in users]
+        return merge_aggregates(partials)
+    
+    count = len(users)
+    with ProcessPoolExecutor(max_workers=min(workers, count)) as executor:
+        partials = executor.map(
+            user_aggregates, users, [data_dir] * count, [backend] * count, [chunk_size] * count,
+            # Hand out several users per task so small stores do not pay a round trip each
+            chunksize=max(1, count // (workers * 4))
+        )
+        return merge_aggregates(partials)
+
+def main():
+    parser = argparse.ArgumentParser(description="Platform-wide transaction analytics across all users")
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--backend', help='Storage backend (default: EROPIA_STORAGE_BACKEND or csv)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--output-dir', help='Also write category_totals.csv and monthly_activity.csv here')
+    args = parser.parse_args()
+    
+    result = run(args.data_dir, args.backend, args.workers, args.chunk_size)
+    
+    print(f"Users: {result['users']} ({result['failed']} failed)")
+    print()
+    print("Spend and income per category")
+    print(result['categories'].to_string(index=False))
+    print()
+    print("Activity per month")
+    print(result['months'].to_string(index=False))
+    
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        result['categories'].to_csv(os.path.join(args.output_dir, 'category_totals.csv'), index=False)
+        result['months'].to_csv(os.path.join(args.output_dir, 'monthly_activity.csv'), index=False)
+
+if __name__ == "__main__":
+    main()
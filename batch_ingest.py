@@ -0,0 +1,289 @@
+"""
+Bulk statement import for many users at once
+
+Reads a directory of statements, one file per user named after them
+(`alice.txt`) or a directory per user holding any number of statements
+(`alice/2024.txt`, `alice/2025.txt`). Every statement is split into
+line-aligned chunks of about chunk_bytes, and the chunks are parsed and
+categorized in a pool of worker processes:
+
+- the format of each statement is detected once from its first lines
+  (see statement_parsers.detect_statement_format), as later chunks have no
+  header to detect it from,
+- each worker reads only its byte range of the file, parses it and
+  categorizes the transactions with the user's rules and merchant
+  corrections (see utils.categorize_series), and
+- results come back in statement and chunk order, with at most a few
+  chunks per worker in flight, and are stored in fixed-size
+  add_transactions batches per user. Before each batch is stored, the
+  user's classifier, trained once and kept across batches, replaces the
+  rule-based categories it is confident about (see
+  DataManager.apply_category_model). Each user's transactions are written
+  in the order of their statements, and importing the same statements
+  again skips them by receipt number.
+
+Parsing and the rules run on every core; the classifier's batch prediction
+and the writes stay in this process, with one DataManager per user.
+
+Usage:
+    python batch_ingest.py STATEMENTS_DIR [--data-dir data] [--backend csv] [--workers N] [--chunk-bytes 8388608]
+"""
+
+import os
+import argparse
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from data_manager import DataManager
+from merchant_memo import get_merchant_memo
+from statement_parsers import (
+    DETECT_SAMPLE_LINES, SimpleStatementParser, detect_statement_format, iter_statement, statement_lines
+)
+from utils import STATEMENT_BATCH_SIZE, categorize_series
+
+# About 80,000 lines of a full statement per chunk
+DEFAULT_CHUNK_BYTES = 8 * 1024 * 1024
+
+# Chunks per worker submitted ahead of the one being stored
+CHUNKS_IN_FLIGHT_PER_WORKER = 2
+
+def find_statements(statements_dir):
+    """List the statements of every user in a directory
+    
+    Args:
+        statements_dir (str): Directory with a statement file per user
+            (named after the user) or a directory of statements per user
+    
+    Returns:
+        list: (username, path) pairs, sorted by user and then by file name
+            (a user's directory before their statement file)
+    """
+    statements = []
+    for entry in sorted(os.listdir(statements_dir)):
+        if entry.startswith('.'):
+            continue
+        path = os.path.join(statements_dir, entry)
+        if os.path.isdir(path):
+            statements.extend(
+                (entry, os.path.join(path, name)) for name in sorted(os.listdir(path))
+                if not name.startswith('.') and os.path.isfile(os.path.join(path, name))
+            )
+        elif os.path.isfile(path):
+            statements.append((os.path.splitext(entry)[0], path))
+    
+    # Entry names put 'alice-x.txt' between 'alice/' and 'alice.txt'; the stable sort keeps each user's order
+    statements.sort(key=lambda statement: statement[0])
+    return statements
+
+def line_chunks(path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Split a file into byte ranges that start and end on line boundaries
+    
+    Args:
+        path (str): Path to the file
+        chunk_bytes (int): Approximate size of each range
+    
+    Returns:
+        list: (start, end) byte offsets covering the whole file
+    """
+    size = os.path.getsize(path)
+    starts = [0]
+    with open(path, 'rb') as f:
+        position = chunk_bytes
+        while position < size:
+            # Move the boundary to the start of the next line
+            f.seek(position)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            starts.append(position)
+            position += chunk_bytes
+    return list(zip(starts, starts[1:] + [size]))
+
+def statement_format(path):
+    """Detect the format of a statement file from its first lines
+    
+    Args:
+        path (str): Path to the statement
+    
+    Returns:
+        str: Format name, or None if no parser recognizes the statement
+    """
+    with open(path, 'rb') as f:
+        return detect_statement_format(islice(statement_lines(f), DETECT_SAMPLE_LINES))
+
+def parse_chunk(username, path, start, end, statement_format, data_dir="data"):
+    """Parse one chunk of a statement and categorize it with the user's rules
+    
+    Args:
+        username (str): Owner of the statement
+        path (str): Path to the statement
+        start (int): Offset of the first byte of the chunk
+        end (int): Offset just past the last byte of the chunk
+        statement_format (str): Format of the whole statement
+        data_dir (str): Base directory for data storage
+    
+    Returns:
+        dict: 'transactions' in statement order with their rule-based
+            category, or 'error' if the chunk could not be parsed
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        transactions = list(iter_statement(data, statement_format))
+        
+        if transactions:
+            descriptions = pd.Series([t['description'] for t in transactions], dtype=object)
+            categories = categorize_series(descriptions, username, get_merchant_memo(data_dir))
+            for transaction, category in zip(transactions, categories):
+                transaction['category'] = category
+    except Exception as e:
+        print(f"Error parsing {path} (bytes {start}-{end}): {e}")
+        return {'error': str(e)}
+    
+    return {'transactions': transactions}
+
+def _parse_task(task):
+    """Run parse_chunk on a task tuple (see run)"""
+    return parse_chunk(*task)
+
+def _map_in_order(executor, function, items, window):
+    """Map a function over items in a pool with a bounded number in flight
+    
+    Unlike Executor.map, which submits every item at once and holds on to
+    all results that are not consumed yet, at most window items are
+    submitted ahead of the result being consumed.
+    
+    Args:
+        executor (Executor): Pool to run the function in
+        function (callable): Function of one item
+        items (iterable): Items to map
+        window (int): Most items submitted and not yet consumed
+    
+    Yields:
+        Results in the order of the items
+    """
+    futures = deque()
+    for item in items:
+        if len(futures) >= window:
+            yield futures.popleft().result()
+        futures.append(executor.submit(function, item))
+    while futures:
+        yield futures.popleft().result()
+
+def _store(tasks, results, data_dir, backend, batch_size):
+    """Categorize parsed chunks and write them to each user's store in batches
+    
+    Args:
+        tasks (list): (username, path, ...) task tuples, in statement order
+            for each user
+        results (iterable): parse_chunk results in task order
+        data_dir (str): Base directory for data storage
+        backend (str): Storage backend name
+        batch_size (int): Transactions per bulk insert
+    
+    Returns:
+        DataFrame: Per-user counts (see run)
+    """
+    summary = {}
+    users = {}
+    
+    def write(username, batch):
+        data_manager = users[username]['data_manager']
+        # The workers applied the rules; the user's cached classifier refines the whole batch at once
+        categories = data_manager.apply_category_model(
+            pd.Series([t['description'] for t in batch], dtype=object),
+            pd.Series([t['category'] for t in batch], dtype=object)
+        )
+        for transaction, category in zip(batch, categories):
+            transaction['category'] = category
+        for key, count in data_manager.add_transactions(batch).items():
+            summary[username][key] += count
+    
+    for (username, path, *_), result in zip(tasks, results):
+        if username not in summary:
+            users[username] = {
+                'data_manager': DataManager(username=username, data_dir=data_dir, backend=backend), 'pending': []
+            }
+            summary[username] = {'user': username, 'statements': set(), 'chunks': 0, 'failed': 0,
+                                 'parsed': 0, 'inserted': 0, 'skipped': 0, 'rejected': 0}
+        entry = summary[username]
+        pending = users[username]['pending']
+        
+        entry['statements'].add(path)
+        entry['chunks'] += 1
+        if 'error' in result:
+            entry['failed'] += 1
+            continue
+        
+        entry['parsed'] += len(result['transactions'])
+        pending.extend(result['transactions'])
+        while len(pending) >= batch_size:
+            write(username, pending[:batch_size])
+            del pending[:batch_size]
+    
+    for username, user in users.items():
+        if user['pending']:
+            write(username, user['pending'])
+    
+    rows = [{**entry, 'statements': len(entry['statements'])} for entry in summary.values()]
+    return pd.DataFrame(rows, columns=['user', 'statements', 'chunks', 'failed', 'parsed', 'inserted', 'skipped', 'rejected'])
+
+def run(statements_dir, data_dir="data", backend=None, workers=None, chunk_bytes=DEFAULT_CHUNK_BYTES,
+        batch_size=STATEMENT_BATCH_SIZE):
+    """Import every user's statements, parsing them in parallel
+    
+    Args:
+        statements_dir (str): Directory of statements (see find_statements)
+        data_dir (str): Base directory for data storage
+        backend (str): Storage backend name (default: EROPIA_STORAGE_BACKEND or 'csv')
+        workers (int): Number of worker processes (default: number of CPUs);
+            1 runs in this process
+        chunk_bytes (int): Approximate size of the chunks statements are
+            split into
+        batch_size (int): Transactions per bulk insert
+    
+    Returns:
+        DataFrame: Per user, the number of 'statements', 'chunks' and
+            'failed' chunks and the 'parsed', 'inserted', 'skipped' and
+            'rejected' transactions
+    """
+    tasks = []
+    for username, path in find_statements(statements_dir):
+        # Unrecognized text goes to the simple parser, which finds nothing in it
+        fmt = statement_format(path) or SimpleStatementParser.name
+        tasks.extend(
+            (username, path, start, end, fmt, data_dir) for start, end in line_chunks(path, chunk_bytes)
+        )
+    workers = workers or os.cpu_count() or 1
+    
+    if workers == 1 or len(tasks) <= 1:
+        return _store(tasks, map(_parse_task, tasks), data_dir, backend, batch_size)
+    
+    workers = min(workers, len(tasks))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Results come back in task order, so each user's batches are written in statement order
+        results = _map_in_order(executor, _parse_task, tasks, workers * CHUNKS_IN_FLIGHT_PER_WORKER)
+        return _store(tasks, results, data_dir, backend, batch_size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Import every user's M-Pesa statements in parallel")
+    parser.add_argument('statements_dir', help='Directory with a statement file or directory per user')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--backend', help='Storage backend (default: EROPIA_STORAGE_BACKEND or csv)')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--chunk-bytes', type=int, default=DEFAULT_CHUNK_BYTES)
+    parser.add_argument('--batch-size', type=int, default=STATEMENT_BATCH_SIZE)
+    args = parser.parse_args()
+    
+    summary = run(args.statements_dir, args.data_dir, args.backend, args.workers, args.chunk_bytes, args.batch_size)
+    
+    print(summary.to_string(index=False))
+    print()
+    print(f"Users: {len(summary)}, inserted: {summary['inserted'].sum()}, skipped: {summary['skipped'].sum()}, "
+          f"failed chunks: {summary['failed'].sum()}")
+
+if __name__ == "__main__":
+    main()
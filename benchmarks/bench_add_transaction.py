@@ -0,0 +1,83 @@
+"""
+Benchmark for DataManager.add_transaction insert latency.
+
+Builds transaction files of increasing size and measures how long a single
+insert takes on each of them. With the append-only write path the latency
+should stay flat as the history grows.
+
+Usage:
+    python benchmarks/bench_add_transaction.py [--sizes 1000 10000 100000 1000000]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+
+def build_history(file_path, rows):
+    """Write a synthetic transaction history with the given number of rows
+    
+    Args:
+        file_path (str): Destination CSV file
+        rows (int): Number of rows to generate
+    """
+    start = date(2020, 1, 1)
+    with open(file_path, 'w') as f:
+        f.write("date,description,amount,type,category,source,user_id\n")
+        for i in range(rows):
+            day = start + timedelta(days=i % 1800)
+            f.write(f"{day.isoformat()},M-PESA Payment to Merchant {i % 500},{(i % 9000) + 10}.0,expense,Other,mpesa,bench\n")
+
+def time_inserts(data_manager, inserts):
+    """Time a number of single-row inserts
+    
+    Args:
+        data_manager (DataManager): Manager to insert into
+        inserts (int): Number of inserts to time
+        
+    Returns:
+        list: Latency of each insert in milliseconds
+    """
+    latencies = []
+    for i in range(inserts):
+        transaction = {
+            'date': date(2025, 4, 1),
+            'description': f'Benchmark insert {i}',
+            'amount': 100.0,
+            'type': 'expense',
+            'category': 'Other',
+            'source': 'manual'
+        }
+        start = time.perf_counter()
+        data_manager.add_transaction(transaction)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--inserts', type=int, default=50)
+    args = parser.parse_args()
+    
+    print(f"{'rows':>10} {'median ms':>10} {'p95 ms':>10}")
+    for size in args.sizes:
+        temp_dir = tempfile.mkdtemp()
+        try:
+            data_manager = DataManager(username='bench', data_dir=temp_dir)
+            build_history(data_manager.file_path, size)
+            latencies = sorted(time_inserts(data_manager, args.inserts))
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{size:>10} {statistics.median(latencies):>10.3f} {p95:>10.3f}")
+        finally:
+            shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    main()
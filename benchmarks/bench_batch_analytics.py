@@ -0,0 +1,70 @@
+"""
+Benchmark for the multi-user batch analytics engine.
+
+Writes flat CSV histories for a number of synthetic users, then runs
+batch_analytics.run with an increasing number of worker processes and
+reports the wall time and the speedup over a single process.
+
+Usage:
+    python benchmarks/bench_batch_analytics.py [--users 64] [--rows 20000] [--workers 1 2 4 8]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_analytics import run
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Rent', 'Entertainment', 'Shopping', 'Health', 'Other']
+
+def build_users(data_dir, users, rows):
+    """Write a synthetic transaction history for each user
+    
+    Args:
+        data_dir (str): Data directory to write the CSV files to
+        users (int): Number of users
+        rows (int): Number of rows per user
+    """
+    start = date(2020, 1, 1)
+    for user in range(users):
+        username = f"user{user:04d}"
+        with open(os.path.join(data_dir, f"transactions_{username}.csv"), 'w') as f:
+            f.write("date,description,amount,type,category,source,user_id,transaction_id\n")
+            for i in range(rows):
+                day = start + timedelta(days=(i + user) % 1800)
+                kind = 'income' if i % 10 == 0 else 'expense'
+                f.write(
+                    f"{day.isoformat()},M-PESA Payment to Merchant {i % 500},{(i % 9000) + 10}.5,"
+                    f"{kind},{CATEGORIES[(i + user) % len(CATEGORIES)]},mpesa,{username},TX{user:04d}{i:09d}\n"
+                )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=64)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        build_users(temp_dir, args.users, args.rows)
+        
+        print(f"{'workers':>8} {'seconds':>10} {'speedup':>8} {'users':>6}")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            result = run(temp_dir, 'csv', workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>10.2f} {baseline / elapsed:>8.2f} {result['users']:>6}")
+    finally:
+        shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    main()
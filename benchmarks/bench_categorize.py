@@ -0,0 +1,95 @@
+"""
+Benchmark for transaction categorization.
+
+Generates M-Pesa style descriptions, a mix of ones that match a category
+early, late or not at all, and times categorizing all of them with the
+compiled keyword matcher against checking the keyword tables one category
+at a time, as categorize_transaction used to.
+
+Usage:
+    python benchmarks/bench_categorize.py [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import CATEGORY_KEYWORDS, categorize_transaction
+
+TEMPLATES = [
+    'M-PESA Payment to {merchant} Ref {ref}',
+    'Customer Transfer to {merchant} {ref}',
+    'Merchant Payment {merchant} Till {ref}',
+    'Pay Bill Online {merchant} Acc {ref}',
+]
+
+MERCHANTS = [
+    'Naivas Supermarket', 'Java House', 'Uber BV', 'Bolt Taxi', 'KPLC Prepaid', 'Nairobi Water',
+    'Safaricom Airtime', 'Zuku Internet', 'Century Cinemax', 'Aga Khan Hospital', 'Strathmore University',
+    'Jumia Kenya', 'Kenya Airways Flight', 'John Kamau', 'Mary Wanjiku', 'Equity Bank', 'Sacco Ltd',
+]
+
+def categorize_sequential(description):
+    """Categorize by scanning each category's keywords in turn
+    
+    Args:
+        description (str): Transaction description
+    
+    Returns:
+        str: Assigned category
+    """
+    description = description.lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in description for keyword in keywords):
+            return category
+    return 'Other'
+
+def build_descriptions(count):
+    """Generate synthetic transaction descriptions
+    
+    Args:
+        count (int): Number of descriptions
+    
+    Returns:
+        list: Descriptions
+    """
+    rng = random.Random(42)
+    return [
+        rng.choice(TEMPLATES).format(merchant=rng.choice(MERCHANTS), ref=f"{rng.randrange(10 ** 9):09d}")
+        for _ in range(count)
+    ]
+
+def time_categorize(function, descriptions):
+    """Time categorizing every description
+    
+    Args:
+        function (callable): Categorizer
+        descriptions (list): Descriptions
+    
+    Returns:
+        tuple: Elapsed seconds and the categories assigned
+    """
+    start = time.perf_counter()
+    categories = [function(description) for description in descriptions]
+    return time.perf_counter() - start, categories
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+    
+    print(f"{'rows':>10} {'sequential s':>13} {'compiled s':>11} {'speedup':>8}")
+    for size in args.sizes:
+        descriptions = build_descriptions(size)
+        sequential, expected = time_categorize(categorize_sequential, descriptions)
+        compiled, categories = time_categorize(categorize_transaction, descriptions)
+        if categories != expected:
+            raise SystemExit("Compiled matcher disagrees with the sequential keyword scan")
+        print(f"{size:>10} {sequential:>13.2f} {compiled:>11.2f} {sequential / compiled:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark for the local category classifier.
+
+Generates a labeled M-Pesa style history of merchants the built-in rules
+mostly do not know, trains the naive Bayes classifier on it and times
+training and batch prediction over the whole history, along with the
+accuracy on freshly generated descriptions.
+
+Usage:
+    python benchmarks/bench_classifier.py [--sizes 10000 50000 100000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from category_classifier import NaiveBayesCategorizer
+
+TEMPLATES = [
+    'M-PESA Payment to {merchant} Ref {ref}',
+    'Customer Transfer to {merchant} {ref}',
+    'Merchant Payment {merchant} Till {ref}',
+    'Pay Bill Online {merchant} Acc {ref}',
+]
+
+MERCHANTS = {
+    'Groceries': ['Mama Mboga Stall', 'Naivas Supermarket', 'Quickmart Kilimani', 'Kwa Njoro Butchery'],
+    'Transport': ['Matatu Sacco 46', 'Bolt Taxi', 'Uber BV', 'Rubis Petrol Station'],
+    'Home': ['Kamau Hardware', 'Hotpoint Appliances', 'Gikomba Furniture'],
+    'Personal care': ['Wanjiku Salon', 'Barber Shop Ngara', 'Goodlife Pharmacy'],
+    'Education': ['Otieno Tuition', 'Strathmore University', 'Text Book Centre'],
+    'Family': ['John Kamau', 'Mary Wanjiku', 'Grace Achieng'],
+}
+
+def build_history(count, seed=42):
+    """Generate labeled synthetic transaction descriptions
+    
+    Args:
+        count (int): Number of descriptions
+        seed (int): Random seed
+    
+    Returns:
+        DataFrame: 'description' and 'category' columns
+    """
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        category = rng.choice(list(MERCHANTS))
+        description = rng.choice(TEMPLATES).format(
+            merchant=rng.choice(MERCHANTS[category]), ref=f"{rng.randrange(10 ** 9):09d}"
+        )
+        rows.append((description, category))
+    return pd.DataFrame(rows, columns=['description', 'category'])
+
+def best_of(function, repeat=3):
+    """Time a function, keeping the fastest of several runs
+    
+    Args:
+        function (callable): Function to time
+        repeat (int): Number of runs
+    
+    Returns:
+        tuple: Fastest elapsed milliseconds and the function's result
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 100000])
+    args = parser.parse_args()
+    
+    print(f"{'rows':>10} {'train ms':>9} {'predict ms':>11} {'accuracy':>9}")
+    for size in args.sizes:
+        history = build_history(size)
+        train_ms, model = best_of(lambda: NaiveBayesCategorizer().fit(history['description'], history['category']))
+        predict_ms, _ = best_of(lambda: model.predict(history['description']))
+        
+        unseen = build_history(size, seed=7)
+        labels, _ = model.predict(unseen['description'])
+        accuracy = np.mean(labels == unseen['category'].to_numpy(dtype=object))
+        print(f"{size:>10} {train_ms:>9.1f} {predict_ms:>11.1f} {accuracy:>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark for concurrent transaction writers.
+
+Starts a number of processes that insert into, and re-categorize rows of,
+the same user's transaction store at once, and reports the total write
+throughput. Writers are serialized by the store's file lock, so the row
+count at the end must always equal the number of inserts.
+
+Usage:
+    python benchmarks/bench_concurrent_writes.py [--processes 1 2 4 8] [--backend csv]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+
+def writer(data_dir, backend, worker, writes):
+    """Insert transactions and re-categorize every other one
+    
+    Args:
+        data_dir (str): Data directory shared by all writers
+        backend (str): Storage backend name
+        worker (int): Number of this writer
+        writes (int): Number of inserts to make
+    """
+    data_manager = DataManager(username='bench', data_dir=data_dir, backend=backend)
+    for i in range(writes):
+        transaction_id = f'w{worker}-{i}'
+        data_manager.add_transaction({
+            'date': date(2025, 4, 1 + i % 28),
+            'description': f'Writer {worker} insert {i}',
+            'amount': 100.0,
+            'type': 'expense',
+            'category': 'Other',
+            'source': 'manual',
+            'transaction_id': transaction_id
+        })
+        if i % 2:
+            data_manager.update_transaction_category(transaction_id, 'Food')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--writes', type=int, default=100)
+    parser.add_argument('--backend', default='csv')
+    args = parser.parse_args()
+    
+    context = multiprocessing.get_context('spawn')
+    print(f"{'processes':>10} {'writes/s':>10} {'rows':>10} {'expected':>10}")
+    for count in args.processes:
+        temp_dir = tempfile.mkdtemp()
+        try:
+            DataManager(username='bench', data_dir=temp_dir, backend=args.backend)
+            processes = [
+                context.Process(target=writer, args=(temp_dir, args.backend, worker, args.writes))
+                for worker in range(count)
+            ]
+            start = time.perf_counter()
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            elapsed = time.perf_counter() - start
+            
+            rows = len(DataManager(username='bench', data_dir=temp_dir, backend=args.backend).get_transactions())
+            writes = count * (args.writes + args.writes // 2)
+            print(f"{count:>10} {writes / elapsed:>10.1f} {rows:>10} {count * args.writes:>10}")
+        finally:
+            shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    main()
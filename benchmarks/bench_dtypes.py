@@ -0,0 +1,92 @@
+"""
+Benchmark for the compact transaction schema.
+
+Builds synthetic transaction histories of increasing size and compares the
+frame as parsed from CSV with the same frame after apply_transaction_schema:
+memory used and the time of the groupbys the dashboard charts run.
+
+Usage:
+    python benchmarks/bench_dtypes.py [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import apply_transaction_schema
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Rent', 'Entertainment', 'Shopping', 'Health', 'Other']
+
+def build_frame(rows):
+    """Parse a synthetic transaction history the way the CSV backend does
+    
+    Args:
+        rows (int): Number of rows to generate
+    
+    Returns:
+        DataFrame: Parsed transactions with a datetime 'date' column
+    """
+    start = date(2020, 1, 1)
+    buffer = io.StringIO()
+    buffer.write("date,description,amount,type,category,source,user_id,transaction_id\n")
+    for i in range(rows):
+        day = start + timedelta(days=i % 1800)
+        kind = 'income' if i % 10 == 0 else 'expense'
+        buffer.write(
+            f"{day.isoformat()},M-PESA Payment to Merchant {i % 500},{(i % 9000) + 10}.5,"
+            f"{kind},{CATEGORIES[i % len(CATEGORIES)]},mpesa,bench,TX{i:09d}\n"
+        )
+    buffer.seek(0)
+    df = pd.read_csv(buffer)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def time_groupbys(df, repeats):
+    """Time the groupbys run by the dashboard charts
+    
+    Args:
+        df (DataFrame): Transactions
+        repeats (int): Number of timed runs
+    
+    Returns:
+        float: Median time of one round of groupbys in milliseconds
+    """
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        expenses = df[df['type'] == 'expense']
+        expenses.groupby('category', observed=True)['amount'].sum()
+        month = df['date'].dt.to_period('M')
+        expenses.groupby([month[expenses.index], 'category'], observed=True)['amount'].sum()
+        df.groupby([month, 'type'], observed=True)['amount'].sum()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+    
+    print(f"{'rows':>10} {'raw MB':>10} {'compact MB':>11} {'raw groupby ms':>15} {'compact groupby ms':>19}")
+    for size in args.sizes:
+        raw = build_frame(size)
+        compact = apply_transaction_schema(raw.copy())
+        
+        raw_mb = raw.memory_usage(deep=True).sum() / 1024 / 1024
+        compact_mb = compact.memory_usage(deep=True).sum() / 1024 / 1024
+        print(
+            f"{size:>10} {raw_mb:>10.1f} {compact_mb:>11.1f} "
+            f"{time_groupbys(raw, args.repeats):>15.1f} {time_groupbys(compact, args.repeats):>19.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark for shared Arrow snapshots of user data.
+
+Builds a synthetic transaction history, then starts fresh worker processes
+that each read it once, the way a newly started Streamlit server process
+would: first by parsing the store, then by mapping the published Arrow
+snapshot. Reports the cold read latency and the private (anonymous) memory
+each worker gained holding the frame. Mapped snapshot pages are shared
+through the page cache, so they do not count as private memory.
+
+Usage:
+    python benchmarks/bench_snapshots.py [--sizes 10000 100000 1000000] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from arrow_snapshot import ARROW_SNAPSHOTS_ENV
+from data_manager import DataManager
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Rent', 'Entertainment', 'Shopping', 'Health', 'Other']
+
+def build_history(file_path, rows):
+    """Write a synthetic transaction history with the given number of rows
+    
+    Args:
+        file_path (str): Destination CSV file
+        rows (int): Number of rows to generate
+    """
+    start = date(2020, 1, 1)
+    with open(file_path, 'w') as f:
+        f.write("date,description,amount,type,category,source,user_id,transaction_id\n")
+        for i in range(rows):
+            day = start + timedelta(days=i % 1800)
+            kind = 'income' if i % 10 == 0 else 'expense'
+            f.write(
+                f"{day.isoformat()},M-PESA Payment to Merchant {i % 500},{(i % 9000) + 10}.5,"
+                f"{kind},{CATEGORIES[i % len(CATEGORIES)]},mpesa,bench,TX{i:09d}\n"
+            )
+
+def private_memory_kb():
+    """Get the anonymous (unshared) resident memory of this process
+    
+    Returns:
+        int: RssAnon in kB
+    """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('RssAnon:'):
+                return int(line.split()[1])
+    return 0
+
+def reader(data_dir, snapshots, results):
+    """Read the user's transactions once in a fresh process
+    
+    Args:
+        data_dir (str): Data directory holding the store
+        snapshots (bool): Turn Arrow snapshots on
+        results (Queue): Receives (latency ms, private memory gained in MB)
+    """
+    if snapshots:
+        os.environ[ARROW_SNAPSHOTS_ENV] = '1'
+    else:
+        os.environ.pop(ARROW_SNAPSHOTS_ENV, None)
+    
+    data_manager = DataManager(username='bench', data_dir=data_dir)
+    before = private_memory_kb()
+    start = time.perf_counter()
+    df = data_manager.get_transactions()
+    elapsed = (time.perf_counter() - start) * 1000
+    gained = (private_memory_kb() - before) / 1024
+    results.put((elapsed, gained, len(df)))
+
+def run_workers(context, data_dir, snapshots, workers):
+    """Run reader processes one after the other
+    
+    Args:
+        context: multiprocessing context
+        data_dir (str): Data directory holding the store
+        snapshots (bool): Turn Arrow snapshots on
+        workers (int): Number of reader processes
+    
+    Returns:
+        tuple: Median latency in ms and median private memory gained in MB
+    """
+    results = context.Queue()
+    latencies, memory = [], []
+    for _ in range(workers):
+        process = context.Process(target=reader, args=(data_dir, snapshots, results))
+        process.start()
+        elapsed, gained, _ = results.get()
+        process.join()
+        latencies.append(elapsed)
+        memory.append(gained)
+    return statistics.median(latencies), statistics.median(memory)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+    
+    context = multiprocessing.get_context('spawn')
+    print(f"{'rows':>10} {'parse ms':>10} {'parse MB':>10} {'snapshot ms':>12} {'snapshot MB':>12}")
+    for size in args.sizes:
+        temp_dir = tempfile.mkdtemp()
+        try:
+            build_history(os.path.join(temp_dir, 'transactions_bench.csv'), size)
+            parse_ms, parse_mb = run_workers(context, temp_dir, False, args.workers)
+            
+            # Publish the snapshot, then measure workers that only map it
+            run_workers(context, temp_dir, True, 1)
+            snapshot_ms, snapshot_mb = run_workers(context, temp_dir, True, args.workers)
+            print(f"{size:>10} {parse_ms:>10.1f} {parse_mb:>10.1f} {snapshot_ms:>12.1f} {snapshot_mb:>12.1f}")
+        finally:
+            shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark for statement parsing.
+
+Generates synthetic statements in every registered format (full Safaricom
+statement text, forwarded confirmation SMS and the simple layout) and times
+detecting the format and parsing every line, reporting lines per second.
+
+Usage:
+    python benchmarks/bench_statement_parsers.py [--lines 100000] [--repeat 3]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from statement_parsers import iter_statement
+
+# Merchants by till number and people by phone number, as they recur in a real statement
+MERCHANTS = {
+    '512345': 'NAIVAS SUPERMARKET', '888880': 'KPLC PREPAID', '730021': 'JAVA HOUSE',
+    '444400': 'NAIROBI WATER', '320320': 'ZUKU INTERNET', '909090': 'BOLT KENYA',
+}
+PEOPLE = {
+    '254712345678': 'JOHN DOE', '254722000111': 'MARY WANJIKU',
+    '254733555999': 'GRACE ACHIENG', '254700123123': 'PETER OTIENO',
+}
+
+def receipt(rng):
+    """Generate an M-PESA receipt number
+    
+    Args:
+        rng (Random): Random generator
+    
+    Returns:
+        str: Ten uppercase letters and digits
+    """
+    return ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') for _ in range(10))
+
+def statement_line(rng, when, balance):
+    """Generate one line of a full statement export"""
+    amount = rng.randrange(50, 20000)
+    if rng.random() < 0.2:
+        phone = rng.choice(list(PEOPLE))
+        details = f"Funds received from - {phone} {PEOPLE[phone]}"
+        columns = f"{amount:,.2f} 0.00"
+    else:
+        till = rng.choice(list(MERCHANTS))
+        details = f"Merchant Payment to {till} - {MERCHANTS[till]}"
+        columns = f"0.00 -{amount:,.2f}"
+    return f"{receipt(rng)} {when:%Y-%m-%d %H:%M:%S} {details} Completed {columns} {balance:,.2f}\n"
+
+def sms_line(rng, when, balance):
+    """Generate one forwarded confirmation message"""
+    amount = rng.randrange(50, 20000)
+    stamp = f"on {when.day}/{when.month}/{when:%y} at {when:%I:%M %p}".replace(' 0', ' ')
+    if rng.random() < 0.2:
+        phone = rng.choice(list(PEOPLE))
+        return (f"{receipt(rng)} Confirmed.You have received Ksh{amount:,.2f} from {PEOPLE[phone]} "
+                f"{phone} {stamp} New M-PESA balance is Ksh{balance:,.2f}.\n")
+    return (f"{receipt(rng)} Confirmed. Ksh{amount:,.2f} paid to {rng.choice(list(MERCHANTS.values()))}. {stamp}.New M-PESA "
+            f"balance is Ksh{balance:,.2f}. Transaction cost, Ksh0.00.\n")
+
+def simple_line(rng, when, balance):
+    """Generate one line of the simple layout"""
+    kind = 'credit' if rng.random() < 0.2 else 'debit'
+    return f"{when:%d/%m/%Y} MPESA Payment to {rng.choice(list(MERCHANTS.values())).title()} {rng.randrange(50, 20000):,}.00 {kind}\n"
+
+FORMATS = {'statement': statement_line, 'sms': sms_line, 'simple': simple_line}
+
+def build_statement(line_function, count, seed=42):
+    """Generate a synthetic statement
+    
+    Args:
+        line_function (callable): Generates one line
+        count (int): Number of lines
+        seed (int): Random seed
+    
+    Returns:
+        str: The statement text
+    """
+    rng = random.Random(seed)
+    start = datetime(2022, 1, 1, 8, 0, 0)
+    return ''.join(
+        line_function(rng, start + timedelta(minutes=37 * i), rng.randrange(100, 100000) + 0.5)
+        for i in range(count)
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    print(f"{'format':>10} {'lines':>8} {'parsed':>8} {'seconds':>8} {'lines/s':>10}")
+    for name, line_function in FORMATS.items():
+        text = build_statement(line_function, args.lines)
+        # Keep the fastest of a few runs, as other load on the machine only adds time
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            parsed = sum(1 for _ in iter_statement(text))
+            timings.append(time.perf_counter() - start)
+        elapsed = min(timings)
+        if parsed != args.lines:
+            raise SystemExit(f"Parsed {parsed} of {args.lines} {name} lines")
+        print(f"{name:>10} {args.lines:>8} {parsed:>8} {elapsed:>8.2f} {args.lines / elapsed:>10.0f}")
+
+if __name__ == "__main__":
+    main()
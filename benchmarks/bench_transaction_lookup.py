@@ -0,0 +1,77 @@
+"""
+Benchmark for DataManager point operations by transaction id.
+
+Builds transaction files of increasing size and measures lookups through the
+persistent id -> offset index and category updates through the journal. Both
+latencies should stay flat as the history grows; the first lookup includes
+building the index.
+
+Usage:
+    python benchmarks/bench_transaction_lookup.py [--sizes 1000 10000 100000 1000000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+
+def build_history(file_path, rows):
+    """Write a synthetic transaction history with ids
+    
+    Args:
+        file_path (str): Destination CSV file
+        rows (int): Number of rows to generate
+    """
+    start = date(2020, 1, 1)
+    with open(file_path, 'w') as f:
+        f.write("date,description,amount,type,category,source,user_id,transaction_id\n")
+        for i in range(rows):
+            day = start + timedelta(days=i % 1800)
+            f.write(f"{day.isoformat()},M-PESA Payment to Merchant {i % 500},{(i % 9000) + 10}.0,expense,Other,mpesa,bench,TX{i:09d}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+    
+    print(f"{'rows':>10} {'index build ms':>15} {'lookup median ms':>17} {'update median ms':>17}")
+    for size in args.sizes:
+        temp_dir = tempfile.mkdtemp()
+        try:
+            data_manager = DataManager(username='bench', data_dir=temp_dir)
+            build_history(data_manager.file_path, size)
+            
+            start = time.perf_counter()
+            data_manager.get_transaction('TX000000000')
+            build_ms = (time.perf_counter() - start) * 1000
+            
+            latencies = []
+            for _ in range(args.lookups):
+                transaction_id = f"TX{random.randrange(size):09d}"
+                start = time.perf_counter()
+                data_manager.get_transaction(transaction_id)
+                latencies.append((time.perf_counter() - start) * 1000)
+            
+            update_latencies = []
+            for _ in range(args.lookups):
+                transaction_id = f"TX{random.randrange(size):09d}"
+                start = time.perf_counter()
+                data_manager.update_transaction_category(transaction_id, 'Food')
+                update_latencies.append((time.perf_counter() - start) * 1000)
+            
+            print(f"{size:>10} {build_ms:>15.1f} {statistics.median(latencies):>17.3f} {statistics.median(update_latencies):>17.3f}")
+        finally:
+            shutil.rmtree(temp_dir)
+
+if __name__ == "__main__":
+    main()
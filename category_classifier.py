@@ -0,0 +1,316 @@
+"""
+Local text classifier for transaction categories
+
+Descriptions that miss every categorization rule end up as 'Other'. This
+module learns each user's own categories from their labeled history with a
+multinomial naive Bayes model over hashed character n-grams, in NumPy only:
+
+- descriptions are lowercased and deduplicated, digits are folded to '0'
+  and the character 3-, 4- and 5-grams of every distinct description are
+  hashed into a fixed number of buckets, all rows at once on a code point
+  matrix,
+- training is one bincount of (category, bucket) pairs weighted by how
+  often each description occurs, and
+- prediction sums per-bucket log probabilities for a chunk of distinct
+  descriptions at a time and returns the most likely category with its
+  confidence: the posterior probability scaled by the share of n-grams
+  seen in training, as naive Bayes is sure of itself even for text unlike
+  anything it was trained on.
+
+Models are cached per store (see CategoryModels) with the number of labeled
+rows per category they were trained on, which DataManager reads from its
+rollups. A model is kept until the labels change by RETRAIN_LABELED_ROWS, or
+by RETRAIN_SHARE of the labels it was trained on if that is more, so adding
+transactions one at a time or importing a statement in batches does not
+retrain it after every write. DataManager.categorize
+uses a prediction only when its confidence reaches CONFIDENCE_THRESHOLD and
+falls back to the rules otherwise.
+"""
+
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Number of hash buckets for n-gram features (a power of two)
+HASH_BUCKETS = 2 ** 15
+
+# Lengths of the character n-grams used as features
+NGRAM_SIZES = (3, 4, 5)
+
+# Characters of each description that are looked at
+MAX_DESCRIPTION_CHARS = 64
+
+# Rows per chunk when predicting, to bound the memory of the gathered scores
+PREDICT_CHUNK_SIZE = 2048
+
+# Fewest labeled rows a model is trained from
+MIN_TRAINING_ROWS = 20
+
+# Confidence a prediction needs to be used instead of the rules
+CONFIDENCE_THRESHOLD = 0.9
+
+# Number of models kept in memory per process
+MODEL_CACHE_SIZE = 32
+
+# Fewest labels added, removed or changed since training that retrain a model
+RETRAIN_LABELED_ROWS = 100
+
+# Share of the labels a model was trained on that have to change to retrain it
+RETRAIN_SHARE = 0.25
+
+def _code_points(descriptions):
+    """Lowercase descriptions and fold their digits to '0'
+    
+    Args:
+        descriptions (iterable): Descriptions (missing values count as empty)
+    
+    Returns:
+        ndarray: Fixed-width unicode array of the folded descriptions,
+            truncated to MAX_DESCRIPTION_CHARS
+    """
+    if isinstance(descriptions, pd.Series):
+        # Iterating an array is much faster than iterating an Arrow-backed Series
+        descriptions = descriptions.to_numpy(dtype=object)
+    lowered = [description.lower() if isinstance(description, str) else '' for description in descriptions]
+    longest = min(max(map(len, lowered), default=0), MAX_DESCRIPTION_CHARS)
+    text = np.array(lowered, dtype=f'U{max(longest, 1)}')
+    # Code points of '1'..'9' are the only ones within 8 above '1' (unsigned wrap-around)
+    points = text.view(np.uint32)
+    points[(points - np.uint32(49)) <= 8] = 48
+    return text
+
+def _distinct_descriptions(descriptions):
+    """Fold descriptions and factorize them
+    
+    Args:
+        descriptions (iterable): Descriptions (missing values count as empty)
+    
+    Returns:
+        tuple: (code of every description, list of distinct folded descriptions)
+    """
+    codes, uniques = pd.factorize(_code_points(descriptions))
+    return codes, list(uniques)
+
+def hashed_ngrams(descriptions, buckets=HASH_BUCKETS):
+    """Hash the character n-grams of descriptions into buckets
+    
+    Args:
+        descriptions (iterable): Descriptions (missing values count as empty)
+        buckets (int): Number of hash buckets, a power of two
+    
+    Returns:
+        tuple: (buckets of shape (rows, n-grams), boolean mask of the
+            n-grams that lie within each description)
+    """
+    text = _code_points(descriptions)
+    rows, longest = len(text), text.itemsize // 4
+    points = text.view(np.uint32).reshape(rows, longest)
+    lengths = np.count_nonzero(points, axis=1)
+    
+    # Pad every description with a space on both sides so n-grams mark word edges
+    width = max(longest + 2, max(NGRAM_SIZES))
+    chars = np.zeros((rows, width), dtype=np.uint32)
+    chars[:, 0] = 32
+    chars[:, 1:longest + 1] = points
+    chars[np.arange(rows), lengths + 1] = 32
+    lengths += 2
+    
+    shift = np.uint32(32 - (buckets.bit_length() - 1))
+    hashes, masks = [], []
+    rolling = chars
+    for size in range(2, max(NGRAM_SIZES) + 1):
+        # Extend every (size - 1)-gram by the next character
+        rolling = rolling[:, :width - size + 1] * np.uint32(31) + chars[:, size - 1:]
+        if size not in NGRAM_SIZES:
+            continue
+        # Fibonacci hashing of the salted polynomial hash spreads it over the buckets
+        mixed = (rolling + np.uint32(size * 0x5BD1E995 & 0xFFFFFFFF)) * np.uint32(0x9E3779B1)
+        hashes.append(mixed >> shift)
+        masks.append(np.arange(width - size + 1) + size <= lengths[:, None])
+    
+    return np.concatenate(hashes, axis=1), np.concatenate(masks, axis=1)
+
+class NaiveBayesCategorizer:
+    """Multinomial naive Bayes over hashed character n-grams"""
+    
+    def __init__(self, buckets=HASH_BUCKETS, alpha=0.1):
+        """Initialize an untrained model
+        
+        Args:
+            buckets (int): Number of hash buckets, a power of two
+            alpha (float): Additive smoothing of the bucket counts
+        """
+        self.buckets = buckets
+        self.alpha = alpha
+        self.classes = None
+        self.class_log_prior = None
+        self.feature_log_prob = None
+        self.seen = None
+    
+    def fit(self, descriptions, categories):
+        """Train on labeled descriptions
+        
+        Args:
+            descriptions (Series): Transaction descriptions
+            categories (Series): Category of each description
+        
+        Returns:
+            NaiveBayesCategorizer: The trained model
+        """
+        codes, classes = pd.factorize(pd.Series(categories).astype(object))
+        description_codes, distinct = _distinct_descriptions(descriptions)
+        
+        # Hash each distinct description once, weighted by its rows in every class
+        pairs, weights = np.unique(codes * len(distinct) + description_codes, return_counts=True)
+        hashes, mask = hashed_ngrams(distinct, self.buckets)
+        hashes, mask = hashes[pairs % len(distinct)], mask[pairs % len(distinct)]
+        
+        rows = np.broadcast_to((pairs // len(distinct))[:, None], hashes.shape)
+        counts = np.bincount(
+            (rows[mask] * self.buckets + hashes[mask]).astype(np.int64),
+            weights=np.broadcast_to(weights[:, None], hashes.shape)[mask],
+            minlength=len(classes) * self.buckets
+        ).reshape(len(classes), self.buckets)
+        
+        smoothed = counts + self.alpha
+        log_prob = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+        # (buckets, classes), contiguous so gathering a bucket reads one row
+        self.feature_log_prob = np.ascontiguousarray(log_prob.T, dtype=np.float32)
+        self.seen = counts.any(axis=0)
+        self.class_log_prior = np.log(np.bincount(codes, minlength=len(classes)) / len(codes)).astype(np.float32)
+        self.classes = np.asarray(classes, dtype=object)
+        return self
+    
+    def predict(self, descriptions):
+        """Predict the category of every description
+        
+        Args:
+            descriptions (iterable): Transaction descriptions
+        
+        Returns:
+            tuple: (array of predicted categories, array of their confidence
+                between 0 and 1)
+        """
+        codes, distinct = _distinct_descriptions(descriptions)
+        best = np.zeros(len(distinct), dtype=np.int64)
+        confidence = np.zeros(len(distinct), dtype=np.float64)
+        
+        for start in range(0, len(distinct), PREDICT_CHUNK_SIZE):
+            hashes, mask = hashed_ngrams(distinct[start:start + PREDICT_CHUNK_SIZE], self.buckets)
+            # Sum the (rows, n-grams, classes) log probabilities over the n-grams within the text
+            scores = np.einsum('ngc,ng->nc', self.feature_log_prob[hashes], mask.astype(np.float32))
+            scores += self.class_log_prior
+            
+            chunk_best = scores.argmax(axis=1)
+            # Posterior of the best class: 1 / sum(exp(score - best score))
+            margins = np.exp(scores - scores[np.arange(len(chunk_best)), chunk_best][:, None], dtype=np.float64)
+            end = start + len(chunk_best)
+            best[start:end] = chunk_best
+            coverage = (self.seen[hashes] & mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1)
+            confidence[start:end] = coverage / margins.sum(axis=1)
+        
+        return self.classes[best[codes]], confidence[codes]
+
+def train_category_model(df):
+    """Train a model on a user's labeled transactions
+    
+    Rows without a description or category, and rows in 'Other', are not
+    labels and are left out.
+    
+    Args:
+        df (DataFrame): Transactions with 'description' and 'category' columns
+    
+    Returns:
+        NaiveBayesCategorizer: The model, or None if there are fewer than
+            MIN_TRAINING_ROWS labeled rows or fewer than two categories
+    """
+    categories = df['category'].astype(object)
+    labeled = df['description'].notna() & categories.notna() & (categories != 'Other') & (categories != '')
+    if labeled.sum() < MIN_TRAINING_ROWS or categories[labeled].nunique() < 2:
+        return None
+    return NaiveBayesCategorizer().fit(df.loc[labeled, 'description'], categories[labeled])
+
+def label_counts(category_counts):
+    """Keep the categories that count as labels for training
+    
+    Args:
+        category_counts (dict): Number of transactions per category
+    
+    Returns:
+        dict: Number of transactions per category, without 'Other' and
+            missing categories
+    """
+    return {
+        category: count for category, count in category_counts.items()
+        if isinstance(category, str) and category not in ('', 'Other') and count
+    }
+
+def _needs_training(trained, labels, model):
+    """Check whether a cached model is out of date
+    
+    Args:
+        trained (dict): Labels per category the model was trained on
+        labels (dict): Labels per category now
+        model (NaiveBayesCategorizer): The cached model, or None
+    
+    Returns:
+        bool: True if the labels changed enough to retrain
+    """
+    categories = set(trained) | set(labels)
+    changed = sum(abs(labels.get(category, 0) - trained.get(category, 0)) for category in categories)
+    if not changed:
+        return False
+    if model is None:
+        # Train as soon as there may be enough history
+        return sum(labels.values()) >= MIN_TRAINING_ROWS
+    return changed >= max(RETRAIN_LABELED_ROWS, RETRAIN_SHARE * sum(trained.values()))
+
+class CategoryModels:
+    """LRU cache of trained models keyed by store identity"""
+    
+    def __init__(self, max_models=MODEL_CACHE_SIZE):
+        """Initialize an empty cache
+        
+        Args:
+            max_models (int): Number of stores whose model is kept
+        """
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, identity, category_counts, read):
+        """Get the model of a store, training it if the labels changed enough
+        
+        Args:
+            identity (tuple): Identifies the store (backend, location, user)
+            category_counts (dict): Number of stored transactions per category
+            read (callable): Returns the store's transactions to train on
+        
+        Returns:
+            NaiveBayesCategorizer: The model, or None if the store has too
+                little labeled history
+        """
+        labels = label_counts(category_counts)
+        with self._lock:
+            entry = self._models.get(identity)
+            if entry is not None and not _needs_training(entry[0], labels, entry[1]):
+                self._models.move_to_end(identity)
+                return entry[1]
+        
+        model = train_category_model(read())
+        
+        with self._lock:
+            self._models[identity] = (labels, model)
+            self._models.move_to_end(identity)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return model
+    
+    def clear(self):
+        """Drop all cached models"""
+        with self._lock:
+            self._models.clear()
+
+# Process-wide cache used by DataManager
+category_models = CategoryModels()
@@ -0,0 +1,410 @@
+"""
+Configurable rules for automatic transaction categorization
+
+Rules are read from a YAML or JSON file (EROPIA_CATEGORY_RULES, default
+`category_rules.yaml` next to this module). Each rule assigns a category when one of its
+keywords (a case-insensitive substring) or patterns (a regular expression)
+occurs in a description:
+
+    rules:
+      - category: Food
+        priority: 90
+        keywords: [restaurant, grocery, naivas]
+        patterns: ['\\bkfc\\b']
+    users:
+      alice:
+        - category: Business
+          keywords: [printing]
+
+Rules are checked by descending priority, then in file order, and the first
+one that matches wins. Rules under `users` apply to that user only and are
+checked before the shared rules. All keywords are compiled into a single
+automaton (see KeywordMatcher); the compiled rules are cached and only
+recompiled when the file's modification time changes, so edits take effect
+without a restart. Without a rules file the built-in CATEGORY_KEYWORDS apply.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+import yaml
+
+# Environment variable holding the path of the rules file
+CATEGORY_RULES_ENV = "EROPIA_CATEGORY_RULES"
+
+# Rules file used when EROPIA_CATEGORY_RULES is not set, wherever the app is started from
+DEFAULT_CATEGORY_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "category_rules.yaml")
+
+# Seconds between checks of the rules file for changes
+RULES_CHECK_INTERVAL = 1.0
+
+# Built-in rules, used when there is no rules file: keywords of each
+# category, checked in order, the first category with a keyword anywhere in
+# the description wins
+CATEGORY_KEYWORDS = [
+    # Food and Dining
+    ('Food', [
+        'restaurant', 'cafe', 'food', 'grocery', 'supermarket', 'naivas', 'carrefour', 
+        'quickmart', 'dinner', 'lunch', 'breakfast', 'eat', 'meal', 'coffee', 'java', 
+        'kfc', 'mcdonalds', 'jumia food', 'uber eats', 'bolt food', 'glovo'
+    ]),
+    # Transport
+    ('Transport', [
+        'uber', 'bolt', 'little', 'taxi', 'matatu', 'bus', 'fare', 'transport', 'fuel',
+        'petrol', 'diesel', 'car', 'vehicle', 'parking', 'ride', 'travel', 'transport'
+    ]),
+    # Housing & Utilities
+    ('Housing', [
+        'rent', 'house', 'apartment', 'water', 'electricity', 'power', 'kplc',
+        'gas', 'housing', 'mortgage', 'accommodation', 'airbnb', 'hotel'
+    ]),
+    # Bills & Utilities
+    ('Utilities', [
+        'bill', 'utility', 'internet', 'wifi', 'airtime', 'safaricom', 'telkom', 'airtel',
+        'phone', 'data', 'subscription', 'dstv', 'netflix', 'spotify', 'showmax', 'bundle', 
+        'wifi bill'
+    ]),
+    # Entertainment
+    ('Entertainment', [
+        'cinema', 'movie', 'concert', 'event', 'game', 'betting', 'sportpesa',
+        'betika', 'entertainment', 'party', 'club', 'bar', 'alcohol', 'beer', 'fun',
+        'leisure', 'recreation'
+    ]),
+    # Health
+    ('Health', [
+        'hospital', 'doctor', 'medical', 'health', 'pharmacy', 'medicine', 'clinic',
+        'dental', 'healthcare', 'insurance', 'nhif'
+    ]),
+    # Education
+    ('Education', [
+        'school', 'college', 'university', 'tuition', 'fee', 'education', 'course',
+        'class', 'training', 'book', 'learning', 'student'
+    ]),
+    # Shopping
+    ('Shopping', [
+        'shop', 'mall', 'store', 'purchase', 'buy', 'jumia', 'amazon', 'clothes',
+        'shopping', 'item', 'product', 'electronic', 'gadget', 'furniture'
+    ]),
+    # Travel
+    ('Travel', [
+        'flight', 'air', 'train', 'sgr', 'vacation', 'holiday', 'tour', 'travel',
+        'trip', 'hotel', 'accommodation', 'booking', 'ticket', 'transport', 'lodge'
+    ]),
+]
+
+def _trie_pattern(node):
+    """Build a regex matching the keywords of a trie, longest first
+    
+    Args:
+        node (dict): Trie node mapping characters to child nodes; the key ''
+            marks the end of a keyword
+    
+    Returns:
+        str: Pattern whose alternatives share common prefixes
+    """
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    if '' in node:
+        # A keyword ends here; greedily try the longer keywords first
+        return '(?:' + '|'.join(branches) + ')?'
+    if len(branches) == 1:
+        return branches[0]
+    return '(?:' + '|'.join(branches) + ')'
+
+class KeywordMatcher:
+    """Finds the first category, in order of priority, with a keyword in a text
+    
+    All keywords are compiled once into a single Aho-Corasick automaton
+    (pyahocorasick) that reports every keyword in a description in one pass.
+    Without pyahocorasick they go into one trie-shaped regex instead, wrapped
+    in a lookahead so that a scan reports the longest keyword starting at
+    every position; every other keyword starting there is a prefix of it, so
+    each keyword is ranked by the first category it or any of its prefixes
+    belongs to.
+    """
+    
+    def __init__(self, category_keywords, use_automaton=True):
+        """Compile the keyword tables
+        
+        Args:
+            category_keywords (list): (category, keywords) pairs in order of priority
+            use_automaton (bool): Use pyahocorasick if it is installed
+        """
+        self.categories = [category for category, _ in category_keywords]
+        ranks = {}
+        for rank, (_, keywords) in enumerate(category_keywords):
+            for keyword in keywords:
+                ranks.setdefault(keyword.lower(), rank)
+        
+        self.automaton = None
+        self.pattern = None
+        if use_automaton:
+            try:
+                import ahocorasick
+            except ImportError:
+                ahocorasick = None
+            if ahocorasick is not None and ranks:
+                self.automaton = ahocorasick.Automaton()
+                for keyword, rank in ranks.items():
+                    self.automaton.add_word(keyword, rank)
+                self.automaton.make_automaton()
+                return
+        
+        trie = {}
+        for keyword in ranks:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        
+        self.ranks = {
+            keyword: min(rank for prefix, rank in ranks.items() if keyword.startswith(prefix))
+            for keyword in ranks
+        }
+        if trie:
+            self.pattern = re.compile('(?=(' + _trie_pattern(trie) + '))')
+    
+    def rank(self, description):
+        """Get the position of the first category with a keyword in a description
+        
+        Args:
+            description (str): Lowercased description
+        
+        Returns:
+            int: Index into categories, or len(categories) if no keyword
+                occurs in the description
+        """
+        best = len(self.categories)
+        if self.automaton is not None:
+            for _, rank in self.automaton.iter(description):
+                if rank < best:
+                    best = rank
+        elif self.pattern is not None:
+            for keyword in self.pattern.findall(description):
+                rank = self.ranks[keyword]
+                if rank < best:
+                    best = rank
+        return best
+    
+    def match(self, description):
+        """Get the first category with a keyword in a description
+        
+        Args:
+            description (str): Lowercased description
+        
+        Returns:
+            str: The category, or None if no keyword occurs in the description
+        """
+        best = self.rank(description)
+        return self.categories[best] if best < len(self.categories) else None
+
+class RuleMatcher:
+    """Compiled categorization rules"""
+    
+    def __init__(self, rules):
+        """Compile rules into one keyword matcher and a list of patterns
+        
+        Args:
+            rules (list): Rule dictionaries with 'category' and optional
+                'keywords' and 'patterns', in the order they are checked
+        """
+        self.categories = [rule['category'] for rule in rules]
+        self.keywords = KeywordMatcher([(rule['category'], rule.get('keywords', [])) for rule in rules])
+        self.patterns = [
+            (rank, re.compile(pattern, re.IGNORECASE))
+            for rank, rule in enumerate(rules)
+            for pattern in rule.get('patterns', [])
+        ]
+        
+        # Without patterns the keyword matcher alone decides
+        if not self.patterns:
+            self.match = self.keywords.match
+    
+    def match(self, description):
+        """Get the category of the first rule that matches a description
+        
+        Args:
+            description (str): Lowercased description
+        
+        Returns:
+            str: The category, or None if no rule matches
+        """
+        best = self.keywords.rank(description)
+        # Only rules checked before the best keyword match can still win
+        for rank, pattern in self.patterns:
+            if rank >= best:
+                break
+            if pattern.search(description):
+                best = rank
+                break
+        return self.categories[best] if best < len(self.categories) else None
+
+def _parse_rule_list(rules, where):
+    """Validate a list of rules and sort it into checking order
+    
+    Args:
+        rules (list): Rule dictionaries as read from the file
+        where (str): Location in the file, for error messages
+    
+    Returns:
+        list: The rules, by descending priority then file order
+    
+    Raises:
+        ValueError: If a rule is malformed
+    """
+    if not isinstance(rules, list):
+        raise ValueError(f"{where} must be a list of rules")
+    
+    parsed = []
+    for number, rule in enumerate(rules, 1):
+        if not isinstance(rule, dict) or not isinstance(rule.get('category'), str) or not rule['category']:
+            raise ValueError(f"{where} rule {number} needs a category")
+        
+        keywords = rule.get('keywords') or []
+        patterns = rule.get('patterns') or []
+        if not isinstance(keywords, list) or not isinstance(patterns, list):
+            raise ValueError(f"{where} rule {number} keywords and patterns must be lists")
+        if not all(isinstance(value, str) and value for value in keywords + patterns):
+            raise ValueError(f"{where} rule {number} keywords and patterns must be non-empty strings")
+        if not keywords and not patterns:
+            raise ValueError(f"{where} rule {number} needs keywords or patterns")
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"{where} rule {number} has an invalid pattern {pattern!r}: {e}")
+        
+        priority = rule.get('priority', 0)
+        if not isinstance(priority, (int, float)) or isinstance(priority, bool):
+            raise ValueError(f"{where} rule {number} priority must be a number")
+        
+        parsed.append({
+            'category': rule['category'],
+            'priority': priority,
+            'keywords': [keyword.lower() for keyword in keywords],
+            'patterns': patterns
+        })
+    
+    # sorted is stable, so rules of equal priority keep their file order
+    return sorted(parsed, key=lambda rule: -rule['priority'])
+
+def parse_rules(config):
+    """Validate the contents of a rules file
+    
+    Args:
+        config (dict): Parsed YAML or JSON with 'rules' and optional 'users'
+    
+    Returns:
+        tuple: (shared rules, dict of username -> that user's rules), each
+            in checking order
+    
+    Raises:
+        ValueError: If the file is malformed
+    """
+    if not isinstance(config, dict):
+        raise ValueError("rules file must contain a mapping with 'rules'")
+    
+    shared = _parse_rule_list(config.get('rules') or [], 'rules')
+    users = config.get('users') or {}
+    if not isinstance(users, dict):
+        raise ValueError("users must map usernames to lists of rules")
+    
+    overrides = {
+        str(username): _parse_rule_list(rules or [], f"users.{username}")
+        for username, rules in users.items()
+    }
+    return shared, overrides
+
+def default_rules():
+    """Get the built-in rules
+    
+    Returns:
+        list: One rule per category of CATEGORY_KEYWORDS, in order
+    """
+    return [{'category': category, 'keywords': keywords} for category, keywords in CATEGORY_KEYWORDS]
+
+class CategoryRules:
+    """Categorization rules from a file, recompiled when the file changes"""
+    
+    def __init__(self, path=None, check_interval=RULES_CHECK_INTERVAL):
+        """Initialize the rules
+        
+        Args:
+            path (str): Rules file (default: EROPIA_CATEGORY_RULES or
+                DEFAULT_CATEGORY_RULES_PATH); .json files are read as JSON
+            check_interval (float): Seconds between checks of the file for
+                changes (0 checks on every call)
+        """
+        self.path = path or os.getenv(CATEGORY_RULES_ENV, DEFAULT_CATEGORY_RULES_PATH)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = float('-inf')
+        self._stamp = None
+        self._shared = default_rules()
+        self._overrides = {}
+        self._matchers = {}
+    
+    def matcher(self, username=None):
+        """Get the compiled rules that apply to a user
+        
+        Args:
+            username (str): Username (None for the shared rules only)
+        
+        Returns:
+            RuleMatcher: Rules compiled for the user
+        """
+        now = time.monotonic()
+        if now - self._checked >= self.check_interval:
+            with self._lock:
+                self._checked = now
+                self._refresh()
+        
+        key = username if username in self._overrides else None
+        matcher = self._matchers.get(key)
+        if matcher is None:
+            with self._lock:
+                matcher = self._matchers.get(key)
+                if matcher is None:
+                    matcher = RuleMatcher(self._overrides.get(key, []) + self._shared)
+                    self._matchers[key] = matcher
+        return matcher
+    
+    def _refresh(self):
+        """Reload the rules if the file changed since it was last read
+        
+        A file that cannot be read or is malformed is reported and the rules
+        in use are kept; without a file the built-in rules apply.
+        """
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            stamp = None
+        
+        if stamp == self._stamp:
+            return
+        self._stamp = stamp
+        
+        if stamp is None:
+            shared, overrides = default_rules(), {}
+        else:
+            try:
+                with open(self.path, 'r') as f:
+                    if self.path.endswith('.json'):
+                        config = json.load(f)
+                    else:
+                        config = yaml.safe_load(f)
+                shared, overrides = parse_rules(config)
+            except (OSError, ValueError, yaml.YAMLError) as e:
+                print(f"Error loading categorization rules from {self.path}: {e}")
+                return
+        
+        self._shared = shared
+        self._overrides = overrides
+        self._matchers = {}
+
+# Rules used by utils.categorize_transaction and categorize_series
+category_rules = CategoryRules()
@@ -0,0 +1,230 @@
+"""
+Persistent transaction_id -> byte offset index for CSV transaction files
+
+The index lives next to the CSV file as `<file>.idx`. Its first line is a
+fixed-width header holding the inode of the CSV file it describes, the
+number of CSV bytes already indexed and the number of indexed rows that
+have no transaction_id; every other line is
+`transaction_id<TAB>offset<TAB>length` for one row.
+
+Appends to the CSV file only require indexing the new tail, and the header
+is updated in place. A rewritten CSV file (new inode, or shorter than the
+indexed size) is indexed again from scratch. Lookups re-check the id of the
+row they land on, so a stale index is detected instead of returning the
+wrong row. Processes sharing the CSV file update the index under a lock on
+`<file>.idx.lock`, and a rebuilt index replaces the old one atomically.
+"""
+
+import os
+import csv
+import threading
+from contextlib import nullcontext
+from file_lock import FileLock, atomic_write
+
+# Fixed-width header: inode, number of indexed CSV bytes and rows without an id
+HEADER_FORMAT = "{inode:020d} {covered:020d} {missing:020d}\n"
+
+def iter_csv_records(f, start):
+    """Yield complete CSV records from a binary file, with their byte ranges
+    
+    Quoted fields may contain newlines, so a record ends at a newline only
+    when its quotes are balanced. An incomplete record at the end of the
+    file (no trailing newline yet) is not yielded.
+    
+    Args:
+        f (file): File opened in binary mode
+        start (int): Byte offset of the first record to read
+    
+    Yields:
+        tuple: (offset, raw record bytes including the newline)
+    """
+    f.seek(start)
+    offset = start
+    pending = b''
+    record_start = start
+    
+    for line in f:
+        if not pending:
+            record_start = offset
+        pending += line
+        offset += len(line)
+        
+        # Still inside a quoted field
+        if pending.count(b'"') % 2:
+            continue
+        if not pending.endswith(b'\n'):
+            break
+        
+        yield record_start, pending
+        pending = b''
+
+def parse_csv_record(record):
+    """Split a raw CSV record into its fields
+    
+    Args:
+        record (bytes): One record including its newline
+    
+    Returns:
+        list: Field values as strings
+    """
+    text = record.decode('utf-8')
+    if '"' not in text:
+        return text.rstrip('\r\n').split(',')
+    return next(csv.reader([text]))
+
+class CSVOffsetIndex:
+    """Map transaction ids to the byte range of their row in a CSV file"""
+    
+    # Loaded indexes shared by every instance in the process, by index path
+    _loaded = {}
+    _lock = threading.Lock()
+    
+    def __init__(self, csv_path):
+        """Initialize the index of a CSV file
+        
+        Args:
+            csv_path (str): Path to the CSV transaction file
+        """
+        self.csv_path = csv_path
+        self.path = csv_path + '.idx'
+        self.file_lock = FileLock(self.path + '.lock')
+    
+    def missing_ids(self):
+        """Count the rows of the CSV file that have no transaction_id
+        
+        Returns:
+            int: Number of rows without an id
+        """
+        self.refresh()
+        return self._loaded[self.path]['missing']
+    
+    def lookup(self, transaction_id):
+        """Find the byte range of a transaction's row
+        
+        Args:
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            tuple: (offset, length) of the row, or None if it is not indexed
+        """
+        entries = self.refresh()
+        return entries.get(str(transaction_id))
+    
+    def refresh(self):
+        """Bring the index up to date with the CSV file
+        
+        Returns:
+            dict: transaction_id -> (offset, length)
+        """
+        with self._lock, self.file_lock:
+            stat = os.stat(self.csv_path)
+            state = self._loaded.get(self.path)
+            
+            if state is None or state['inode'] != stat.st_ino:
+                state = self._load(stat.st_ino)
+            
+            if state is None or state['covered'] > stat.st_size:
+                state = self._rebuild(stat.st_ino)
+            elif state['covered'] < stat.st_size:
+                self._extend(state)
+            
+            self._loaded[self.path] = state
+            return state['entries']
+    
+    def invalidate(self):
+        """Forget the index so it is rebuilt on the next lookup"""
+        with self._lock, self.file_lock:
+            self._loaded.pop(self.path, None)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+    
+    def _id_position(self):
+        """Find the position of the transaction_id column in the CSV header
+        
+        Returns:
+            tuple: (header length in bytes, column position or None)
+        """
+        with open(self.csv_path, 'rb') as f:
+            for offset, record in iter_csv_records(f, 0):
+                fields = parse_csv_record(record)
+                position = fields.index('transaction_id') if 'transaction_id' in fields else None
+                return len(record), position
+        return 0, None
+    
+    def _load(self, inode):
+        """Load the index file if it describes the current CSV file
+        
+        Args:
+            inode (int): Inode of the current CSV file
+        
+        Returns:
+            dict: Index state, or None if the file is missing or stale
+        """
+        if not os.path.exists(self.path):
+            return None
+        
+        with open(self.path, 'r') as f:
+            header = f.readline()
+            try:
+                stored_inode, covered, missing = (int(value) for value in header.split())
+            except ValueError:
+                return None
+            if stored_inode != inode:
+                return None
+            
+            entries = {}
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) == 3:
+                    entries[parts[0]] = (int(parts[1]), int(parts[2]))
+        
+        _, position = self._id_position()
+        return {'inode': inode, 'covered': covered, 'missing': missing, 'entries': entries, 'position': position}
+    
+    def _rebuild(self, inode):
+        """Index the whole CSV file again
+        
+        Args:
+            inode (int): Inode of the current CSV file
+        
+        Returns:
+            dict: Fresh index state
+        """
+        header_size, position = self._id_position()
+        state = {'inode': inode, 'covered': header_size, 'missing': 0, 'entries': {}, 'position': position}
+
+        # Build the new index next to the old one and swap it in
+        with atomic_write(self.path, 'w+', suffix='.idx.tmp') as f:
+            f.write(HEADER_FORMAT.format(inode=inode, covered=header_size, missing=0))
+            self._extend(state, f)
+        return state
+    
+    def _extend(self, state, index_file=None):
+        """Index the rows appended since the index was last updated
+        
+        Args:
+            state (dict): Index state to extend in place
+            index_file (file): Open index file to write to (default: the
+                index file at the index path)
+        """
+        position = state['position']
+        new_lines = []
+        covered = state['covered']
+        
+        with open(self.csv_path, 'rb') as f:
+            for offset, record in iter_csv_records(f, covered):
+                covered = offset + len(record)
+                fields = parse_csv_record(record) if position is not None else []
+                if position is not None and position < len(fields) and fields[position]:
+                    state['entries'][fields[position]] = (offset, len(record))
+                    new_lines.append(f"{fields[position]}\t{offset}\t{len(record)}\n")
+                else:
+                    state['missing'] += 1
+        
+        with nullcontext(index_file) if index_file is not None else open(self.path, 'r+') as f:
+            f.seek(0, os.SEEK_END)
+            f.write(''.join(new_lines))
+            f.seek(0)
+            f.write(HEADER_FORMAT.format(inode=state['inode'], covered=covered, missing=state['missing']))
+        
+        state['covered'] = covered
@@ -1,21 +1,61 @@
 import pandas as pd
+import numpy as np
 import os
 import json
-from datetime import datetime
+import math
+import time
+from itertools import islice
+from datetime import datetime, date
+from storage import (
+    TRANSACTION_COLUMNS, apply_transaction_schema, csv_file_path, get_storage_backend, new_transaction_id
+)
+from transaction_cache import transaction_cache
+from rollups import TransactionRollups
+from dedup_index import DedupIndex
+from arrow_snapshot import ArrowSnapshots, arrow_snapshots_enabled
+from versions import VersionLog
+from utils import categorize_series, STATEMENT_BATCH_SIZE
+from statement_parsers import iter_statement
+from merchant_memo import get_merchant_memo, normalize_merchant
+from category_classifier import category_models, CONFIDENCE_THRESHOLD
+
+# Default number of rows per chunk for iter_transactions
+DEFAULT_CHUNK_SIZE = 50000
+
+# Reads retried at once after racing a write, before waiting between retries
+OPTIMISTIC_READ_ATTEMPTS = 3
+
+# Seconds to wait between later retries, while a writer finishes its write
+READ_RETRY_SECONDS = 0.01
+
+# Later retries before a read holds writers off to get a consistent result
+READ_RETRY_ATTEMPTS = 50
 
 class DataManager:
     """Class to manage transaction data storage and retrieval"""
     
-    def __init__(self, username=None, data_dir="data"):
+    def __init__(self, username=None, data_dir="data", backend=None):
         """Initialize the data manager with a username for storage
         
         Args:
             username (str): Username for per-user storage (if None, uses shared storage)
             data_dir (str): Base directory for data storage
+            backend (str): Storage backend name: 'csv', 'parquet' or 'sqlite'
+                (default: EROPIA_STORAGE_BACKEND environment variable or 'csv')
         """
         self.username = username
         self.data_dir = data_dir
         self.file_path = self._get_file_path()
+        self.storage = get_storage_backend(backend, username=username, data_dir=data_dir)
+        self.rollups = TransactionRollups(self.storage, username, data_dir)
+        self.dedup = DedupIndex(self.storage, username, data_dir)
+        self.snapshots = ArrowSnapshots(data_dir) if arrow_snapshots_enabled() else None
+        try:
+            self.pins = ArrowSnapshots(data_dir, "pinned", keep=transaction_cache.max_versions)
+        except ImportError:
+            self.pins = None
+        self.versions = VersionLog(self.storage, username, data_dir)
+        self.memo = get_merchant_memo(data_dir)
         self.ensure_data_file_exists()
     
     def _get_file_path(self):
@@ -24,111 +64,454 @@ class DataManager:
         Returns:
             str: Path to the user's transaction data file
         """
-        if self.username:
-            # Use user-specific file
-            return os.path.join(self.data_dir, f"transactions_{self.username}.csv")
-        else:
-            # Use shared file (for backward compatibility)
-            return os.path.join(self.data_dir, "transactions.csv")
+        return csv_file_path(self.username, self.data_dir)
     
     def ensure_data_file_exists(self):
-        """Create data directory and file if they don't exist"""
-        directory = os.path.dirname(self.file_path)
-        
-        # Create directory if it doesn't exist
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-        
-        # Create file with headers if it doesn't exist
-        if not os.path.exists(self.file_path):
-            # Create an empty DataFrame with the required columns
-            empty_df = pd.DataFrame(columns=[
-                'date', 'description', 'amount', 'type', 
-                'category', 'source', 'user_id'
-            ])
-            empty_df.to_csv(self.file_path, index=False)
-    
-    def get_transactions(self):
-        """Get all transactions as a pandas DataFrame"""
+        """Create the user's transaction storage if it doesn't exist"""
+        self.storage.ensure_exists()
+    
+    def get_transactions(self, as_of_version=None):
+        """Get all transactions as a pandas DataFrame
+        
+        Every committed write bumps the store's version (see versions.py).
+        Parsed frames are kept in a process-wide cache keyed by version, and
+        a frame is only returned if the store did not change while it was
+        read, so a batch that is being written is never seen half-applied.
+        Reads do not hold off writers: while a write is in progress, the last
+        committed version is returned if it is cached, and the read is
+        retried once the write is done otherwise. Only a read that keeps
+        racing writes for READ_RETRY_ATTEMPTS retries takes the writers'
+        lock for one read. With EROPIA_ARROW_SNAPSHOTS
+        set, the current version is instead published as a memory-mapped
+        Arrow snapshot shared by every process (see arrow_snapshot.py).
+        
+        Args:
+            as_of_version (int): Version to read, from current_version()
+                (default: the current version). The last few pinned versions
+                stay readable from every process after newer writes, so a
+                page can pin one version for all of its reads.
+            
+        Returns:
+            DataFrame: The transactions at that version
+            
+        Raises:
+            ValueError: If as_of_version is no longer retained
+        """
+        identity = self._cache_identity()
         try:
-            # Read the CSV file
-            df = pd.read_csv(self.file_path)
-            
-            # Convert date strings to datetime objects
-            if not df.empty:
-                df['date'] = pd.to_datetime(df['date'])
-                
-                # Filter by username if set
-                if self.username and 'user_id' in df.columns:
-                    df = df[df['user_id'] == self.username]
-            
-            return df
+            return self._read_committed(identity, as_of_version)[2]
+        except OSError:
+            return self.query()
+        
+    def current_version(self):
+        """Get the current version of the user's transactions, to pin it
+        
+        The transactions at that version are saved as an Arrow snapshot
+        under `data/pinned/` (when pyarrow is installed), so
+        get_transactions(as_of_version=n) can read them from any process
+        until EROPIA_CACHE_VERSIONS newer versions have been pinned.
+        
+        Returns:
+            int: Version number, increased by every committed write
+        """
+        identity = self._cache_identity()
+        version, signature, df = self._read_committed(identity)
+        if self.pins is not None:
+            try:
+                self.pins.publish(identity, version, signature, df)
+            except Exception as e:
+                print(f"Error pinning transaction version: {e}")
+        return version
+    
+    def _read_committed(self, identity, as_of_version=None):
+        """Read a committed version, retrying reads that raced a write
+        
+        Args:
+            identity (tuple): Key of this manager's frames in the cache
+            as_of_version (int): Version to read (default: the current one)
+            
+        Returns:
+            tuple: (version, signature, DataFrame) of the version read
+            
+        Raises:
+            ValueError: If as_of_version is no longer retained
+        """
+        for attempt in range(OPTIMISTIC_READ_ATTEMPTS + READ_RETRY_ATTEMPTS):
+            result = self._read_version(identity, as_of_version)
+            if result is not None:
+                return result
+            
+            # Let the writer finish rather than hold it off
+            if attempt >= OPTIMISTIC_READ_ATTEMPTS - 1:
+                time.sleep(READ_RETRY_SECONDS)
+        
+        # Writes kept landing during the read, so hold them off for one read
+        with self.versions.lock:
+            result = self._read_version(identity, as_of_version)
+            if result is not None:
+                return result
+            
+            # Only a writer that bypasses DataManager can still change the store
+            version, source = self.versions.current()
+            return version, source[1] if source else None, self._read_storage()
+    
+    def _read_version(self, identity, as_of_version=None):
+        """Get one version of the transactions, from a cache if possible
+        
+        Args:
+            identity (tuple): Key of this manager's frames in the cache
+            as_of_version (int): Version to read (default: the last
+                committed one)
+            
+        Returns:
+            tuple: (version, signature, DataFrame), or None if the store is
+                being written to and the last committed version is not
+                cached
+            
+        Raises:
+            ValueError: If as_of_version is no longer retained
+        """
+        version, source = self.versions.current()
+        if as_of_version is not None and as_of_version != version:
+            return as_of_version, None, self._read_pinned(identity, as_of_version)
+        
+        signature = source[1] if source else None
+        if self.snapshots is not None:
+            try:
+                df = self.snapshots.get(identity, version, signature)
+                if df is not None:
+                    return version, signature, df
+            except Exception as e:
+                print(f"Error reading transaction snapshot: {e}")
+        
+        df = transaction_cache.get(identity, version)
+        if df is not None:
+            return version, signature, df
+        
+        try:
+            df = self._read_storage()
         except Exception as e:
             print(f"Error reading transactions: {e}")
-            # Return an empty DataFrame with the correct columns
-            return pd.DataFrame(columns=[
-                'date', 'description', 'amount', 'type', 
-                'category', 'source', 'user_id'
-            ])
+            return version, signature, pd.DataFrame(columns=TRANSACTION_COLUMNS)
+        
+        # A write in progress, or one that landed during the read, may be half-applied in the frame
+        if self.versions.source() != source:
+            return None
+        
+        if self.snapshots is not None:
+            try:
+                return version, signature, self.snapshots.publish(identity, version, signature, df)
+            except Exception as e:
+                print(f"Error publishing transaction snapshot: {e}")
+        
+        transaction_cache.put(identity, version, df)
+        return version, signature, df
     
-    def add_transaction(self, transaction):
-        """Add a new transaction to the CSV file
+    def _read_pinned(self, identity, version):
+        """Get an older version of the transactions
         
         Args:
-            transaction (dict): A dictionary containing transaction details
+            identity (tuple): Key of this manager's frames in the cache
+            version (int): Version pinned with current_version()
+            
+        Returns:
+            DataFrame: The transactions at that version
+            
+        Raises:
+            ValueError: If the version is no longer retained
+        """
+        df = transaction_cache.get(identity, version)
+        if df is None and self.pins is not None:
+            try:
+                df = self.pins.get(identity, version)
+            except Exception as e:
+                print(f"Error reading pinned transactions: {e}")
+        if df is None:
+            raise ValueError(f"Version {version} of the transactions is no longer available")
+        return df
+    
+    def _cache_identity(self):
+        """Get the key of this manager's frame in the transaction cache
+        
+        Returns:
+            tuple: Storage identity plus the username filter
+        """
+        return self.storage.identity() + (self.username,)
+    
+    def category_model(self):
+        """Get the category classifier trained on the user's labeled history
+        
+        The model is cached per store and only retrained once enough labeled
+        transactions were added or changed since it was trained, as counted
+        by the rollups (see category_classifier.py).
+        
+        Returns:
+            NaiveBayesCategorizer: The model, or None if there is too little
+                labeled history or it could not be trained
         """
         try:
-            # Convert transaction date to string if it's a datetime object
-            if isinstance(transaction['date'], datetime):
-                transaction['date'] = transaction['date'].strftime('%Y-%m-%d')
+            return category_models.get(
+                self._cache_identity(), self.rollups.category_counts(),
+                lambda: self.query(columns=['description', 'category'])
+            )
+        except Exception as e:
+            print(f"Error training category model: {e}")
+            return None
+    
+    def categorize(self, descriptions):
+        """Categorize a whole column of descriptions for the user
+        
+        The user's classifier predicts every description in one batch, and
+        predictions with a confidence of at least CONFIDENCE_THRESHOLD are
+        used. The other descriptions, descriptions of merchants the user
+        corrected, and all descriptions when there is no model yet get the
+        rule-based category (see utils.categorize_series).
+        
+        Args:
+            descriptions (Series): Transaction descriptions
             
-            # Add user_id to transaction if not present
-            if 'user_id' not in transaction and self.username:
-                transaction['user_id'] = self.username
-                
-            # Read existing transactions
-            df = self.get_transactions()
+        Returns:
+            Series: Assigned categories, with the same index as descriptions
+        """
+        categories = categorize_series(descriptions, self.username, self.memo)
+        return self.apply_category_model(descriptions, categories)
+    
+    def apply_category_model(self, descriptions, categories):
+        """Replace rule-based categories with the classifier's confident predictions
+        
+        This is the second half of categorize, for callers that ran
+        categorize_series elsewhere, like the workers of batch_ingest.py.
+        Descriptions of merchants the user corrected keep their category.
+        
+        Args:
+            descriptions (Series): Transaction descriptions
+            categories (Series): Rule-based categories, with the same index
             
-            # Convert to DataFrame and append
-            new_df = pd.DataFrame([transaction])
+        Returns:
+            Series: Assigned categories, with the same index as descriptions
+        """
+        model = self.category_model() if len(descriptions) else None
+        if model is None:
+            return categories
+        
+        labels, confidence = model.predict(descriptions)
+        confident = (confidence >= CONFIDENCE_THRESHOLD) & descriptions.notna().to_numpy()
+        
+        corrections = self.memo.corrections(self.username)
+        if corrections:
+            codes, uniques = pd.factorize(descriptions)
+            corrected = np.array([normalize_merchant(description) in corrections for description in uniques] + [False])
+            confident &= ~corrected[codes]
+        
+        return categories.mask(confident, pd.Series(labels, index=descriptions.index))
+    
+    def add_transaction(self, transaction, dedupe=True):
+        """Add a new transaction to the user's storage
+        
+        Args:
+            transaction (dict): A dictionary containing transaction details
+            dedupe (bool): Skip the transaction if one with the same date,
+                amount and description is already stored (see add_transactions)
             
-            # Read all transactions (without user filtering)
+        Returns:
+            bool: True if the transaction was stored
+        """
+        result = self.add_transactions([transaction], dedupe=dedupe)
+        return result['inserted'] == 1
+    
+    def add_transactions(self, transactions, dedupe=True):
+        """Add a batch of transactions with a single write
+        
+        Every transaction is validated and normalized first (dates are stored
+        as YYYY-MM-DD, user_id is stamped and a stable transaction_id is
+        assigned). Invalid rows are rejected, and rows without a category
+        are categorized from their descriptions in one batch (see
+        categorize). Rows whose transaction_id is already stored or repeated
+        in the batch are skipped, and so are rows without a transaction_id whose date, amount and description
+        match a stored row, unless dedupe is False. The checks use the
+        persistent index in dedup_index.py. The remaining rows are persisted
+        in one write, so readers see either none or all of the batch.
+        
+        Args:
+            transactions (iterable): Transaction dictionaries to add
+            dedupe (bool): Also skip rows without a transaction_id that match
+                a stored row by date, amount and description
+            
+        Returns:
+            dict: Counts of 'inserted', 'skipped' and 'rejected' transactions
+        """
+        result = {'inserted': 0, 'skipped': 0, 'rejected': 0}
+        candidates = []
+        
+        for transaction in transactions:
             try:
-                all_df = pd.read_csv(self.file_path)
-            except:
-                all_df = pd.DataFrame(columns=new_df.columns)
-                
-            # Combine and save
-            combined_df = pd.concat([all_df, new_df], ignore_index=True)
-            combined_df.to_csv(self.file_path, index=False)
+                candidates.append(self._normalize_transaction(transaction))
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Rejected transaction: {e}")
+                result['rejected'] += 1
             
-            return True
+        if not candidates:
+            return result
+        
+        uncategorized = [row for row in candidates if not isinstance(row.get('category'), str) or not row['category']]
+        if uncategorized:
+            categories = self.categorize(pd.Series([row['description'] for row in uncategorized], dtype=object))
+            for row, category in zip(uncategorized, categories):
+                row['category'] = category
+        
+        try:
+            with self.versions.committing(), self.dedup.tracking() as dedup_update, \
+                    self.rollups.tracking() as rollup_update:
+                rows = dedup_update.new_rows(candidates, fingerprints=dedupe)
+                stored = self.storage.append(rows) if rows else 0
+                if stored == len(rows):
+                    dedup_update.add(rows)
+                    rollup_update.add(rows)
+                else:
+                    # Which rows the backend skipped is not known
+                    dedup_update.invalidate()
+                    rollup_update.invalidate()
+            result['inserted'] = stored
+            result['skipped'] = len(candidates) - stored
         except Exception as e:
-            print(f"Error adding transaction: {e}")
-            return False
+            print(f"Error adding transactions: {e}")
+            result['rejected'] += len(candidates)
+        
+        return result
+    
+    def import_mpesa_statement(self, source, batch_size=STATEMENT_BATCH_SIZE, statement_format=None):
+        """Import an M-Pesa statement of any size in fixed-size batches
+        
+        The statement is parsed as it is read (see statement_parsers.py) and
+        every batch_size transactions are categorized and stored with one
+        add_transactions call, so memory stays bounded by the batch size.
+        Each batch is committed on its own: if the import stops halfway, the
+        batches already stored stay, and importing the statement again skips
+        them as duplicates.
+        
+        Args:
+            source: Statement text, a file object or an iterable of lines
+            batch_size (int): Transactions per bulk insert
+            statement_format (str): 'statement', 'sms' or 'simple' (default:
+                detected from the start of the statement)
+            
+        Returns:
+            dict: Counts of 'inserted', 'skipped' and 'rejected' transactions
+            
+        Raises:
+            ValueError: If statement_format is unknown
+        """
+        result = {'inserted': 0, 'skipped': 0, 'rejected': 0}
+        transactions = iter_statement(source, statement_format)
+        while True:
+            batch = list(islice(transactions, batch_size))
+            if not batch:
+                return result
+            for key, count in self.add_transactions(batch).items():
+                result[key] += count
+    
+    def _normalize_transaction(self, transaction):
+        """Validate a transaction and convert it to its stored form
+        
+        Args:
+            transaction (dict): A dictionary containing transaction details
+            
+        Returns:
+            dict: A normalized copy of the transaction
+            
+        Raises:
+            KeyError: If a required field is missing
+            ValueError: If a field has an invalid value
+        """
+        row = dict(transaction)
+        
+        for field in ('date', 'description', 'amount', 'type'):
+            if field not in row or row[field] is None:
+                raise KeyError(f"missing required field '{field}'")
+        
+        # Store dates as YYYY-MM-DD strings
+        if isinstance(row['date'], (datetime, date)):
+            row['date'] = row['date'].strftime('%Y-%m-%d')
+        else:
+            row['date'] = pd.Timestamp(row['date']).strftime('%Y-%m-%d')
+        
+        amount = float(row['amount'])
+        if math.isnan(amount) or amount < 0:
+            raise ValueError(f"invalid amount {row['amount']!r}")
+        # Amounts are kept to whole cents
+        row['amount'] = round(amount, 2)
+        
+        if row['type'] not in ('income', 'expense'):
+            raise ValueError(f"invalid transaction type {row['type']!r}")
+        
+        # Add user_id to transaction if not present
+        if 'user_id' not in row and self.username:
+            row['user_id'] = self.username
+        
+        # Keep the M-Pesa transaction id / receipt as the stable id when present
+        if row.get('transaction_id'):
+            row['transaction_id'] = str(row['transaction_id'])
+        else:
+            row['transaction_id'] = new_transaction_id()
+        
+        return row
+    
+    def get_transaction(self, transaction_id):
+        """Get a single transaction by its id
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            
+        Returns:
+            dict: The transaction, or None if it does not exist or belongs to
+                another user
+        """
+        try:
+            transaction = self.storage.get_by_id(transaction_id)
+        except Exception as e:
+            print(f"Error reading transaction: {e}")
+            return None
+        
+        if transaction and self.username and transaction.get('user_id') != self.username:
+            return None
+        return transaction
     
     def update_transaction_category(self, transaction_idx, new_category):
         """Update the category of a specific transaction
         
+        A correction by transaction_id is also remembered for the
+        transaction's merchant (see merchant_memo.py), so the merchant's
+        future transactions are categorized the same way.
+        
         Args:
-            transaction_idx (int): The index of the transaction to update
+            transaction_idx (int or str): The transaction_id of the transaction
+                to update, or its index in the DataFrame from get_transactions
             new_category (str): The new category to assign
         """
         try:
-            # Read all transactions
-            all_df = pd.read_csv(self.file_path)
+            # A category change leaves the dedup keys as they are
+            with self.versions.committing(), self.dedup.tracking(), self.rollups.tracking() as rollup_update:
+                if isinstance(transaction_idx, str):
+                    before = self.storage.get_by_id(transaction_idx)
+                    updated = self.storage.update_category_by_id(transaction_idx, new_category, user_id=self.username)
+                    if updated:
+                        rollup_update.remove([before])
+                        rollup_update.add([dict(before, category=new_category)])
+                else:
+                    updated = self.storage.update_category(transaction_idx, new_category, user_id=self.username)
+                    rollup_update.invalidate()
             
             # Ensure we're only updating the user's own transactions
-            if self.username and 'user_id' in all_df.columns:
-                if transaction_idx not in all_df.index or all_df.loc[transaction_idx, 'user_id'] != self.username:
-                    print("Unauthorized attempt to update transaction")
-                    return False
+            if not updated:
+                print("Unauthorized attempt to update transaction")
+                return False
             
-            # Update the category
-            all_df.loc[transaction_idx, 'category'] = new_category
-            
-            # Save back to CSV
-            all_df.to_csv(self.file_path, index=False)
+            # Remember the choice for the merchant's future transactions
+            if isinstance(transaction_idx, str):
+                try:
+                    self.memo.record(self.username, before['description'], new_category)
+                except Exception as e:
+                    print(f"Error recording category correction: {e}")
             
             return True
         except Exception as e:
@@ -136,32 +519,226 @@ class DataManager:
             return False
     
     def delete_transaction(self, transaction_idx):
-        """Delete a transaction by its index
+        """Delete a transaction by its id or index
         
         Args:
-            transaction_idx (int): The index of the transaction to delete
+            transaction_idx (int or str): The transaction_id of the transaction
+                to delete, or its index in the DataFrame from get_transactions
         """
         try:
-            # Read all transactions
-            all_df = pd.read_csv(self.file_path)
+            with self.versions.committing(), self.dedup.tracking() as dedup_update, \
+                    self.rollups.tracking() as rollup_update:
+                if isinstance(transaction_idx, str):
+                    before = self.storage.get_by_id(transaction_idx)
+                    deleted = self.storage.delete_by_id(transaction_idx, user_id=self.username)
+                    if deleted:
+                        dedup_update.remove([before])
+                        rollup_update.remove([before])
+                else:
+                    deleted = self.storage.delete(transaction_idx, user_id=self.username)
+                    dedup_update.invalidate()
+                    rollup_update.invalidate()
             
             # Ensure we're only deleting the user's own transactions
-            if self.username and 'user_id' in all_df.columns:
-                if transaction_idx not in all_df.index or all_df.loc[transaction_idx, 'user_id'] != self.username:
-                    print("Unauthorized attempt to delete transaction")
-                    return False
+            if not deleted:
+                print("Unauthorized attempt to delete transaction")
+                return False
+            
+            return True
+        except Exception as e:
+            print(f"Error deleting transaction: {e}")
+            return False
+    
+    def _read_storage(self, **filters):
+        """Read the current user's transactions from the storage backend
+        
+        Args:
+            **filters: Filters accepted by the backend's read method
+            
+        Returns:
+            DataFrame: Transactions of the current user
+        """
+        # Filter by username if set
+        if self.username:
+            filters['user_id'] = self.username
+        
+        return apply_transaction_schema(self.storage.read(**filters))
+        
+    def query(self, start=None, end=None, categories=None, types=None, sources=None,
+              columns=None, limit=None, order=None):
+        """Read the transactions matching the given filters
+    
+        Filters, column projection, ordering and the row limit are pushed
+        down to the storage backend, so only the needed columns and rows are
+        read where the backend supports it. Like get_transactions, a query
+        never sees a write half-applied.
+        
+        Args:
+            start (datetime): Inclusive start date (optional)
+            end (datetime): Inclusive end date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep, e.g. ['expense'] (optional)
+            sources (list): Sources to keep, e.g. ['mpesa'] (optional)
+            columns (list): Columns to return (default: all)
+            limit (int): Maximum number of rows to return (optional)
+            order: Column name or list of them to sort by, with a '-' prefix
+                for descending order, e.g. '-date' (default: storage order)
+            
+        Returns:
+            DataFrame: Matching transactions of the current user
+        """
+        try:
+            return self._consistent_read(lambda: self._read_storage(
+                columns=columns, start_date=start, end_date=end, categories=categories,
+                types=types, sources=sources, order=order, limit=limit
+            ))
+        except Exception as e:
+            print(f"Error reading transactions: {e}")
+            return pd.DataFrame(columns=columns or TRANSACTION_COLUMNS)
+    
+    def _consistent_read(self, read):
+        """Run a read of the store that never sees a write half-applied
+        
+        Args:
+            read (callable): Reads from the store and returns the result
             
-            # Remove the transaction
-            all_df = all_df.drop(transaction_idx)
+        Returns:
+            The result of a read during which the store did not change
+        """
+        for attempt in range(OPTIMISTIC_READ_ATTEMPTS + READ_RETRY_ATTEMPTS):
+            source = self.versions.current()[1]
+            if self.versions.source() == source:
+                result = read()
+                if self.versions.source() == source:
+                    return result
+        
+            # Let the writer finish rather than hold it off
+            if attempt >= OPTIMISTIC_READ_ATTEMPTS - 1:
+                time.sleep(READ_RETRY_SECONDS)
+        
+        # Writes kept landing during the read, so hold them off for one read
+        with self.versions.lock:
+            return read()
+    
+    def iter_transactions(self, chunk_size=DEFAULT_CHUNK_SIZE, start=None, end=None, categories=None,
+                          types=None, sources=None, columns=None):
+        """Stream the current user's transactions in typed chunks
+        
+        Only one chunk is held in memory at a time (on backends that stream),
+        so this works on histories too big to load with get_transactions.
+        Unlike the other read methods, storage errors are raised rather than
+        swallowed, so callers never aggregate over a silently truncated stream.
+        
+        Args:
+            chunk_size (int): Maximum number of rows per chunk
+            start (datetime): Inclusive start date (optional)
+            end (datetime): Inclusive end date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            columns (list): Columns to return (default: all)
             
-            # Save back to CSV
-            all_df.to_csv(self.file_path, index=False)
+        Yields:
+            DataFrame: Chunks of transactions with the compact schema
+        """
+        filters = {}
+        if self.username:
+            filters['user_id'] = self.username
+        
+        chunks = self.storage.iter_chunks(
+            chunk_size, columns=columns, start_date=start, end_date=end, categories=categories,
+            types=types, sources=sources, **filters
+        )
+        for chunk in chunks:
+            yield apply_transaction_schema(chunk)
+    
+    def get_rollup(self, level='day', start=None, end=None, categories=None, types=None):
+        """Get pre-aggregated amounts of the current user's transactions
+        
+        The rollups are maintained on every write made through DataManager,
+        so this reads one row per day (or month), category and type instead
+        of every transaction. The result has the 'date', 'category', 'type'
+        and 'amount' columns the chart functions in visualization.py use.
+        
+        Args:
+            level (str): 'day' or 'month'
+            start (datetime): Inclusive start date (optional)
+            end (datetime): Inclusive end date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
             
+        Returns:
+            DataFrame: Columns 'date', 'category', 'type', 'amount' and 'count'
+        """
+        try:
+            df = self.rollups.frame(level)
+        except Exception as e:
+            print(f"Error reading rollups: {e}")
+            return pd.DataFrame(columns=['date', 'category', 'type', 'amount', 'count'])
+        
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= df['date'] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= df['date'] <= pd.Timestamp(end)
+        if categories is not None:
+            mask &= df['category'].isin(list(categories))
+        if types is not None:
+            mask &= df['type'].isin(list(types))
+        return df[mask].reset_index(drop=True)
+    
+    def get_totals(self):
+        """Get the current user's total income, expenses and balance
+        
+        Returns:
+            dict: 'income', 'expense' and 'balance' amounts
+        """
+        try:
+            return self.rollups.totals()
+        except Exception as e:
+            print(f"Error reading rollups: {e}")
+            return {'income': 0.0, 'expense': 0.0, 'balance': 0.0}
+    
+    def rebuild_rollups(self):
+        """Recompute the current user's rollups from the stored transactions
+        
+        Returns:
+            bool: True if the rollups were rebuilt
+        """
+        try:
+            self.rollups.rebuild()
             return True
         except Exception as e:
-            print(f"Error deleting transaction: {e}")
+            print(f"Error rebuilding rollups: {e}")
             return False
     
+    def recategorize_transactions(self):
+        """Re-run automatic categorization over every stored transaction
+        
+        The whole store is categorized in one batch with categorize, the same
+        rules, corrections and classifier new transactions get, and the
+        changed categories are written in one update that leaves every other
+        column as it was stored. Merchants whose category the user corrected
+        keep the corrected category; other categories set by hand are
+        overwritten.
+        
+        Returns:
+            int: Number of transactions whose category changed, or -1 on error
+        """
+        try:
+            # A category change leaves the dedup keys as they are
+            with self.versions.committing(), self.dedup.tracking(), self.rollups.tracking() as rollup_update:
+                df = self.storage.read(columns=['description', 'category'])
+                categories = self.categorize(df['description'])
+                changed = categories.ne(df['category'].astype(object))
+                if changed.any():
+                    self.storage.update_categories(categories[changed])
+                    rollup_update.invalidate()
+            return int(changed.sum())
+        except Exception as e:
+            print(f"Error recategorizing transactions: {e}")
+            return -1
+    
     def get_transactions_by_date_range(self, start_date, end_date):
         """Get transactions within a specific date range
         
@@ -172,21 +749,7 @@ class DataManager:
         Returns:
             DataFrame: Filtered transactions
         """
-        df = self.get_transactions()
-        
-        if df.empty:
-            return df
-            
-        # Convert dates to pandas datetime format for consistent comparison
-        start_date_pd = pd.to_datetime(start_date)
-        end_date_pd = pd.to_datetime(end_date)
-        
-        # Ensure df['date'] is pandas datetime
-        df['date'] = pd.to_datetime(df['date'])
-        
-        # Filter by date range
-        mask = (df['date'] >= start_date_pd) & (df['date'] <= end_date_pd)
-        return df[mask]
+        return self.query(start=start_date, end=end_date)
     
     def get_transactions_by_category(self, category):
         """Get transactions for a specific category
@@ -197,10 +760,4 @@ class DataManager:
         Returns:
             DataFrame: Filtered transactions
         """
-        df = self.get_transactions()
-        
-        if df.empty:
-            return df
-            
-        # Filter by category
-        return df[df['category'] == category]
+        return self.query(categories=[category])
@@ -0,0 +1,342 @@
+"""
+Persistent index of stored transactions for duplicate detection
+
+Re-importing M-Pesa statements or receiving a retried callback would store
+the same transaction twice. DataManager checks every new row against this
+index before writing it:
+
+- every stored row is indexed by its transaction_id (the M-Pesa transaction
+  id or receipt when there is one), and
+- rows that came without an id (the id was generated on insert) are also
+  indexed by a fingerprint of their date, amount and normalized description.
+
+The index lives in `data/dedup/<username>.log` as JSON lines: a header naming
+the file, then one record per write with the keys it added and removed and
+the storage signature after the write. It is loaded once per process and
+only the records appended since are parsed, so checks are set lookups. When
+the store changed in a way the index did not see, the recorded signature no
+longer matches and the index is rebuilt from the store before it is used.
+"""
+
+import os
+import re
+import json
+import uuid
+import threading
+from collections import Counter
+from contextlib import contextmanager
+import pandas as pd
+from file_lock import FileLock, atomic_write
+
+# Ids generated by storage.new_transaction_id (rows imported without an id)
+GENERATED_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+# Number of rows per chunk when rebuilding from the store
+REBUILD_CHUNK_SIZE = 100000
+
+# Number of records appended before the log is rewritten in compact form
+COMPACT_RECORDS = 1000
+
+def normalize_description(description):
+    """Normalize a description for fingerprinting
+    
+    Args:
+        description (str): Transaction description
+    
+    Returns:
+        str: Lowercased description with whitespace collapsed
+    """
+    return ' '.join(str(description).lower().split())
+
+def transaction_fingerprint(transaction):
+    """Fingerprint a transaction by its date, amount and description
+    
+    Args:
+        transaction (dict): Transaction with 'date', 'amount' and 'description'
+    
+    Returns:
+        str: Fingerprint such as '2025-04-01|1000.00|grocery shopping'
+    """
+    day = pd.Timestamp(transaction['date']).strftime('%Y-%m-%d')
+    return f"{day}|{float(transaction['amount']):.2f}|{normalize_description(transaction['description'])}"
+
+def transaction_keys(transaction):
+    """Get the index keys of a transaction
+    
+    Args:
+        transaction (dict): Normalized transaction with a 'transaction_id'
+    
+    Returns:
+        list: The id key, followed by the fingerprint key if the id was
+            generated rather than supplied
+    """
+    transaction_id = str(transaction['transaction_id'])
+    keys = [f"id:{transaction_id}"]
+    if GENERATED_ID_PATTERN.match(transaction_id):
+        keys.append(f"fp:{transaction_fingerprint(transaction)}")
+    return keys
+
+def _frame_keys(chunk):
+    """Get the index keys of every row of a chunk of stored transactions
+    
+    Args:
+        chunk (DataFrame): Columns 'date', 'amount', 'description' and
+            'transaction_id'
+    
+    Returns:
+        list: Keys of all rows
+    """
+    # Files written before ids were introduced have no transaction_id column
+    if 'transaction_id' in chunk.columns:
+        stored_ids = chunk['transaction_id']
+    else:
+        stored_ids = pd.Series(None, index=chunk.index, dtype=object)
+    ids = stored_ids.astype(str)
+    keys = ('id:' + ids[stored_ids.notna()]).tolist()
+    
+    generated = stored_ids.isna() | ids.str.fullmatch(GENERATED_ID_PATTERN.pattern)
+    if generated.any():
+        rows = chunk[generated]
+        fingerprints = (
+            'fp:' + pd.to_datetime(rows['date']).dt.strftime('%Y-%m-%d')
+            + '|' + pd.to_numeric(rows['amount']).map('{:.2f}'.format)
+            + '|' + rows['description'].astype(str).str.lower().str.split().str.join(' ')
+        )
+        keys.extend(fingerprints.tolist())
+    
+    return keys
+
+class DedupUpdate:
+    """Duplicate checks and index changes for one storage write"""
+    
+    def __init__(self, counts):
+        """Initialize the update
+        
+        Args:
+            counts (Counter): Number of stored rows per key
+        """
+        self.counts = counts
+        self.added = []
+        self.removed = []
+        self.unknown = False
+    
+    def new_rows(self, rows, fingerprints=True):
+        """Drop rows that are already stored or repeat an earlier row
+        
+        Args:
+            rows (list): Normalized transactions
+            fingerprints (bool): Also treat rows without a supplied id as
+                duplicates when their date, amount and description match
+        
+        Returns:
+            list: Rows that are not duplicates
+        """
+        seen = set()
+        fresh = []
+        for row in rows:
+            keys = transaction_keys(row)
+            checked = keys if fingerprints else keys[:1]
+            if any(self.counts[key] > 0 or key in seen for key in checked):
+                continue
+            seen.update(keys)
+            fresh.append(row)
+        return fresh
+    
+    def add(self, rows):
+        """Record rows that were stored
+        
+        Args:
+            rows (list): Normalized transactions
+        """
+        for row in rows:
+            self.added.extend(transaction_keys(row))
+    
+    def remove(self, rows):
+        """Record rows that were deleted
+        
+        Args:
+            rows (list): Transactions as they were stored
+        """
+        for row in rows:
+            self.removed.extend(transaction_keys(row))
+    
+    def invalidate(self):
+        """Record that the write's effect on the index is not known"""
+        self.unknown = True
+
+class DedupIndex:
+    """Index of a user's stored transactions by id and fingerprint"""
+    
+    # Parsed index logs shared by every instance in the process, by path
+    _loaded = {}
+    _loaded_lock = threading.Lock()
+    
+    def __init__(self, storage, username=None, data_dir="data"):
+        """Initialize the index of a user's store
+        
+        Args:
+            storage (StorageBackend): The user's transaction store
+            username (str): Username (if None, the shared store is used)
+            data_dir (str): Base directory for data storage
+        """
+        self.storage = storage
+        self.username = username
+        self.path = os.path.join(data_dir, "dedup", f"{username or '_shared'}.log")
+        self.lock = FileLock(self.path + '.lock')
+    
+    @contextmanager
+    def tracking(self):
+        """Check for duplicates and keep the index in step with a write
+        
+        The index is brought up to date (rebuilt if the store changed
+        behind its back) and held locked while the block runs, so no other
+        writer can store the same transaction between the check and the
+        write. The changes recorded on the yielded DedupUpdate are appended
+        to the index afterwards.
+        
+        Yields:
+            DedupUpdate: Duplicate checks and the keys added and removed
+        """
+        with self.lock:
+            state = self._current()
+            
+            update = DedupUpdate(state['counts'])
+            yield update
+            
+            if update.unknown:
+                return
+            
+            source = self._source()
+            if update.added or update.removed or source != state['source']:
+                self._append(state, {'add': update.added, 'remove': update.removed, 'source': source})
+    
+    def rebuild(self):
+        """Recompute the index from every stored transaction
+        
+        Returns:
+            dict: The new index state
+        """
+        with self.lock:
+            source = self._source()
+            counts = Counter()
+            
+            chunks = self.storage.iter_chunks(
+                REBUILD_CHUNK_SIZE, columns=['date', 'amount', 'description', 'transaction_id'],
+                user_id=self.username
+            )
+            for chunk in chunks:
+                counts.update(_frame_keys(chunk))
+            
+            return self._rewrite(counts, source)
+    
+    def _source(self):
+        """Identify the store and the version of it the index describes
+        
+        Returns:
+            list: Storage identity and signature, as stored in JSON
+        """
+        return self.storage.source()
+    
+    def _current(self):
+        """Load the index, rebuilding it if it does not match the store
+        
+        Returns:
+            dict: Index state with 'counts' and 'source'
+        """
+        state = self._load()
+        if state is None or state['source'] != self._source():
+            state = self.rebuild()
+        return state
+    
+    def _load(self):
+        """Load the index log, parsing only the records added since the last call
+        
+        Returns:
+            dict: Index state, or None if there is no usable index
+        """
+        with self._loaded_lock:
+            try:
+                size = os.stat(self.path).st_size
+            except FileNotFoundError:
+                self._loaded.pop(self.path, None)
+                return None
+            
+            with open(self.path, 'rb') as f:
+                first_line = f.readline()
+            
+            state = self._loaded.get(self.path)
+            if state is None or state['first_line'] != first_line or state['offset'] > size:
+                state = {'first_line': first_line, 'offset': 0, 'records': 0, 'counts': Counter(), 'source': None}
+            
+            if state['offset'] < size:
+                self._read_from(state)
+            
+            self._loaded[self.path] = state
+            return state
+    
+    def _read_from(self, state):
+        """Parse the complete records after the last parsed offset
+        
+        Args:
+            state (dict): Index state to extend in place
+        """
+        with open(self.path, 'rb') as f:
+            f.seek(state['offset'])
+            data = f.read()
+        
+        # Leave a record that is still being written for the next call
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn record from an interrupted write
+                state['source'] = None
+                continue
+            
+            if 'index' in record:
+                continue
+            state['counts'].update(record.get('add', []))
+            state['counts'].subtract(record.get('remove', []))
+            state['source'] = record.get('source')
+            state['records'] += 1
+        
+        state['offset'] += len(complete)
+    
+    def _append(self, state, record):
+        """Append one record to the index log
+        
+        Args:
+            state (dict): Current index state
+            record (dict): Keys added and removed, and the new source
+        """
+        if state['records'] >= COMPACT_RECORDS:
+            state['counts'].update(record['add'])
+            state['counts'].subtract(record['remove'])
+            self._rewrite(state['counts'], record['source'])
+            return
+        
+        with open(self.path, 'ab', buffering=0) as f:
+            f.write((json.dumps(record) + '\n').encode('utf-8'))
+        self._load()
+    
+    def _rewrite(self, counts, source):
+        """Write the whole index as a new log in one step
+        
+        Args:
+            counts (Counter): Number of stored rows per key
+            source (list): Storage identity and signature the counts describe
+        
+        Returns:
+            dict: The new index state
+        """
+        keys = [key for key, count in counts.items() for _ in range(count)]
+        lines = [
+            json.dumps({'index': uuid.uuid4().hex}),
+            json.dumps({'add': keys, 'remove': [], 'source': source})
+        ]
+        
+        with atomic_write(self.path) as f:
+            f.write('\n'.join(lines) + '\n')
+        
+        return self._load()
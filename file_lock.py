@@ -0,0 +1,142 @@
+"""
+Advisory file locks for transaction writers
+
+Several Streamlit workers and the M-Pesa callback handlers can write to the
+same user's transaction store at once. Every read-modify-write cycle on a
+store runs under an exclusive `fcntl.flock` lock on a `.lock` file next to
+it, so concurrent writers are serialized across processes. Readers do not
+take the lock; writers replace files by renaming a finished temp file over
+them (see atomic_write), so a reader always sees either the old or the new
+file.
+
+The lock is re-entrant within a thread, so a locked method may call other
+locked methods of the same store. On platforms without fcntl only threads
+of the same process are serialized.
+"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Per lock path: the thread lock, the nesting depth and the open lock file
+_lock_states = {}
+_lock_states_guard = threading.Lock()
+
+def _lock_state(path):
+    """Get the in-process state of a lock file
+    
+    Args:
+        path (str): Absolute path of the lock file
+    
+    Returns:
+        dict: Thread lock, nesting depth and file descriptor
+    """
+    with _lock_states_guard:
+        state = _lock_states.get(path)
+        if state is None:
+            state = {'thread_lock': threading.RLock(), 'depth': 0, 'fd': None}
+            _lock_states[path] = state
+        return state
+
+@contextmanager
+def atomic_write(path, mode='w', suffix='.tmp', **open_args):
+    """Replace a file in one step with what is written inside the block
+    
+    The data goes to a temporary file in the same directory, which is
+    renamed over the file once the block finishes. If the block raises, the
+    temporary file is removed and the file is left unchanged.
+    
+    Args:
+        path (str): File to replace (its directory is created if needed)
+        mode (str): Mode to open the temporary file in
+        suffix (str): Suffix of the temporary file name
+        **open_args: Other arguments for opening the file, like newline
+    
+    Yields:
+        file: The open temporary file
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=suffix)
+    try:
+        with os.fdopen(fd, mode, **open_args) as f:
+            yield f
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+class FileLock:
+    """Exclusive, re-entrant, cross-process lock on a lock file"""
+    
+    def __init__(self, path):
+        """Initialize the lock
+        
+        Args:
+            path (str): Path of the lock file (created on first use)
+        """
+        self.path = os.path.abspath(path)
+    
+    def acquire(self, blocking=True):
+        """Take the lock for the calling thread
+        
+        Args:
+            blocking (bool): Wait until the lock is free; if False, give up
+                at once when another thread or process holds it
+        
+        Returns:
+            bool: True if the lock is now held by the calling thread
+        """
+        state = _lock_state(self.path)
+        if not state['thread_lock'].acquire(blocking):
+            return False
+        
+        if state['depth'] == 0:
+            fd = None
+            try:
+                directory = os.path.dirname(self.path)
+                if not os.path.exists(directory):
+                    os.makedirs(directory, exist_ok=True)
+                fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                state['thread_lock'].release()
+                return False
+            except BaseException:
+                state['thread_lock'].release()
+                raise
+            state['fd'] = fd
+        
+        state['depth'] += 1
+        return True
+    
+    def release(self):
+        """Release one level of the lock"""
+        state = _lock_state(self.path)
+        state['depth'] -= 1
+        
+        if state['depth'] == 0:
+            fd = state['fd']
+            state['fd'] = None
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        
+        state['thread_lock'].release()
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+        return False
@@ -133,7 +133,7 @@ def analyze_spending_patterns(transactions_df):
         return {"categories": ["general", "saving"], "has_data": False}
     
     # Analyze spending by category
-    category_spending = expenses_df.groupby("category")["amount"].sum()
+    category_spending = expenses_df.groupby("category", observed=True)["amount"].sum()
     
     # Check if there's enough historical data
     earliest_date = transactions_df["date"].min()
@@ -0,0 +1,183 @@
+"""
+Append-only journal of category updates and deletes for CSV transaction files
+
+Changing or removing a row in the middle of a CSV file means rewriting the
+file. Instead, the CSV backend records the change as one JSON line in
+`<file>.journal` and applies the journal when it reads the file. Once the
+journal grows past EROPIA_JOURNAL_COMPACT_BYTES (default 1 MB) it is folded
+into the CSV file in the background and removed.
+
+Entries are keyed by transaction_id and are idempotent, so replaying a
+journal that was already partly applied (for example after a crash during
+compaction) gives the same result. The first line of every journal names
+it with a random id, so a parsed journal is never mistaken for a new file
+that happens to reuse its inode.
+"""
+
+import os
+import json
+import uuid
+import threading
+
+# Environment variable holding the journal size that triggers a compaction
+JOURNAL_COMPACT_BYTES_ENV = "EROPIA_JOURNAL_COMPACT_BYTES"
+
+# Default journal size that triggers a compaction
+DEFAULT_JOURNAL_COMPACT_BYTES = 1024 * 1024
+
+def journal_compact_bytes():
+    """Get the journal size that triggers a compaction
+    
+    Returns:
+        int: Size in bytes
+    """
+    return int(os.getenv(JOURNAL_COMPACT_BYTES_ENV, DEFAULT_JOURNAL_COMPACT_BYTES))
+
+class TransactionJournal:
+    """Journal of category updates and deletes keyed by transaction_id"""
+    
+    # Parsed journals shared by every instance in the process, by path
+    _loaded = {}
+    _lock = threading.Lock()
+    
+    def __init__(self, path):
+        """Initialize the journal
+        
+        Args:
+            path (str): Path of the journal file (created on first append)
+        """
+        self.path = path
+    
+    def size(self):
+        """Get the size of the journal file
+        
+        Returns:
+            int: Size in bytes, 0 if there is no journal
+        """
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+    
+    def signature(self):
+        """Get the modification time and size of the journal, for caching
+        
+        Returns:
+            tuple: Modification time in nanoseconds and size, or (0, 0)
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return (0, 0)
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def append(self, entries):
+        """Add entries to the end of the journal in one write
+        
+        Args:
+            entries (list): Dictionaries with an 'op' ('update' or 'delete'),
+                a 'transaction_id' and, for updates, a 'category'
+        """
+        payload = ''.join(json.dumps(entry) + '\n' for entry in entries).encode('utf-8')
+        
+        with open(self.path, 'a+b', buffering=0) as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                payload = (json.dumps({'op': 'begin', 'journal': uuid.uuid4().hex}) + '\n').encode('utf-8') + payload
+            else:
+                # Never glue an entry to the torn tail of an interrupted write
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    payload = b'\n' + payload
+            f.write(payload)
+    
+    def state(self):
+        """Get the effect of the journal
+        
+        Only entries appended since the last call are parsed.
+        
+        Returns:
+            tuple: (dict of transaction_id -> new category, set of deleted ids)
+        """
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                self._loaded.pop(self.path, None)
+                return {}, set()
+            
+            with open(self.path, 'rb') as f:
+                first_line = f.readline()
+            
+            state = self._loaded.get(self.path)
+            if state is None or state['first_line'] != first_line or state['offset'] > stat.st_size:
+                state = {'first_line': first_line, 'offset': 0, 'categories': {}, 'deleted': set()}
+            
+            if state['offset'] < stat.st_size:
+                self._read_from(state)
+            
+            self._loaded[self.path] = state
+            return state['categories'], state['deleted']
+    
+    def apply(self, df):
+        """Apply the journal to transactions read from the CSV file
+        
+        Args:
+            df (DataFrame): Transactions with a 'transaction_id' column
+        
+        Returns:
+            DataFrame: Transactions with updated categories and without
+                deleted rows
+        """
+        categories, deleted = self.state()
+        if (not categories and not deleted) or df.empty or 'transaction_id' not in df.columns:
+            return df
+        
+        ids = df['transaction_id'].astype(str)
+        if deleted:
+            keep = ~ids.isin(deleted)
+            df = df[keep]
+            ids = ids[keep]
+        
+        if categories and 'category' in df.columns:
+            updated = ids.isin(categories.keys())
+            if updated.any():
+                df = df.copy()
+                df.loc[updated, 'category'] = ids[updated].map(categories)
+        
+        return df
+    
+    def clear(self):
+        """Remove the journal once it has been folded into the CSV file"""
+        with self._lock:
+            self._loaded.pop(self.path, None)
+            if os.path.exists(self.path):
+                os.remove(self.path)
+    
+    def _read_from(self, state):
+        """Parse the complete entries after the last parsed offset
+        
+        Args:
+            state (dict): Parsed journal state to extend in place
+        """
+        with open(self.path, 'rb') as f:
+            f.seek(state['offset'])
+            data = f.read()
+        
+        # Leave an entry that is still being written for the next call
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Torn entry from an interrupted write
+                continue
+            
+            transaction_id = str(entry.get('transaction_id'))
+            if entry.get('op') == 'update':
+                state['categories'][transaction_id] = entry.get('category')
+            elif entry.get('op') == 'delete':
+                state['deleted'].add(transaction_id)
+                state['categories'].pop(transaction_id, None)
+        
+        state['offset'] += len(complete)
@@ -0,0 +1,280 @@
+"""
+Merchant-level memo of transaction categories
+
+M-Pesa descriptions repeat heavily ("M-PESA Payment to KPLC"), so the
+category of a description is memoized: a bounded in-process LRU maps each
+(user, description) already categorized to its category, and repeats
+resolve with one dictionary lookup instead of a scan of the rules.
+
+Category corrections made with DataManager.update_transaction_category are
+remembered per user and merchant, where the merchant is the description
+with the M-Pesa boilerplate, references and numbers stripped (see
+normalize_merchant). A corrected merchant gets the user's category from
+then on, before any rule is checked. Corrections persist in
+`data/merchant_memo.db` (SQLite), shared by every worker process: each
+process checks at most once per MEMO_CHECK_INTERVAL seconds whether another
+one recorded a correction, and drops its memo if so.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from datetime import datetime
+
+# Number of (user, description) categories kept in memory per memo
+MEMO_MAX_ENTRIES = 50000
+
+# Seconds between checks for corrections recorded by other processes
+MEMO_CHECK_INTERVAL = 1.0
+
+# Payment wording M-Pesa puts before the merchant name
+_BOILERPLATE = re.compile(
+    r'^(?:m-?pesa\s+)?(?:payment\s+to|paid\s+to|merchant\s+payment(?:\s+to)?|customer\s+transfer\s+to|'
+    r'pay\s*bill(?:\s+online)?(?:\s+to)?|buy\s+goods(?:\s+from)?|funds\s+received\s+from|received\s+from|sent\s+to)\s+'
+)
+
+# Reference, account and till numbers, and any other token with a digit
+_REFERENCES = re.compile(r'\b(?:ref|reference|acc|account|till|no)\b[.:#]?\s*\S*\d\S*|\S*\d\S*')
+
+def normalize_merchant(description):
+    """Reduce a description to the merchant it was paid to or received from
+    
+    Args:
+        description (str): Transaction description
+    
+    Returns:
+        str: Lowercased merchant name, e.g. 'kplc' for
+            'M-PESA Payment to KPLC Ref 4F7K2', or '' if nothing is left
+    """
+    text = ' '.join(str(description).lower().split())
+    text = _REFERENCES.sub(' ', text)
+    text = ' '.join(text.split())
+    text = _BOILERPLATE.sub('', text)
+    text = re.sub(r'\s+via\s+m-?pesa$', '', text)
+    return text.strip(' -:.,')
+
+class MerchantMemo:
+    """Memo of categories by description, with per-user merchant corrections"""
+    
+    def __init__(self, data_dir="data", max_entries=MEMO_MAX_ENTRIES, check_interval=MEMO_CHECK_INTERVAL):
+        """Initialize the memo
+        
+        Args:
+            data_dir (str): Base directory of the corrections database (if
+                None, corrections are kept in memory only)
+            max_entries (int): Number of categorized descriptions kept
+            check_interval (float): Seconds between checks for corrections
+                recorded by other processes (0 checks on every call)
+        """
+        self.db_path = os.path.join(data_dir, "merchant_memo.db") if data_dir is not None else None
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()
+        self._corrections = {}
+        self._generation = None
+        self._checked = float('-inf')
+        self.hits = 0
+        self.misses = 0
+    
+    def categorize(self, description, matcher, username=None):
+        """Get the category of a description, memoized
+        
+        Args:
+            description (str): Transaction description
+            matcher (RuleMatcher): Rules that apply to the user (see category_rules.py)
+            username (str): User whose corrections apply
+        
+        Returns:
+            str: The user's category for the merchant if they corrected it,
+                else the first matching rule's category, else 'Other'
+        """
+        self._refresh()
+        
+        lowered = description.lower()
+        key = (username, lowered)
+        with self._lock:
+            entry = self._entries.get(key)
+            # Entries computed with rules that have since been reloaded are stale
+            if entry is not None and entry[0] is matcher:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        
+        category = None
+        corrections = self._user_corrections(username)
+        # Most users never correct a category, so skip normalizing for them
+        if corrections:
+            category = corrections.get(normalize_merchant(lowered))
+        if category is None:
+            category = matcher.match(lowered) or 'Other'
+        
+        with self._lock:
+            self._entries[key] = (matcher, category)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return category
+    
+    def correction(self, username, merchant):
+        """Get the category a user chose for a merchant
+        
+        Args:
+            username (str): Username (None for the shared store)
+            merchant (str): Normalized merchant name
+        
+        Returns:
+            str: The corrected category, or None if the user never corrected it
+        """
+        if not merchant:
+            return None
+        
+        self._refresh()
+        return self._user_corrections(username).get(merchant)
+    
+    def corrections(self, username):
+        """Get every category a user chose for a merchant
+        
+        Args:
+            username (str): Username (None for the shared store)
+        
+        Returns:
+            dict: Normalized merchant name -> corrected category
+        """
+        self._refresh()
+        with self._lock:
+            return dict(self._user_corrections(username))
+    
+    def record(self, username, description, category):
+        """Remember the category a user chose for a transaction's merchant
+        
+        Args:
+            username (str): Username (None for the shared store)
+            description (str): Description of the corrected transaction
+            category (str): Category the user chose
+        
+        Returns:
+            bool: True if a correction was recorded
+        """
+        merchant = normalize_merchant(description)
+        if not merchant or not category:
+            return False
+        
+        with self._lock:
+            if self.db_path is not None:
+                with closing(self._connect()) as connection, connection:
+                    generation = connection.execute("SELECT generation FROM meta").fetchone()[0]
+                    if generation != self._generation:
+                        # Another process recorded corrections this one has not seen
+                        self._corrections.clear()
+                    connection.execute(
+                        "INSERT INTO corrections (user_id, merchant, category, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (user_id, merchant) DO UPDATE SET category = excluded.category, "
+                        "updated_at = excluded.updated_at",
+                        (username or '', merchant, category, datetime.now().isoformat(timespec='seconds'))
+                    )
+                    connection.execute("UPDATE meta SET generation = generation + 1")
+                self._generation = generation + 1
+            
+            self._user_corrections(username)[merchant] = category
+            # Descriptions of this merchant may have been memoized with another category
+            self._entries.clear()
+        return True
+    
+    def clear(self):
+        """Drop everything memoized in this process"""
+        with self._lock:
+            self._entries.clear()
+            self._corrections.clear()
+    
+    def _refresh(self):
+        """Drop the memo if another process recorded a correction since"""
+        if self.db_path is None:
+            return
+        
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        
+        with self._lock:
+            self._checked = now
+            if not os.path.exists(self.db_path):
+                generation = None
+            else:
+                with closing(self._connect()) as connection:
+                    generation = connection.execute("SELECT generation FROM meta").fetchone()[0]
+            
+            if generation != self._generation:
+                self._generation = generation
+                self._entries.clear()
+                self._corrections.clear()
+    
+    def _user_corrections(self, username):
+        """Get all of a user's corrections, reading them on first use
+        
+        Args:
+            username (str): Username (None for the shared store)
+        
+        Returns:
+            dict: Merchant -> category
+        """
+        with self._lock:
+            corrections = self._corrections.get(username)
+            if corrections is not None:
+                return corrections
+            
+            corrections = {}
+            if self.db_path is not None and os.path.exists(self.db_path):
+                with closing(self._connect()) as connection:
+                    corrections = dict(connection.execute(
+                        "SELECT merchant, category FROM corrections WHERE user_id = ?", (username or '',)
+                    ).fetchall())
+            self._corrections[username] = corrections
+            return corrections
+    
+    def _connect(self):
+        """Open a connection to the corrections database, creating it if needed
+        
+        Returns:
+            sqlite3.Connection: Connection with WAL mode and a busy timeout
+        """
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS corrections (user_id TEXT NOT NULL, merchant TEXT NOT NULL, "
+                "category TEXT NOT NULL, updated_at TEXT NOT NULL, PRIMARY KEY (user_id, merchant))"
+            )
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (generation INTEGER NOT NULL)")
+            connection.execute("INSERT INTO meta (generation) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM meta)")
+        return connection
+
+_memos = {}
+_memos_lock = threading.Lock()
+
+def get_merchant_memo(data_dir="data"):
+    """Get the memo shared by everything in this process that uses a data directory
+    
+    Args:
+        data_dir (str): Base directory for data storage
+    
+    Returns:
+        MerchantMemo: The memo of that directory
+    """
+    path = os.path.abspath(data_dir)
+    with _memos_lock:
+        memo = _memos.get(path)
+        if memo is None:
+            memo = MerchantMemo(data_dir)
+            _memos[path] = memo
+        return memo
@@ -7,7 +7,8 @@ import uuid
 import hashlib
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
-from utils import categorize_transaction
+from utils import categorize_transaction, categorize_descriptions
+from merchant_memo import get_merchant_memo
 
 # Load environment variables from .env file if present
 load_dotenv()
@@ -42,6 +43,7 @@ class MPesaAPI:
         # User-specific data
         self.username = username
         self.auth_manager = auth_manager
+        self.merchant_memo = get_merchant_memo()
         
         # Transaction storage - in a real system, this would be a database
         self._transaction_store = {}
@@ -263,7 +265,7 @@ class MPesaAPI:
                 'description': f"Payment to {self.business_short_code} Reference: {reference}",
                 'amount': float(amount),
                 'type': 'expense',
-                'category': categorize_transaction(f"M-PESA Payment Reference: {reference}"),
+                'category': categorize_transaction(f"M-PESA Payment Reference: {reference}", self.username, self.merchant_memo),
                 'phone_number': phone_number,
                 'status': 'completed',
                 'reference': reference
@@ -346,7 +348,7 @@ class MPesaAPI:
                 'description': description,
                 'amount': float(amount),
                 'type': 'expense',
-                'category': categorize_transaction(description),
+                'category': categorize_transaction(description, self.username, self.merchant_memo),
                 'phone_number': phone_number,
                 'status': 'pending',
                 'reference': reference,
@@ -540,7 +542,7 @@ class MPesaAPI:
             'description': f"Payment to {callback_data.get('BusinessShortCode')} Reference: {callback_data.get('BillRefNumber')}",
             'amount': float(callback_data.get('TransAmount', 0)),
             'type': 'expense',
-            'category': categorize_transaction(f"M-PESA Payment Reference: {callback_data.get('BillRefNumber')}"),
+            'category': categorize_transaction(f"M-PESA Payment Reference: {callback_data.get('BillRefNumber')}", self.username, self.merchant_memo),
             'phone_number': callback_data.get('MSISDN'),
             'status': 'completed',
             'reference': callback_data.get('BillRefNumber')
@@ -644,6 +646,7 @@ class MPesaAPI:
                 if (tx_phone == phone_number or not tx_phone) and start_date <= tx_date <= end_date:
                     # Format to match the expected output
                     filtered_transactions.append({
+                        'transaction_id': tx_id,
                         'date': tx_date,
                         'description': tx['description'],
                         'amount': float(tx['amount']),
@@ -689,10 +692,14 @@ class MPesaAPI:
                         'date': datetime.strptime(item.get('TransactionDate'), '%Y%m%d').date(),
                         'description': item.get('Description', ''),
                         'amount': float(item.get('Amount', 0)),
-                        'type': 'expense' if item.get('TransactionType') == 'Debit' else 'income',
-                        'category': categorize_transaction(item.get('Description', ''))
+                        'type': 'expense' if item.get('TransactionType') == 'Debit' else 'income'
                     }
                     transactions.append(transaction)
+                
+                # Categorize the whole history in one batch
+                categories = categorize_descriptions((transaction['description'] for transaction in transactions), self.username, self.merchant_memo)
+                for transaction, category in zip(transactions, categories):
+                    transaction['category'] = category
                     
                 return transactions
             else:
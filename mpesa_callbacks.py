@@ -74,7 +74,13 @@ def process_c2b_callback(request_data):
         # Store the transaction in the appropriate user's data
         data_manager = DataManager(username=username)
         data_manager.ensure_data_file_exists()
-        data_manager.add_transaction(transaction)
+        result = data_manager.add_transactions([transaction])
+        
+        if result['rejected']:
+            return {
+                "ResultCode": 1,
+                "ResultDesc": "Failed to store transaction"
+            }
         
         # Return success response for the webhook
         return {
@@ -151,7 +157,13 @@ def process_stk_callback(request_data):
             # Store the transaction in the appropriate user's data
             data_manager = DataManager(username=username)
             data_manager.ensure_data_file_exists()
-            data_manager.add_transaction(transaction)
+            result = data_manager.add_transactions([transaction])
+            
+            if result['rejected']:
+                return {
+                    "ResultCode": 1,
+                    "ResultDesc": "Failed to store transaction"
+                }
             
             return {
                 "ResultCode": 0,
@@ -158,7 +158,8 @@ def app():
                         "category": category
                     }
                     
-                    success = data_manager.add_transaction(new_transaction)
+                    # Two identical manual entries on one day are allowed
+                    success = data_manager.add_transaction(new_transaction, dedupe=False)
                     
                     if success:
                         st.success("Transaction added successfully!")
@@ -216,12 +217,13 @@ def app():
                                 
                                 # Add the transactions to the data store
                                 if transactions:
-                                    success_count = 0
-                                    for transaction in transactions:
-                                        if data_manager.add_transaction(transaction):
-                                            success_count += 1
+                                    result = data_manager.add_transactions(transactions)
                                     
-                                    st.success(f"Successfully imported {success_count} transactions!")
+                                    st.success(f"Successfully imported {result['inserted']} transactions!")
+                                    if result['skipped']:
+                                        st.info(f"Skipped {result['skipped']} transactions that were already imported.")
+                                    if result['rejected']:
+                                        st.warning(f"Rejected {result['rejected']} invalid transactions.")
                                     st.rerun()
                                 else:
                                     st.info("No transactions found for the selected date range.")
@@ -240,10 +242,11 @@ def app():
     # Use different column ratios for better mobile display
     col1, col2, col3 = st.columns([1, 1, 1])
     
-    # Calculate total income and expenses
-    income = transactions_df[transactions_df['type'] == 'income']['amount'].sum()
-    expenses = transactions_df[transactions_df['type'] == 'expense']['amount'].sum()
-    balance = income - expenses
+    # Total income and expenses come from the maintained rollups
+    totals = data_manager.get_totals()
+    income = totals['income']
+    expenses = totals['expense']
+    balance = totals['balance']
     
     # Display metrics with improved formatting
     with col1:
@@ -289,22 +292,18 @@ def app():
             transaction_types = ["All", "income", "expense"]
             selected_type = st.selectbox("Transaction Type", transaction_types)
     
-    # Apply filters
-    filtered_df = transactions_df.copy()
+    # Apply filters in the storage layer
+    category_filter = None if selected_category == "All" else [selected_category]
+    type_filter = None if selected_type == "All" else [selected_type]
+    filtered_df = data_manager.query(
+        start=start_date,
+        end=end_date,
+        categories=category_filter,
+        types=type_filter
+    )
     
-    # Date filter
-    filtered_df = filtered_df[
-        (filtered_df['date'] >= pd.Timestamp(start_date)) & 
-        (filtered_df['date'] <= pd.Timestamp(end_date))
-    ]
-    
-    # Category filter
-    if selected_category != "All":
-        filtered_df = filtered_df[filtered_df['category'] == selected_category]
-    
-    # Transaction type filter
-    if selected_type != "All":
-        filtered_df = filtered_df[filtered_df['type'] == selected_type]
+    # The charts only need daily totals, so read them from the rollups
+    chart_df = data_manager.get_rollup('day', start=start_date, end=end_date, categories=category_filter, types=type_filter)
     
     st.write("---")
     
@@ -314,16 +313,16 @@ def app():
     tab1, tab2, tab3, tab4 = st.tabs(["Overview", "By Category", "Monthly", "Income/Expense"])
     
     with tab1:
-        st.plotly_chart(plot_transaction_overview(filtered_df), use_container_width=True, config={"displayModeBar": False})
+        st.plotly_chart(plot_transaction_overview(chart_df), use_container_width=True, config={"displayModeBar": False})
     
     with tab2:
-        st.plotly_chart(plot_spending_by_category(filtered_df), use_container_width=True, config={"displayModeBar": False})
+        st.plotly_chart(plot_spending_by_category(chart_df), use_container_width=True, config={"displayModeBar": False})
     
     with tab3:
-        st.plotly_chart(plot_spending_trend(filtered_df), use_container_width=True, config={"displayModeBar": False})
+        st.plotly_chart(plot_spending_trend(chart_df), use_container_width=True, config={"displayModeBar": False})
     
     with tab4:
-        st.plotly_chart(plot_income_vs_expense(filtered_df), use_container_width=True, config={"displayModeBar": False})
+        st.plotly_chart(plot_income_vs_expense(chart_df), use_container_width=True, config={"displayModeBar": False})
     
     st.write("---")
     
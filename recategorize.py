@@ -0,0 +1,41 @@
+"""
+Admin action: re-run automatic categorization over stored transactions
+
+Categorizes every transaction of one user's store, or of every user's with
+--all-users, from its description in one vectorized batch per store, and
+rewrites each store once if any category changed. Useful after the rules in
+category_rules.yaml change. Categories set by hand are overwritten.
+
+Usage:
+    python recategorize.py [--user <username> | --all-users] [--data-dir data] [--backend csv]
+"""
+
+import argparse
+from data_manager import DataManager
+from storage import list_storage_users
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-run automatic categorization over stored transactions")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--user', help='Username (default: the shared store)')
+    target.add_argument('--all-users', action='store_true', help='Recategorize every user with stored transactions')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--backend', help='Storage backend (default: EROPIA_STORAGE_BACKEND or csv)')
+    args = parser.parse_args()
+    
+    users = list_storage_users(args.backend, args.data_dir) if args.all_users else [args.user]
+    
+    failed = 0
+    for username in users:
+        data_manager = DataManager(username=username, data_dir=args.data_dir, backend=args.backend)
+        changed = data_manager.recategorize_transactions()
+        if changed < 0:
+            failed += 1
+            continue
+        print(f"Recategorized {username or 'shared store'}: {changed} transactions changed category")
+    
+    if failed:
+        raise SystemExit(f"{failed} stores could not be recategorized")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Materialized per-user rollups of transaction amounts
+
+DataManager keeps two small tables per user next to the transaction store:
+amounts and counts by (day, category, type) and by (month, category, type).
+They are updated incrementally by every insert, category update and delete
+made through DataManager, so dashboard metrics and charts read one row per
+day or month instead of every transaction.
+
+The rollups remember the storage signature they were computed at. When the
+store changed in a way they did not see (another tool wrote to it, a write
+failed halfway, a positional update), the signature no longer matches and
+they are rebuilt from the store on the next read. They can also be rebuilt
+by hand:
+    
+    python rollups.py --user <username> [--data-dir data]
+"""
+
+import os
+import json
+import math
+import argparse
+from contextlib import contextmanager
+import pandas as pd
+from file_lock import FileLock, atomic_write
+
+# Rollup levels and the length of their date key (YYYY-MM-DD or YYYY-MM)
+ROLLUP_LEVELS = {'day': 10, 'month': 7}
+
+# Number of rows per chunk when rebuilding from the store
+REBUILD_CHUNK_SIZE = 100000
+
+def _category(value):
+    """Normalize a category for use in a rollup key
+    
+    Args:
+        value: Category as stored
+    
+    Returns:
+        str: The category, or None if it is missing
+    """
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return str(value)
+
+class RollupUpdate:
+    """Changes to apply to the rollups after one storage write"""
+    
+    def __init__(self):
+        self.rows = []
+        self.unknown = False
+    
+    def add(self, rows):
+        """Record rows that were stored
+        
+        Args:
+            rows (list): Transaction dictionaries
+        """
+        self.rows.extend((row, 1) for row in rows)
+    
+    def remove(self, rows):
+        """Record rows that were deleted (or replaced by a new version)
+        
+        Args:
+            rows (list): Transaction dictionaries as they were stored
+        """
+        self.rows.extend((row, -1) for row in rows)
+    
+    def invalidate(self):
+        """Record that the write's effect on the rollups is not known"""
+        self.unknown = True
+
+class TransactionRollups:
+    """Per-user day and month rollups of a transaction store"""
+    
+    def __init__(self, storage, username=None, data_dir="data"):
+        """Initialize the rollups of a user's store
+        
+        Args:
+            storage (StorageBackend): The user's transaction store
+            username (str): Username (if None, the shared store is used)
+            data_dir (str): Base directory for data storage
+        """
+        self.storage = storage
+        self.username = username
+        self.path = os.path.join(data_dir, "rollups", f"{username or '_shared'}.json")
+        self.lock = FileLock(self.path + '.lock')
+        self._state = None
+        self._file_signature = None
+    
+    @contextmanager
+    def tracking(self):
+        """Keep the rollups in step with a storage write
+        
+        The write runs inside the block, which records its effect on the
+        yielded RollupUpdate. If the rollups were current before the write
+        and the effect is known, it is applied; otherwise the rollups are
+        left to be rebuilt on the next read.
+        
+        Yields:
+            RollupUpdate: Collects the rows added and removed by the write
+        """
+        with self.lock:
+            state = self._load()
+            fresh = state is not None and state['source'] == self._source()
+            
+            update = RollupUpdate()
+            yield update
+            
+            if not fresh or update.unknown or not update.rows:
+                return
+            
+            for row, sign in update.rows:
+                self._apply(state, row, sign)
+            state['source'] = self._source()
+            self._save(state)
+    
+    def frame(self, level='day'):
+        """Get a rollup table as a DataFrame, rebuilding it if it is stale
+        
+        Args:
+            level (str): 'day' or 'month'
+        
+        Returns:
+            DataFrame: Columns 'date' (the day, or the first day of the
+                month), 'category', 'type', 'amount' and 'count'
+        
+        Raises:
+            ValueError: If the level is unknown
+        """
+        if level not in ROLLUP_LEVELS:
+            raise ValueError(f"Unknown rollup level '{level}'")
+        
+        with self.lock:
+            state = self._load()
+            if state is None or state['source'] != self._source():
+                state = self.rebuild()
+        
+        rows = [list(key) + totals for key, totals in state[level].items()]
+        df = pd.DataFrame(rows, columns=['date', 'category', 'type', 'amount', 'count'])
+        df['date'] = pd.to_datetime(df['date'], format='%Y-%m-%d' if level == 'day' else '%Y-%m')
+        return df.sort_values(['date', 'type'], kind='mergesort').reset_index(drop=True)
+    
+    def totals(self):
+        """Get the user's total income, expenses and balance
+        
+        Returns:
+            dict: 'income', 'expense' and 'balance' amounts
+        """
+        monthly = self.frame('month')
+        income = round(float(monthly.loc[monthly['type'] == 'income', 'amount'].sum()), 2)
+        expense = round(float(monthly.loc[monthly['type'] == 'expense', 'amount'].sum()), 2)
+        return {'income': income, 'expense': expense, 'balance': round(income - expense, 2)}
+    
+    def category_counts(self):
+        """Count the user's transactions per category
+        
+        Returns:
+            dict: Number of transactions by category
+        """
+        monthly = self.frame('month')
+        return {category: int(count) for category, count in monthly.groupby('category')['count'].sum().items()}
+    
+    def rebuild(self):
+        """Recompute the rollups from every stored transaction
+        
+        Returns:
+            dict: The new rollup state
+        """
+        with self.lock:
+            source = self._source()
+            state = {'source': source, 'day': {}, 'month': {}}
+            
+            chunks = self.storage.iter_chunks(
+                REBUILD_CHUNK_SIZE, columns=['date', 'amount', 'type', 'category'], user_id=self.username
+            )
+            for chunk in chunks:
+                chunk = chunk.assign(
+                    day=pd.to_datetime(chunk['date']).dt.strftime('%Y-%m-%d'),
+                    category=chunk['category'].astype(object),
+                    type=chunk['type'].astype(object)
+                )
+                sums = chunk.groupby(['day', 'category', 'type'], dropna=False)['amount'].agg(['sum', 'count'])
+                for (day, category, kind), (amount, count) in sums.iterrows():
+                    for level, length in ROLLUP_LEVELS.items():
+                        self._add(state[level], (day[:length], _category(category), kind), amount, count)
+            
+            self._save(state)
+            return state
+    
+    def _source(self):
+        """Identify the store and the version of it the rollups describe
+        
+        Returns:
+            list: Storage identity and signature, as stored in JSON
+        """
+        return self.storage.source()
+    
+    def _apply(self, state, row, sign):
+        """Add a row's amount to (or remove it from) every level
+        
+        Args:
+            state (dict): Rollup state to update in place
+            row (dict): Transaction
+            sign (int): 1 to add the row, -1 to remove it
+        """
+        day = pd.Timestamp(row['date']).strftime('%Y-%m-%d')
+        for level, length in ROLLUP_LEVELS.items():
+            key = (day[:length], _category(row.get('category')), row['type'])
+            self._add(state[level], key, sign * float(row['amount']), sign)
+    
+    def _add(self, table, key, amount, count):
+        """Add an amount and count to one rollup entry
+        
+        Args:
+            table (dict): Key -> [amount, count]
+            key (tuple): (date, category, type)
+            amount (float): Amount to add
+            count (int): Number of rows to add
+        """
+        totals = table.setdefault(key, [0.0, 0])
+        totals[0] = round(totals[0] + float(amount), 2)
+        totals[1] += int(count)
+        if totals[1] <= 0:
+            del table[key]
+    
+    def _load(self):
+        """Load the rollup file, reusing the parsed copy if it is unchanged
+        
+        Returns:
+            dict: Rollup state, or None if there is no rollup file
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        
+        file_signature = (stat.st_mtime_ns, stat.st_size)
+        if self._state is None or self._file_signature != file_signature:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._state = {
+                'source': data['source'],
+                **{level: {tuple(entry[:3]): entry[3:] for entry in data[level]} for level in ROLLUP_LEVELS}
+            }
+            self._file_signature = file_signature
+        
+        return self._state
+    
+    def _save(self, state):
+        """Write the rollup file in one step
+        
+        Args:
+            state (dict): Rollup state
+        """
+        data = {'source': state['source']}
+        for level in ROLLUP_LEVELS:
+            data[level] = [list(key) + totals for key, totals in sorted(state[level].items(), key=lambda item: str(item[0]))]
+        
+        with atomic_write(self.path) as f:
+            json.dump(data, f)
+        
+        stat = os.stat(self.path)
+        self._state = state
+        self._file_signature = (stat.st_mtime_ns, stat.st_size)
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild a user's transaction rollups from their store")
+    parser.add_argument('--user', help='Username (default: the shared store)')
+    parser.add_argument('--data-dir', default='data')
+    parser.add_argument('--backend', help='Storage backend (default: EROPIA_STORAGE_BACKEND or csv)')
+    args = parser.parse_args()
+    
+    from data_manager import DataManager
+    
+    data_manager = DataManager(username=args.user, data_dir=args.data_dir, backend=args.backend)
+    data_manager.rebuild_rollups()
+    totals = data_manager.get_totals()
+    print(f"Rebuilt rollups for {args.user or 'shared store'}: "
+          f"income {totals['income']:,.2f}, expenses {totals['expense']:,.2f}, balance {totals['balance']:,.2f}")
+
+if __name__ == "__main__":
+    main()
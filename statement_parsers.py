@@ -0,0 +1,439 @@
+"""
+Parsers for the statement formats users paste or upload
+
+Three formats are recognized:
+
+- 'statement': the text of a full Safaricom M-PESA statement export, one
+  transaction per line with its receipt number, completion time, details,
+  status, paid in / withdrawn amounts and balance,
+- 'sms': forwarded M-PESA confirmation messages ("QGH7XK2LP1 Confirmed.
+  Ksh1,500.00 sent to ..."), any number per line, and
+- 'simple': the plain `dd/mm/yyyy MPESA... amount debit|credit` layout
+  (see utils.iter_mpesa_statement).
+
+Every parser reads lines one at a time with precompiled patterns and yields
+transactions as they are found. Besides the usual date, description,
+amount and type, transactions carry the M-PESA receipt as their
+transaction_id and, where the format has them, the 'timestamp' of
+completion, the 'balance' after the transaction and the 'counterparty'.
+
+The format is detected from a sample of the first lines (see
+detect_statement_format). New formats are added with
+register_statement_parser.
+"""
+
+import io
+import re
+import functools
+from datetime import date
+from itertools import chain, islice
+from utils import iter_mpesa_statement, MPESA_STATEMENT_PATTERN
+
+# Lines read to detect the format of a statement
+DETECT_SAMPLE_LINES = 200
+
+# An M-PESA receipt number
+_RECEIPT = re.compile(r'[A-Z0-9]{10}')
+
+def _amount(text):
+    """Convert an amount with thousands separators to a float
+    
+    Args:
+        text (str): Amount such as '1,500.00'
+    
+    Returns:
+        float: The amount
+    """
+    return float(text.replace(',', ''))
+
+def _is_number(token):
+    """Check whether a token is a phone, till or account number
+    
+    Args:
+        token (str): One word
+    
+    Returns:
+        bool: True for five or more digits, possibly masked with '*'
+    """
+    return len(token) >= 5 and not token.strip('0123456789*')
+
+@functools.lru_cache(maxsize=4096)
+def _name(text):
+    """Strip the phone, till or account numbers around a counterparty name
+    
+    Args:
+        text (str): Counterparty as written, e.g. '254712345678 JOHN DOE'
+    
+    Returns:
+        str: The name, e.g. 'JOHN DOE', or None if nothing is left
+    """
+    tokens = text.strip(' .-').split()
+    while tokens and (_is_number(tokens[0]) or tokens[0] == '-'):
+        tokens.pop(0)
+    while tokens and (_is_number(tokens[-1]) or tokens[-1] == '-'):
+        tokens.pop()
+    return ' '.join(tokens).strip(' .') or None
+
+@functools.lru_cache(maxsize=4096)
+def _counterparty(details):
+    """Get the counterparty named in a statement's details
+    
+    Details repeat for every payment to the same till or person, so the
+    result is cached.
+    
+    Args:
+        details (str): e.g. 'Pay Bill to 888880 - KPLC PREPAID Acc. 3712'
+    
+    Returns:
+        str: e.g. 'KPLC PREPAID', or None if no name is given
+    """
+    # The name follows a dash, or else the first 'to' / 'from'
+    before, dash, name = details.rpartition(' - ')
+    if not dash:
+        for word in (' to ', ' from '):
+            before, found, name = details.partition(word)
+            if found:
+                break
+        else:
+            return None
+    
+    name = name.split(' Acc.', 1)[0].split(' Account ', 1)[0]
+    return _name(name)
+
+@functools.lru_cache(maxsize=4096)
+def _sms_date(text):
+    """Parse the d/m/yy date of a confirmation message
+    
+    Args:
+        text (str): Date as written, e.g. '12/3/24'
+    
+    Returns:
+        tuple: (date, the date as 'YYYY-MM-DD')
+    
+    Raises:
+        ValueError: If the date is invalid
+    """
+    day, month, year = (int(part) for part in text.split('/'))
+    if year < 100:
+        year += 2000
+    parsed = date(year, month, day)
+    return parsed, parsed.isoformat()
+
+def _text(line):
+    """Decode a line read from a binary file
+    
+    Args:
+        line (str or bytes): One line
+    
+    Returns:
+        str: The line as text
+    """
+    return line.decode('utf-8', errors='replace') if isinstance(line, bytes) else line
+
+def statement_lines(source):
+    """Iterate over the lines of a statement as text
+    
+    Args:
+        source: Statement text, a file object (text or binary) or any
+            iterable of lines
+    
+    Returns:
+        iterator: The lines as text
+    """
+    if isinstance(source, bytes):
+        source = source.decode('utf-8', errors='replace')
+    if isinstance(source, str):
+        return iter(io.StringIO(source))
+    return map(_text, source)
+
+class StatementParser:
+    """Base class for statement parsers
+    
+    Subclasses set `name` and implement `detect` and `parse`.
+    """
+    
+    name = None
+    
+    def detect(self, line):
+        """Check whether a line holds a transaction in this format
+        
+        Args:
+            line (str): One line of the statement
+        
+        Returns:
+            bool: True if the line is recognized
+        """
+        raise NotImplementedError
+    
+    def parse(self, lines):
+        """Parse transactions from lines of text
+        
+        Args:
+            lines (iterable): Lines of the statement
+        
+        Yields:
+            dict: Uncategorized transaction
+        """
+        raise NotImplementedError
+
+class SimpleStatementParser(StatementParser):
+    """The plain `dd/mm/yyyy MPESA... amount debit|credit` layout"""
+    
+    name = "simple"
+    
+    def detect(self, line):
+        return MPESA_STATEMENT_PATTERN.search(line) is not None
+    
+    def parse(self, lines):
+        return iter_mpesa_statement(lines)
+
+class SafaricomStatementParser(StatementParser):
+    """Text of a full Safaricom M-PESA statement export
+    
+    Each transaction is one line:
+    `RKT2ABCD12 2024-11-29 14:03:22 Pay Bill to 888880 - KPLC PREPAID Acc. 3712 Completed 0.00 -1,500.00 2,340.50`.
+    The amounts after the status are paid in, withdrawn and balance; when a
+    blank column was dropped from the text, the remaining amount is income
+    unless it is negative. Only completed transactions are returned.
+    """
+    
+    name = "statement"
+    
+    # Receipt, completion date and time, details, status and two or three amounts. The
+    # details are matched greedily, so the status and amounts are found by
+    # backtracking from the end of the line rather than tried at every position.
+    _RECORD = re.compile(
+        r'\s*([A-Z0-9]{10})\s+(\d{4}-\d{2}-\d{2})\s+(\d{2}:\d{2}:\d{2})\s+(\S.*\S)\s+'
+        r'(Completed|Failed|Cancelled|Reversed|Pending)\s+(-?[\d,]+\.\d{2})\s+(-?[\d,]+\.\d{2})(?:\s+(-?[\d,]+\.\d{2}))?\s*$'
+    )
+    
+    def detect(self, line):
+        return self._RECORD.match(line) is not None
+    
+    def parse(self, lines):
+        for line_number, line in enumerate(lines, start=1):
+            match = self._RECORD.match(line)
+            if match is None:
+                continue
+            receipt, date_str, time_str, details, status, first, second, third = match.groups()
+            if status != 'Completed':
+                continue
+            
+            try:
+                transaction_date = date(int(date_str[:4]), int(date_str[5:7]), int(date_str[8:]))
+            except ValueError as e:
+                print(f"Skipped statement line {line_number}: {e}")
+                continue
+            
+            if third is not None:
+                paid_in, withdrawn, balance = _amount(first), _amount(second), _amount(third)
+                # Withdrawn amounts are written with or without a minus sign
+                amount = paid_in if paid_in else -abs(withdrawn)
+            else:
+                amount, balance = _amount(first), _amount(second)
+            
+            yield {
+                'date': transaction_date,
+                'description': details,
+                'amount': abs(amount),
+                'type': 'income' if amount > 0 else 'expense',
+                'source': 'mpesa',
+                'transaction_id': receipt,
+                'timestamp': f"{date_str} {time_str}",
+                'balance': balance,
+                'counterparty': _counterparty(details),
+            }
+
+class SMSStatementParser(StatementParser):
+    """Forwarded M-PESA confirmation messages
+    
+    Sent, paid, pay bill, received, withdrawal and airtime messages are
+    recognized; other messages are skipped. The transaction cost is not
+    recorded.
+    """
+    
+    name = "sms"
+    
+    _WHEN = r'on (?P<date>\d{1,2}/\d{1,2}/\d{2,4}) at (?P<time>\d{1,2}:\d{2})\s*(?P<half>[AP]M)'
+    
+    _KSH = r'Ksh\s?(?P<amount>[\d,]+\.\d{2})'
+    
+    # (phrase that picks the kind, pattern of the message after "Confirmed", description, type)
+    _KINDS = [
+        (' for account ', re.compile(r'[.\s]*' + _KSH + r' sent to (?P<counterparty>.+?) for account (?P<account>\S+) ' + _WHEN),
+         'Pay Bill to', 'expense'),
+        (' sent to ', re.compile(r'[.\s]*' + _KSH + r' sent to (?P<counterparty>.+?) ' + _WHEN), 'Sent to', 'expense'),
+        (' paid to ', re.compile(r'[.\s]*' + _KSH + r' paid to (?P<counterparty>.+?)\.? ' + _WHEN), 'Paid to', 'expense'),
+        ('received Ksh', re.compile(r'[.\s]*You have received ' + _KSH + r' from (?P<counterparty>.+?) ' + _WHEN),
+         'Received from', 'income'),
+        ('Withdraw Ksh', re.compile(r'[.\s]*' + _WHEN + r'\s*Withdraw ' + _KSH + r' from (?P<counterparty>.+?)\s+New'),
+         'Withdrawal from', 'expense'),
+        ('of airtime', re.compile(r'[.\s]*You bought ' + _KSH + r' of airtime(?: for \d+)?(?P<counterparty>) ' + _WHEN),
+         'Airtime purchase', 'expense'),
+    ]
+    
+    _BALANCE = re.compile(r'balance (?:is|was) Ksh\s?([\d,]+\.\d{2})')
+    
+    def detect(self, line):
+        return bool(self._messages(line))
+    
+    def parse(self, lines):
+        for line_number, line in enumerate(lines, start=1):
+            for receipt, text in self._messages(line):
+                try:
+                    transaction = self._parse_message(receipt, text)
+                except ValueError as e:
+                    print(f"Skipped message on line {line_number}: {e}")
+                    continue
+                if transaction is not None:
+                    yield transaction
+    
+    def _messages(self, line):
+        """Split a line into confirmation messages
+        
+        Args:
+            line (str): One line of text
+        
+        Returns:
+            list: (receipt, text after "<receipt> Confirmed") of each message
+        """
+        # Splitting on the fixed word is much cheaper than searching for the receipt pattern
+        parts = line.split('onfirmed')
+        messages = []
+        for before, text in zip(parts, parts[1:]):
+            before = before.rstrip()
+            if before[-1:] not in ('C', 'c'):
+                continue
+            before = before[:-1].rstrip()
+            receipt = before[-10:]
+            if _RECEIPT.fullmatch(receipt) and not before[-11:-10].isalnum():
+                messages.append((receipt, text))
+        return messages
+    
+    def _parse_message(self, receipt, text):
+        """Parse the body of one confirmation message
+        
+        Args:
+            receipt (str): Receipt number of the message
+            text (str): Message text after "<receipt> Confirmed"
+        
+        Returns:
+            dict: The transaction, or None if the message is of another kind
+        
+        Raises:
+            ValueError: If the date is invalid
+        """
+        for phrase, pattern, prefix, kind in self._KINDS:
+            if phrase in text:
+                break
+        else:
+            return None
+        
+        match = pattern.match(text)
+        if match is None:
+            return None
+        
+        date_str, time_str, half, amount, counterparty = match.group('date', 'time', 'half', 'amount', 'counterparty')
+        
+        transaction_date, day_str = _sms_date(date_str)
+        # Times are h:mm AM/PM
+        hour, minute = time_str.split(':')
+        hour = int(hour) % 12 + (12 if half == 'PM' else 0)
+        
+        name = _name(counterparty) if counterparty else None
+        description = f"{prefix} {name}" if name else prefix
+        if prefix == 'Pay Bill to':
+            description += f" Acc. {match.group('account')}"
+        
+        position = text.find('balance ', match.end())
+        balance = self._BALANCE.match(text, position) if position >= 0 else None
+        return {
+            'date': transaction_date,
+            'description': description,
+            'amount': _amount(amount),
+            'type': kind,
+            'source': 'mpesa',
+            'transaction_id': receipt,
+            'timestamp': f"{day_str} {hour:02d}:{minute}:00",
+            'balance': _amount(balance.group(1)) if balance else None,
+            'counterparty': name,
+        }
+
+# Registry of the available parsers by name, in the order ties are broken
+STATEMENT_PARSERS = {
+    SafaricomStatementParser.name: SafaricomStatementParser,
+    SMSStatementParser.name: SMSStatementParser,
+    SimpleStatementParser.name: SimpleStatementParser,
+}
+
+def register_statement_parser(parser_class):
+    """Add a parser to the registry, replacing any with the same name
+    
+    Args:
+        parser_class (type): StatementParser subclass with a unique `name`
+    
+    Returns:
+        type: parser_class, so this can be used as a class decorator
+    """
+    STATEMENT_PARSERS[parser_class.name] = parser_class
+    return parser_class
+
+def get_statement_parser(name):
+    """Create a statement parser by name
+    
+    Args:
+        name (str): Format name, e.g. 'statement', 'sms' or 'simple'
+    
+    Returns:
+        StatementParser: The parser instance
+    
+    Raises:
+        ValueError: If the format name is unknown
+    """
+    if name not in STATEMENT_PARSERS:
+        raise ValueError(f"Unknown statement format '{name}'. Available: {', '.join(STATEMENT_PARSERS)}")
+    
+    return STATEMENT_PARSERS[name]()
+
+def detect_statement_format(sample):
+    """Detect the format of a statement from a sample of its lines
+    
+    Args:
+        sample (iterable): Lines from the start of the statement
+    
+    Returns:
+        str: Name of the parser that recognizes the most lines, or None if
+            none recognizes any
+    """
+    sample = list(sample)
+    best, best_count = None, 0
+    for name, parser_class in STATEMENT_PARSERS.items():
+        parser = parser_class()
+        count = sum(1 for line in sample if parser.detect(line))
+        if count > best_count:
+            best, best_count = name, count
+    return best
+
+def iter_statement(source, statement_format=None):
+    """Parse a statement of any registered format incrementally
+    
+    Args:
+        source: Statement text, a file object (text or binary) or any
+            iterable of lines
+        statement_format (str): Format name (default: detected from the
+            first DETECT_SAMPLE_LINES lines)
+    
+    Yields:
+        dict: Uncategorized transaction
+    
+    Raises:
+        ValueError: If the format name is unknown
+    """
+    lines = statement_lines(source)
+    if statement_format is None:
+        sample = list(islice(lines, DETECT_SAMPLE_LINES))
+        # Unrecognized text goes to the simple parser, which finds nothing in it
+        statement_format = detect_statement_format(sample) or SimpleStatementParser.name
+        lines = chain(sample, lines)
+    
+    yield from get_statement_parser(statement_format).parse(lines)
@@ -0,0 +1,2674 @@
+"""
+Storage backends for Eropia umkhondo
+
+DataManager keeps the validation and per-user logic, and hands the actual
+persistence of transaction rows to one of the backends in this module:
+
+- CSVStorage: one flat `transactions_<username>.csv` file (the default)
+- PartitionedCSVStorage: one CSV file per user and month, with a manifest
+- ParquetStorage: typed Parquet files partitioned by user and month
+- SQLiteStorage: an indexed SQLite table shared by all users
+
+The backend is picked by name through `get_storage_backend`, either from the
+`backend` argument of DataManager or the EROPIA_STORAGE_BACKEND environment
+variable.
+"""
+
+import os
+import io
+import csv
+import json
+import math
+import sqlite3
+import uuid
+import functools
+import threading
+from contextlib import closing
+import pandas as pd
+from csv_index import CSVOffsetIndex, parse_csv_record
+from file_lock import FileLock, atomic_write
+from journal import TransactionJournal, journal_compact_bytes
+
+# Columns every transaction store starts with
+TRANSACTION_COLUMNS = [
+    'date', 'description', 'amount', 'type',
+    'category', 'source', 'user_id', 'transaction_id'
+]
+
+# Low-cardinality text columns held as pandas categoricals once loaded
+CATEGORICAL_TRANSACTION_COLUMNS = ['type', 'category', 'source', 'user_id']
+
+# Environment variable used to select the storage backend
+STORAGE_BACKEND_ENV = "EROPIA_STORAGE_BACKEND"
+
+def _format_csv_value(value):
+    """Format a single value the way pandas writes it to CSV
+    
+    Args:
+        value: Value to format
+    
+    Returns:
+        str: CSV cell text (empty for missing values)
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float) and math.isnan(value):
+        return ''
+    return str(value)
+
+def _locked(method):
+    """Run a storage method while holding the store's write lock
+    
+    Backends without a lock (lock is None) run the method unlocked.
+    
+    Args:
+        method (callable): Backend method to wrap
+        
+    Returns:
+        callable: The wrapped method
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.lock is None:
+            return method(self, *args, **kwargs)
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def apply_transaction_schema(df):
+    """Convert loaded transactions to the compact in-memory schema
+    
+    Dates become datetime64, amounts float64 rounded to whole cents and
+    the low-cardinality text columns categoricals, which take a fraction
+    of the memory of object columns and group faster. Every backend's
+    frames go through this, so they all come back with the same dtypes.
+    
+    Args:
+        df (DataFrame): Transactions as read from a backend
+    
+    Returns:
+        DataFrame: The same transactions with the compact dtypes
+    """
+    if 'date' in df.columns and not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'])
+    if 'amount' in df.columns:
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce').astype('float64').round(2)
+    for column in CATEGORICAL_TRANSACTION_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    return df
+
+def new_transaction_id():
+    """Generate an id for a transaction that has none
+    
+    Returns:
+        str: A unique transaction id
+    """
+    return uuid.uuid4().hex
+
+def _fill_transaction_ids(df):
+    """Give every row of a DataFrame without a transaction_id a new one
+    
+    Args:
+        df (DataFrame): Transactions, modified in place
+    
+    Returns:
+        DataFrame: The same DataFrame
+    """
+    if 'transaction_id' not in df.columns:
+        df['transaction_id'] = None
+    
+    ids = df['transaction_id'].astype(object)
+    missing = ids.isna() | (ids == '')
+    df['transaction_id'] = ids.where(~missing, [new_transaction_id() for _ in range(len(df))])
+    return df
+
+def _typed_record(record):
+    """Convert a stored row to a transaction dictionary with typed values
+    
+    Args:
+        record (dict): Column name -> stored value
+    
+    Returns:
+        dict: Transaction with a Timestamp date, float amount and None for
+            missing values
+    """
+    transaction = {}
+    for column, value in record.items():
+        if value is None or value == '' or (isinstance(value, float) and math.isnan(value)):
+            value = None
+        elif column == 'date':
+            value = pd.Timestamp(value)
+        elif column == 'amount':
+            value = float(value)
+        transaction[column] = value
+    return transaction
+
+def _filter_frame(df, start_date=None, end_date=None, categories=None, types=None, sources=None, user_id=None):
+    """Apply the read filters to a DataFrame in memory
+    
+    Args:
+        df (DataFrame): Transactions with a datetime 'date' column
+        start_date: Inclusive lower bound for the date (optional)
+        end_date: Inclusive upper bound for the date (optional)
+        categories (list): Categories to keep (optional)
+        types (list): Transaction types to keep (optional)
+        sources (list): Sources to keep (optional)
+        user_id (str): Only keep rows of this user (optional)
+    
+    Returns:
+        DataFrame: Filtered transactions
+    """
+    if df.empty:
+        return df
+    
+    mask = pd.Series(True, index=df.index)
+    if start_date is not None:
+        mask &= df['date'] >= pd.Timestamp(start_date)
+    if end_date is not None:
+        mask &= df['date'] <= pd.Timestamp(end_date)
+    for column, values in (('category', categories), ('type', types), ('source', sources)):
+        if values is not None:
+            mask &= df[column].isin(list(values)) if column in df.columns else False
+    if user_id is not None and 'user_id' in df.columns:
+        mask &= df['user_id'] == user_id
+    
+    return df[mask]
+
+def _filter_columns(start_date=None, end_date=None, categories=None, types=None, sources=None, user_id=None, order=None):
+    """List the columns a read needs for its filters and ordering
+    
+    Args:
+        start_date: Inclusive lower bound for the date (optional)
+        end_date: Inclusive upper bound for the date (optional)
+        categories (list): Categories to keep (optional)
+        types (list): Transaction types to keep (optional)
+        sources (list): Sources to keep (optional)
+        user_id (str): Only keep rows of this user (optional)
+        order: Sort order, see `_sort_keys` (optional)
+    
+    Returns:
+        set: Column names
+    """
+    needed = set(_sort_keys(order)[0])
+    if start_date is not None or end_date is not None:
+        needed.add('date')
+    for column, values in (('category', categories), ('type', types), ('source', sources), ('user_id', user_id)):
+        if values is not None:
+            needed.add(column)
+    return needed
+
+class _BoundedReader:
+    """Read-only view of a binary file that ends at a given offset"""
+    
+    def __init__(self, f, end):
+        """Initialize the view
+        
+        Args:
+            f (file): File opened in binary mode, positioned at the start
+            end (int): Offset at which reading stops
+        """
+        self.f = f
+        self.remaining = end - f.tell()
+    
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.f.read(size)
+        self.remaining -= len(data)
+        return data
+    
+    def readline(self):
+        line = self.f.readline(self.remaining) if self.remaining > 0 else b''
+        self.remaining -= len(line)
+        return line
+    
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+def _sort_keys(order):
+    """Split a sort order into columns and directions
+    
+    Args:
+        order: Column name or list of column names; a leading '-' sorts
+            that column in descending order (e.g. '-date')
+    
+    Returns:
+        tuple: (list of columns, list of ascending flags)
+    """
+    if order is None:
+        return [], []
+    if isinstance(order, str):
+        order = [order]
+    return [key.lstrip('-') for key in order], [not key.startswith('-') for key in order]
+
+def _order_frame(df, order=None, limit=None):
+    """Sort a DataFrame and keep its first rows
+    
+    Args:
+        df (DataFrame): Transactions
+        order: Sort order, see `_sort_keys` (optional)
+        limit (int): Maximum number of rows to keep (optional)
+    
+    Returns:
+        DataFrame: Sorted and truncated transactions
+    """
+    columns, ascending = _sort_keys(order)
+    if columns:
+        # A stable sort keeps storage order between equal keys
+        df = df.sort_values(columns, ascending=ascending, kind='mergesort')
+    if limit is not None:
+        df = df.head(limit)
+    return df
+
+def _csv_users(data_dir):
+    """List the users that have a flat CSV transaction file
+    
+    Args:
+        data_dir (str): Base directory for data storage
+    
+    Returns:
+        set: Usernames, with None for the shared file
+    """
+    users = set()
+    if not os.path.isdir(data_dir):
+        return users
+    
+    for name in os.listdir(data_dir):
+        if name == "transactions.csv":
+            users.add(None)
+        elif name.startswith("transactions_") and name.endswith(".csv"):
+            users.add(name[len("transactions_"):-len(".csv")])
+    return users
+
+def _partition_users(root):
+    """List the users that have a `user=<name>` directory under a root
+    
+    Args:
+        root (str): Directory holding the per-user partition roots
+    
+    Returns:
+        set: Usernames, with None for the shared store
+    """
+    users = set()
+    if not os.path.isdir(root):
+        return users
+    
+    for name in os.listdir(root):
+        if name.startswith("user=") and os.path.isdir(os.path.join(root, name)):
+            username = name[len("user="):]
+            users.add(None if username == "_shared" else username)
+    return users
+
+class StorageBackend:
+    """Base class for transaction storage backends
+    
+    Subclasses implement `ensure_exists`, `read`, `append` and `replace`.
+    Category updates and deletes have generic implementations on top of
+    `read` and `replace` that backends can override with cheaper ones.
+    Methods that write run under the backend's `lock`, so their
+    read-modify-write cycles do not interleave across processes.
+    """
+    
+    name = None
+    
+    def __init__(self, username=None, data_dir="data"):
+        """Initialize the backend for a user
+        
+        Args:
+            username (str): Username for per-user storage (if None, uses shared storage)
+            data_dir (str): Base directory for data storage
+        """
+        self.username = username
+        self.data_dir = data_dir
+        
+        # Cross-process write lock; backends with their own locking keep None
+        self.lock = None
+    
+    def ensure_exists(self):
+        """Create the underlying storage if it doesn't exist"""
+        raise NotImplementedError
+    
+    @classmethod
+    def list_users(cls, data_dir="data"):
+        """List the users that have transactions stored with this backend
+        
+        Users whose flat CSV file has not been migrated yet are included,
+        since opening their store migrates it.
+        
+        Args:
+            data_dir (str): Base directory for data storage
+        
+        Returns:
+            set: Usernames, with None for the shared store
+        """
+        raise NotImplementedError
+    
+    def identity(self):
+        """Identify the store this backend reads, for caching
+        
+        Returns:
+            tuple: Backend name, location and user
+        """
+        raise NotImplementedError
+    
+    def signature(self):
+        """Get a cheap fingerprint of the store's current contents
+        
+        The signature changes whenever the store is written to, so cached
+        reads can be validated without reading the data.
+        
+        Returns:
+            tuple: Signature of the stored data
+        """
+        raise NotImplementedError
+    
+    def source(self):
+        """Identify the store and its current signature, as stored in JSON
+        
+        Indexes and logs kept next to a store record this when they are
+        written and compare it with the current one when they are loaded;
+        the JSON round trip turns tuples into lists so the two compare equal.
+        
+        Returns:
+            list: Storage identity and signature
+        """
+        return json.loads(json.dumps([self.identity(), self.signature()]))
+    
+    def read(self, columns=None, start_date=None, end_date=None, categories=None,
+             types=None, sources=None, user_id=None, order=None, limit=None):
+        """Read stored transactions
+        
+        Rows come back in storage order with a positional index, so the
+        index can be passed to `update_category` and `delete`.
+        
+        Args:
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+            order: Column name or list of them to sort by, '-' prefix for
+                descending (default: storage order)
+            limit (int): Maximum number of rows to return (optional)
+        
+        Returns:
+            DataFrame: Transactions with a datetime 'date' column
+        """
+        raise NotImplementedError
+    
+    def iter_chunks(self, chunk_size, columns=None, start_date=None, end_date=None, categories=None,
+                    types=None, sources=None, user_id=None):
+        """Read stored transactions in chunks
+        
+        This generic version reads everything and slices it; backends
+        override it to keep only one chunk in memory at a time.
+        
+        Args:
+            chunk_size (int): Maximum number of rows per chunk
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+        
+        Yields:
+            DataFrame: Non-empty chunks of transactions in storage order
+        """
+        df = self.read(columns, start_date, end_date, categories, types, sources, user_id)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    
+    def append(self, rows):
+        """Persist new transactions
+        
+        Args:
+            rows (list): Normalized transaction dictionaries
+        
+        Returns:
+            int: Number of rows stored
+        """
+        raise NotImplementedError
+    
+    def replace(self, df):
+        """Replace all stored transactions
+        
+        Args:
+            df (DataFrame): Complete new contents of the store
+        """
+        raise NotImplementedError
+    
+    def _find_owned_row(self, df, index, user_id):
+        """Check that a positional index exists and belongs to the user
+        
+        Args:
+            df (DataFrame): All stored transactions
+            index (int): Positional index of the transaction
+            user_id (str): Owner to check against (None skips the check)
+        
+        Returns:
+            bool: True if the row may be changed
+        """
+        if index not in df.index:
+            return False
+        if user_id and 'user_id' in df.columns and df.loc[index, 'user_id'] != user_id:
+            return False
+        return True
+    
+    @_locked
+    def update_category(self, index, category, user_id=None):
+        """Update the category of the transaction at a positional index
+        
+        Args:
+            index (int): Positional index of the transaction
+            category (str): The new category to assign
+            user_id (str): Only update the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was updated
+        """
+        df = self.read()
+        if not self._find_owned_row(df, index, user_id):
+            return False
+        
+        df['category'] = df['category'].astype(object)
+        df.loc[index, 'category'] = category
+        self.replace(df)
+        return True
+    
+    @_locked
+    def delete(self, index, user_id=None):
+        """Delete the transaction at a positional index
+        
+        Args:
+            index (int): Positional index of the transaction
+            user_id (str): Only delete the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was deleted
+        """
+        df = self.read()
+        if not self._find_owned_row(df, index, user_id):
+            return False
+        
+        self.replace(df.drop(index).reset_index(drop=True))
+        return True
+    
+    @_locked
+    def update_categories(self, categories):
+        """Update the categories of many transactions in one write
+        
+        Args:
+            categories (Series): New categories, indexed like `read` results
+        """
+        df = self.read()
+        df['category'] = df['category'].astype(object)
+        df.loc[categories.index, 'category'] = categories
+        self.replace(df)
+    
+    def _index_of_id(self, df, transaction_id):
+        """Find the positional index of a transaction id in a DataFrame
+        
+        Args:
+            df (DataFrame): All stored transactions
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            int: Index of the row, or None if the id is unknown
+        """
+        if df.empty or 'transaction_id' not in df.columns:
+            return None
+        
+        matches = df.index[df['transaction_id'].astype(object) == str(transaction_id)]
+        return matches[0] if len(matches) else None
+    
+    def get_by_id(self, transaction_id):
+        """Get one transaction by its id
+        
+        Args:
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            dict: The transaction, or None if the id is unknown
+        """
+        df = self.read()
+        index = self._index_of_id(df, transaction_id)
+        if index is None:
+            return None
+        return _typed_record(df.loc[index].to_dict())
+    
+    @_locked
+    def update_category_by_id(self, transaction_id, category, user_id=None):
+        """Update the category of one transaction by its id
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            category (str): The new category to assign
+            user_id (str): Only update the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was updated
+        """
+        index = self._index_of_id(self.read(), transaction_id)
+        if index is None:
+            return False
+        return self.update_category(index, category, user_id)
+    
+    @_locked
+    def delete_by_id(self, transaction_id, user_id=None):
+        """Delete one transaction by its id
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            user_id (str): Only delete the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was deleted
+        """
+        index = self._index_of_id(self.read(), transaction_id)
+        if index is None:
+            return False
+        return self.delete(index, user_id)
+
+class CSVStorage(StorageBackend):
+    """Store transactions in one flat CSV file per user
+    
+    Lookups, updates and deletes by transaction id go through a persistent
+    id -> byte offset index (see csv_index.py), so they seek straight to the
+    row instead of parsing the whole file. Category updates and deletes are
+    appended to a journal (see journal.py) that reads apply on top of the
+    file, and that is folded into the file in the background once it grows.
+    """
+    
+    name = "csv"
+    
+    # Files whose leftover journal has been replayed by this process
+    _recovered = set()
+    
+    def __init__(self, username=None, data_dir="data", file_path=None):
+        """Initialize the CSV backend for a user
+        
+        Args:
+            username (str): Username for per-user storage (if None, uses shared storage)
+            data_dir (str): Base directory for data storage
+            file_path (str): CSV file to use instead of the user's flat file
+        """
+        super().__init__(username, data_dir)
+        self.file_path = file_path or csv_file_path(username, data_dir)
+        self.index = CSVOffsetIndex(self.file_path)
+        self.lock = FileLock(self.file_path + '.lock')
+        self.journal = TransactionJournal(self.file_path + '.journal')
+        self._compactor = None
+    
+    @_locked
+    def ensure_exists(self):
+        """Create data directory and file if they don't exist"""
+        directory = os.path.dirname(self.file_path)
+        
+        # Create directory if it doesn't exist
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        # Create file with headers if it doesn't exist
+        if not os.path.exists(self.file_path):
+            empty_df = pd.DataFrame(columns=TRANSACTION_COLUMNS)
+            empty_df.to_csv(self.file_path, index=False)
+        
+        # Replay a journal left behind by a previous run, once per process
+        if self.file_path not in CSVStorage._recovered and self.journal.size():
+            self.compact()
+        CSVStorage._recovered.add(self.file_path)
+    
+    @classmethod
+    def list_users(cls, data_dir="data"):
+        """List the users that have a flat CSV transaction file
+        
+        Args:
+            data_dir (str): Base directory for data storage
+        
+        Returns:
+            set: Usernames, with None for the shared file
+        """
+        return _csv_users(data_dir)
+    
+    def identity(self):
+        """Identify the CSV file, for caching
+        
+        Returns:
+            tuple: Backend name and absolute file path
+        """
+        return (self.name, os.path.abspath(self.file_path))
+    
+    def signature(self):
+        """Get the modification time and size of the CSV file and its journal
+        
+        Returns:
+            tuple: Modification time in nanoseconds and size in bytes of the
+                file, followed by those of the journal
+        """
+        stat = os.stat(self.file_path)
+        return (stat.st_mtime_ns, stat.st_size) + self.journal.signature()
+    
+    def read(self, columns=None, start_date=None, end_date=None, categories=None,
+             types=None, sources=None, user_id=None, order=None, limit=None):
+        """Read transactions from the CSV file
+        
+        CSV has no row-level pushdown, so the filters are applied after
+        parsing. Column projection is passed to the parser.
+        
+        Args:
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+            order: Column name or list of them to sort by, '-' prefix for
+                descending (default: storage order)
+            limit (int): Maximum number of rows to return (optional)
+        
+        Returns:
+            DataFrame: Transactions with a datetime 'date' column
+        """
+        usecols = None
+        if columns is not None:
+            # Filter columns have to be read even if they are not returned
+            needed = set(columns) | _filter_columns(start_date, end_date, categories, types, sources, user_id, order)
+            if self.journal.size():
+                # The journal refers to rows by id
+                needed.add('transaction_id')
+            header = self._read_header()
+            usecols = [column for column in header if column in needed]
+        
+        # An append may be in progress; only parse complete lines
+        with open(self.file_path, 'rb') as f:
+            data = f.read()
+        df = pd.read_csv(io.BytesIO(data[:data.rfind(b'\n') + 1] or data), usecols=usecols)
+        df = self.journal.apply(df).reset_index(drop=True)
+        
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'])
+        
+        df = _filter_frame(df, start_date, end_date, categories, types, sources, user_id)
+        df = _order_frame(df, order, limit)
+        
+        if columns is not None:
+            df = df[[column for column in columns if column in df.columns]]
+        
+        return df
+    
+    def iter_chunks(self, chunk_size, columns=None, start_date=None, end_date=None, categories=None,
+                    types=None, sources=None, user_id=None):
+        """Parse the CSV file chunk by chunk
+        
+        Args:
+            chunk_size (int): Maximum number of rows per chunk
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+        
+        Yields:
+            DataFrame: Non-empty chunks of transactions in storage order
+        """
+        usecols = None
+        if columns is not None:
+            needed = set(columns) | _filter_columns(start_date, end_date, categories, types, sources, user_id)
+            if self.journal.size():
+                needed.add('transaction_id')
+            usecols = [column for column in self._read_header() if column in needed]
+        
+        with open(self.file_path, 'rb') as f:
+            # Stop before a line that an append is still writing
+            reader = pd.read_csv(_BoundedReader(f, self._complete_size()), usecols=usecols, chunksize=chunk_size)
+            for chunk in reader:
+                chunk = self.journal.apply(chunk)
+                if 'date' in chunk.columns:
+                    chunk['date'] = pd.to_datetime(chunk['date'])
+                
+                chunk = _filter_frame(chunk, start_date, end_date, categories, types, sources, user_id)
+                if columns is not None:
+                    chunk = chunk[[column for column in columns if column in chunk.columns]]
+                
+                if not chunk.empty:
+                    yield chunk
+    
+    def _complete_size(self):
+        """Find the end of the last complete line of the CSV file
+        
+        Returns:
+            int: Offset just after the last newline
+        """
+        with open(self.file_path, 'rb') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 64 * 1024)
+                f.seek(start)
+                newline = f.read(position - start).rfind(b'\n')
+                if newline != -1:
+                    return start + newline + 1
+                position = start
+        return end
+    
+    @_locked
+    def append(self, rows):
+        """Append rows to the CSV file in the order of its header
+        
+        Only the new rows are written, so the cost of an insert does not
+        grow with the size of the file. The file is rewritten once when the
+        rows carry columns the header does not know about yet.
+        
+        Args:
+            rows (list): Normalized transaction dictionaries
+        
+        Returns:
+            int: Number of rows stored
+        """
+        header = self._read_header()
+        
+        # Collect columns that the existing header does not have yet
+        new_columns = []
+        for row in rows:
+            for column in row:
+                if column not in header and column not in new_columns:
+                    new_columns.append(column)
+        
+        if header and new_columns:
+            # The schema changed, so the file has to be rewritten once
+            self._rewrite_with_columns(header + new_columns, rows)
+            return len(rows)
+        
+        columns = header or new_columns
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        
+        if not header:
+            writer.writerow(columns)
+        
+        for row in rows:
+            writer.writerow([_format_csv_value(row.get(column)) for column in columns])
+        
+        payload = buffer.getvalue().encode('utf-8')
+        
+        # Unbuffered append mode so the whole batch goes out in one write call
+        with open(self.file_path, 'a+b', buffering=0) as f:
+            # Guard against a hand-edited file without a trailing newline
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    payload = b'\n' + payload
+            f.write(payload)
+        
+        return len(rows)
+    
+    @_locked
+    def replace(self, df):
+        """Replace the stored transactions with the given DataFrame
+        
+        Args:
+            df (DataFrame): Complete contents of the new file
+        """
+        self._write_file(df)
+        self.journal.clear()
+    
+    def _write_file(self, df):
+        """Replace the CSV file in one step, leaving the journal alone
+        
+        The data is written to a temporary file in the same directory and
+        then renamed over the original, so readers never see a partial file.
+        
+        Args:
+            df (DataFrame): Complete contents of the new file
+        """
+        with atomic_write(self.file_path, newline='') as f:
+            df.to_csv(f, index=False)
+    
+    @_locked
+    def update_category(self, index, category, user_id=None):
+        """Update the category of the transaction at a positional index
+        
+        Args:
+            index (int): Positional index of the transaction
+            category (str): The new category to assign
+            user_id (str): Only update the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was updated
+        """
+        transaction_id = self._id_at(index, user_id)
+        if transaction_id is None:
+            return False
+        return self.update_category_by_id(transaction_id, category, user_id)
+    
+    @_locked
+    def delete(self, index, user_id=None):
+        """Delete the transaction at a positional index
+        
+        Args:
+            index (int): Positional index of the transaction
+            user_id (str): Only delete the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was deleted
+        """
+        transaction_id = self._id_at(index, user_id)
+        if transaction_id is None:
+            return False
+        return self.delete_by_id(transaction_id, user_id)
+    
+    def _id_at(self, index, user_id=None):
+        """Get the id of the transaction at a positional index
+        
+        Args:
+            index (int): Positional index of the transaction
+            user_id (str): Only return the id if the row belongs to this user
+        
+        Returns:
+            str: Id of the transaction, or None if there is no such row
+        """
+        if self.index.missing_ids():
+            self._backfill_ids()
+        
+        all_df = self._read_raw()
+        if not self._find_owned_row(all_df, index, user_id):
+            return None
+        return all_df.loc[index, 'transaction_id']
+    
+    def _read_raw(self):
+        """Read the CSV file as plain strings with the journal applied
+        
+        Returns:
+            DataFrame: Transactions as the file would hold them after compaction
+        """
+        # Plain strings so untouched cells are written back unchanged
+        all_df = pd.read_csv(self.file_path, dtype=str, keep_default_na=False)
+        return self.journal.apply(all_df).reset_index(drop=True)
+    
+    @_locked
+    def update_categories(self, categories):
+        """Update the categories of many transactions in one rewrite
+        
+        Only the category column changes; every other cell is written back
+        exactly as it was stored.
+        
+        Args:
+            categories (Series): New categories, indexed like `read` results
+        """
+        all_df = self._read_raw()
+        all_df.loc[categories.index, 'category'] = categories
+        self._write_file(all_df)
+        self.journal.clear()
+    
+    @_locked
+    def compact(self):
+        """Fold the journal into the CSV file and remove it"""
+        if not self.journal.size():
+            return
+        self._write_file(self._read_raw())
+        self.journal.clear()
+    
+    def _compact_in_background(self):
+        """Start a compaction thread once the journal has grown too big"""
+        if self.journal.size() < journal_compact_bytes():
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        
+        self._compactor = threading.Thread(target=self.compact, daemon=True)
+        self._compactor.start()
+    
+    def _locate(self, transaction_id):
+        """Find a transaction's row through the offset index
+        
+        Rows written before ids existed are given one first. The row found
+        is checked against the id, and the index is rebuilt once if it
+        turns out to be stale.
+        
+        Args:
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            tuple: (offset, length, row dict), or None if the id is unknown
+        """
+        if self.index.missing_ids():
+            self._backfill_ids()
+        
+        header = self._read_header()
+        for attempt in range(2):
+            location = self.index.lookup(transaction_id)
+            if location is None:
+                return None
+            
+            offset, length = location
+            with open(self.file_path, 'rb') as f:
+                f.seek(offset)
+                record = f.read(length)
+            
+            row = dict(zip(header, parse_csv_record(record)))
+            if row.get('transaction_id') == str(transaction_id):
+                categories, deleted = self.journal.state()
+                if row['transaction_id'] in deleted:
+                    return None
+                if row['transaction_id'] in categories:
+                    row['category'] = categories[row['transaction_id']]
+                return offset, length, row
+            
+            self.index.invalidate()
+        
+        return None
+    
+    @_locked
+    def _backfill_ids(self):
+        """Give every stored row without a transaction_id a new one"""
+        # Another writer may have done it while we waited for the lock
+        if not self.index.missing_ids():
+            return
+        
+        all_df = pd.read_csv(self.file_path, dtype=str, keep_default_na=False)
+        self._write_file(_fill_transaction_ids(all_df))
+    
+    def get_by_id(self, transaction_id):
+        """Get one transaction by its id with a single seek
+        
+        Args:
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            dict: The transaction, or None if the id is unknown
+        """
+        located = self._locate(transaction_id)
+        if located is None:
+            return None
+        return _typed_record(located[2])
+    
+    @_locked
+    def update_category_by_id(self, transaction_id, category, user_id=None):
+        """Update the category of one transaction by its id
+        
+        The change is appended to the journal; the file is not rewritten.
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            category (str): The new category to assign
+            user_id (str): Only update the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was updated
+        """
+        located = self._locate(transaction_id)
+        if located is None:
+            return False
+        
+        offset, length, row = located
+        if user_id and row.get('user_id') != user_id:
+            return False
+        
+        self.journal.append([{'op': 'update', 'transaction_id': row['transaction_id'], 'category': category}])
+        self._compact_in_background()
+        return True
+    
+    @_locked
+    def delete_by_id(self, transaction_id, user_id=None):
+        """Delete one transaction by its id
+        
+        The delete is appended to the journal; the file is not rewritten.
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            user_id (str): Only delete the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was deleted
+        """
+        located = self._locate(transaction_id)
+        if located is None:
+            return False
+        
+        offset, length, row = located
+        if user_id and row.get('user_id') != user_id:
+            return False
+        
+        self.journal.append([{'op': 'delete', 'transaction_id': row['transaction_id']}])
+        self._compact_in_background()
+        return True
+    
+    def _read_header(self):
+        """Read the column names from the first line of the CSV file
+        
+        Returns:
+            list: Column names, empty if the file has no header yet
+        """
+        with open(self.file_path, 'r', newline='') as f:
+            first_line = f.readline()
+        
+        if not first_line.strip():
+            return []
+        
+        return next(csv.reader([first_line]))
+    
+    def _rewrite_with_columns(self, columns, rows):
+        """Rewrite the CSV file with a widened header and the new rows
+        
+        Args:
+            columns (list): Full list of columns for the new header
+            rows (list): Transaction dictionaries to add at the end
+        """
+        # Read values as plain strings so existing rows are written back unchanged
+        all_df = pd.read_csv(self.file_path, dtype=str, keep_default_na=False)
+        new_df = pd.DataFrame(
+            [[_format_csv_value(row.get(column)) for column in columns] for row in rows],
+            columns=columns
+        )
+        
+        combined_df = pd.concat([all_df.reindex(columns=columns, fill_value=''), new_df], ignore_index=True)
+        self._write_file(combined_df)
+
+class PartitionedCSVStorage(StorageBackend):
+    """Store transactions as one CSV file per user and month
+    
+    Layout: `<data_dir>/partitioned/user=<username>/YYYY-MM.csv` with a
+    `manifest.json` next to the files that records the date range and row
+    count of every month. Date range reads only open the months they
+    overlap, and writes only touch the months of the rows they write. Each
+    month file is a regular CSVStorage file, with its own offset index,
+    journal and lock.
+    
+    An existing `transactions_<username>.csv` file is split into months the
+    first time the backend is used, and renamed to `.csv.migrated`.
+    """
+    
+    name = "partitioned"
+    
+    def __init__(self, username=None, data_dir="data"):
+        """Initialize the partitioned CSV backend for a user
+        
+        Args:
+            username (str): Username for per-user storage (if None, uses shared storage)
+            data_dir (str): Base directory for data storage
+        """
+        super().__init__(username, data_dir)
+        self.root = os.path.join(data_dir, "partitioned", f"user={username or '_shared'}")
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self.legacy_csv_path = csv_file_path(username, data_dir)
+        self.lock = FileLock(self.root + '.lock')
+        self._partitions = {}
+    
+    @_locked
+    def ensure_exists(self):
+        """Create the partition root, migrating a legacy CSV file if present"""
+        if os.path.exists(self.manifest_path):
+            return
+        
+        os.makedirs(self.root, exist_ok=True)
+        self._write_manifest({})
+        
+        if os.path.exists(self.legacy_csv_path):
+            # Plain strings so the rows are written back unchanged
+            legacy_df = pd.read_csv(self.legacy_csv_path, dtype=str, keep_default_na=False)
+            if not legacy_df.empty:
+                self.replace(_fill_transaction_ids(legacy_df))
+            os.replace(self.legacy_csv_path, self.legacy_csv_path + '.migrated')
+    
+    @classmethod
+    def list_users(cls, data_dir="data"):
+        """List the users with a partition root or a CSV file to migrate
+        
+        Args:
+            data_dir (str): Base directory for data storage
+        
+        Returns:
+            set: Usernames, with None for the shared store
+        """
+        return _partition_users(os.path.join(data_dir, "partitioned")) | _csv_users(data_dir)
+    
+    def identity(self):
+        """Identify the user's partition root, for caching
+        
+        Returns:
+            tuple: Backend name and absolute partition root
+        """
+        return (self.name, os.path.abspath(self.root))
+    
+    def signature(self):
+        """Get the signatures of all month files
+        
+        Returns:
+            tuple: One (month, signature) entry per month
+        """
+        return tuple((month, self._partition(month).signature()) for month in sorted(self._read_manifest()))
+    
+    def read(self, columns=None, start_date=None, end_date=None, categories=None,
+             types=None, sources=None, user_id=None, order=None, limit=None):
+        """Read transactions from the months that overlap the date range
+        
+        Args:
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+            order: Column name or list of them to sort by, '-' prefix for
+                descending (default: storage order)
+            limit (int): Maximum number of rows to return (optional)
+        
+        Returns:
+            DataFrame: Transactions with a datetime 'date' column
+        """
+        read_columns = None
+        if columns is not None:
+            # Sort columns have to be read even if they are not returned
+            read_columns = list(columns) + [column for column in _sort_keys(order)[0] if column not in columns]
+        
+        frames = [
+            self._partition(month).read(read_columns, start_date, end_date, categories, types, sources, user_id)
+            for month in self._months(start_date, end_date)
+        ]
+        frames = [frame for frame in frames if not frame.empty]
+        if not frames:
+            return pd.DataFrame(columns=columns or TRANSACTION_COLUMNS)
+        
+        df = _order_frame(pd.concat(frames, ignore_index=True), order, limit)
+        if columns is not None:
+            df = df[[column for column in columns if column in df.columns]]
+        
+        return df
+    
+    def iter_chunks(self, chunk_size, columns=None, start_date=None, end_date=None, categories=None,
+                    types=None, sources=None, user_id=None):
+        """Stream the months that overlap the date range chunk by chunk
+        
+        Args:
+            chunk_size (int): Maximum number of rows per chunk
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+        
+        Yields:
+            DataFrame: Non-empty chunks of transactions in storage order
+        """
+        for month in self._months(start_date, end_date):
+            yield from self._partition(month).iter_chunks(
+                chunk_size, columns, start_date, end_date, categories, types, sources, user_id
+            )
+    
+    @_locked
+    def append(self, rows):
+        """Append rows to the files of their months
+        
+        Args:
+            rows (list): Normalized transaction dictionaries
+        
+        Returns:
+            int: Number of rows stored
+        """
+        manifest = self._read_manifest()
+        
+        by_month = {}
+        for row in rows:
+            day = pd.Timestamp(row['date']).strftime('%Y-%m-%d')
+            by_month.setdefault(day[:7], []).append((day, row))
+        
+        stored = 0
+        for month, month_rows in sorted(by_month.items()):
+            count = self._partition(month).append([row for _, row in month_rows])
+            days = [day for day, _ in month_rows]
+            entry = manifest.setdefault(month, {'min_date': min(days), 'max_date': max(days), 'rows': 0})
+            entry['min_date'] = min(entry['min_date'], *days)
+            entry['max_date'] = max(entry['max_date'], *days)
+            entry['rows'] += count
+            stored += count
+        
+        self._write_manifest(manifest)
+        return stored
+    
+    @_locked
+    def replace(self, df):
+        """Rewrite every month file from the given DataFrame
+        
+        Args:
+            df (DataFrame): Complete contents of the store
+        """
+        months = pd.to_datetime(df['date']).dt.strftime('%Y-%m') if not df.empty else pd.Series(dtype=str)
+        
+        manifest = {}
+        for month, month_df in df.groupby(months, sort=True):
+            days = pd.to_datetime(month_df['date']).dt.strftime('%Y-%m-%d')
+            self._partition(month).replace(month_df)
+            manifest[month] = {'min_date': days.min(), 'max_date': days.max(), 'rows': len(month_df)}
+        
+        # Months that no longer have rows
+        for month in set(self._read_manifest()) - set(manifest):
+            self._remove_partition(month)
+        
+        self._write_manifest(manifest)
+    
+    @_locked
+    def update_category(self, index, category, user_id=None):
+        """Update the category of the transaction at a positional index
+        
+        Args:
+            index (int): Positional index of the transaction
+            category (str): The new category to assign
+            user_id (str): Only update the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was updated
+        """
+        df = self.read()
+        if not self._find_owned_row(df, index, user_id):
+            return False
+        return self.update_category_by_id(df.loc[index, 'transaction_id'], category, user_id)
+    
+    @_locked
+    def delete(self, index, user_id=None):
+        """Delete the transaction at a positional index
+        
+        Args:
+            index (int): Positional index of the transaction
+            user_id (str): Only delete the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was deleted
+        """
+        df = self.read()
+        if not self._find_owned_row(df, index, user_id):
+            return False
+        return self.delete_by_id(df.loc[index, 'transaction_id'], user_id)
+    
+    @_locked
+    def update_categories(self, categories):
+        """Update the categories of many transactions, rewriting only the months they are in
+        
+        Args:
+            categories (Series): New categories, indexed like `read` results
+        """
+        offset = 0
+        for month in self._months(None, None):
+            partition = self._partition(month)
+            month_df = partition._read_raw()
+            in_month = categories[(categories.index >= offset) & (categories.index < offset + len(month_df))]
+            if len(in_month):
+                # Under the month file's own lock, so a background compaction of it cannot interleave
+                partition.update_categories(in_month.set_axis(in_month.index - offset))
+            offset += len(month_df)
+    
+    def get_by_id(self, transaction_id):
+        """Get one transaction by its id through the month offset indexes
+        
+        Args:
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            dict: The transaction, or None if the id is unknown
+        """
+        month = self._month_of(transaction_id)
+        if month is None:
+            return None
+        return self._partition(month).get_by_id(transaction_id)
+    
+    @_locked
+    def update_category_by_id(self, transaction_id, category, user_id=None):
+        """Update the category of one transaction by its id
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            category (str): The new category to assign
+            user_id (str): Only update the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was updated
+        """
+        month = self._month_of(transaction_id)
+        if month is None:
+            return False
+        return self._partition(month).update_category_by_id(transaction_id, category, user_id)
+    
+    @_locked
+    def delete_by_id(self, transaction_id, user_id=None):
+        """Delete one transaction by its id
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            user_id (str): Only delete the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was deleted
+        """
+        month = self._month_of(transaction_id)
+        if month is None or not self._partition(month).delete_by_id(transaction_id, user_id):
+            return False
+        
+        # The date range is left as is; it only has to cover the rows
+        manifest = self._read_manifest()
+        manifest[month]['rows'] -= 1
+        self._write_manifest(manifest)
+        return True
+    
+    def _months(self, start_date=None, end_date=None):
+        """List the months whose date range overlaps the given one
+        
+        Args:
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+        
+        Returns:
+            list: Months (YYYY-MM) in chronological order
+        """
+        start = pd.Timestamp(start_date).normalize() if start_date is not None else None
+        end = pd.Timestamp(end_date) if end_date is not None else None
+        
+        months = []
+        for month, entry in sorted(self._read_manifest().items()):
+            if start is not None and pd.Timestamp(entry['max_date']) < start:
+                continue
+            if end is not None and pd.Timestamp(entry['min_date']) > end:
+                continue
+            months.append(month)
+        return months
+    
+    def _month_of(self, transaction_id):
+        """Find the month file that holds a transaction
+        
+        Recent months are searched first, since that is where most edits happen.
+        
+        Args:
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            str: Month (YYYY-MM), or None if the id is unknown
+        """
+        for month in sorted(self._read_manifest(), reverse=True):
+            if self._partition(month)._locate(transaction_id) is not None:
+                return month
+        return None
+    
+    def _partition(self, month):
+        """Get the CSV backend of one month file
+        
+        Args:
+            month (str): Month (YYYY-MM)
+        
+        Returns:
+            CSVStorage: Backend for the month file
+        """
+        partition = self._partitions.get(month)
+        if partition is None:
+            partition = CSVStorage(self.username, self.data_dir, file_path=os.path.join(self.root, f"{month}.csv"))
+            partition.ensure_exists()
+            self._partitions[month] = partition
+        return partition
+    
+    def _remove_partition(self, month):
+        """Delete a month file and its index and journal
+        
+        Args:
+            month (str): Month (YYYY-MM)
+        """
+        path = os.path.join(self.root, f"{month}.csv")
+        for suffix in ('', '.idx', '.journal'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        self._partitions.pop(month, None)
+    
+    def _read_manifest(self):
+        """Read the month entries of the manifest
+        
+        Returns:
+            dict: Month -> {'min_date', 'max_date', 'rows'}
+        """
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)['partitions']
+    
+    def _write_manifest(self, partitions):
+        """Replace the manifest in one step
+        
+        Args:
+            partitions (dict): Month -> {'min_date', 'max_date', 'rows'}
+        """
+        with atomic_write(self.manifest_path) as f:
+            json.dump({'version': 1, 'partitions': partitions}, f, indent=2, sort_keys=True)
+
+class ParquetStorage(StorageBackend):
+    """Store transactions as typed Parquet files partitioned by user and month
+    
+    Layout: `<data_dir>/parquet/user=<username>/month=YYYY-MM/part-<n>.parquet`,
+    with a `manifest.json` listing the live part files of every month in the
+    order they were written, which is the order rows are read back in.
+    Dates are stored as timestamps, amounts as doubles and the low-cardinality
+    text columns as dictionary-encoded (categorical) strings. Date range and
+    category filters are pushed down to pyarrow, which skips whole month
+    partitions and row groups that cannot match.
+    
+    Part files are never changed in place. A write adds new parts and then
+    replaces the manifest in one rename, and only afterwards deletes the
+    parts it retired, so a reader sees either the old or the new set of
+    parts, never a mix, duplicates or an empty store. Readers memory-map the
+    parts they list, so a part deleted while they read stays readable.
+    
+    An existing `transactions_<username>.csv` file is migrated into Parquet
+    the first time the backend is used, and renamed to `.csv.migrated`.
+    """
+    
+    name = "parquet"
+    
+    # Columns stored as dictionary-encoded strings
+    CATEGORICAL_COLUMNS = ['type', 'category', 'source']
+    
+    # Small part files in a month are merged once there are this many
+    MAX_PARTS_PER_MONTH = 16
+    
+    # Times a reader re-reads the manifest when a listed part was just retired
+    OPEN_ATTEMPTS = 3
+    
+    def __init__(self, username=None, data_dir="data"):
+        """Initialize the Parquet backend for a user
+        
+        Args:
+            username (str): Username for per-user storage (if None, uses shared storage)
+            data_dir (str): Base directory for data storage
+        """
+        super().__init__(username, data_dir)
+        
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("The parquet storage backend requires pyarrow (pip install pyarrow)")
+        
+        self.root = os.path.join(data_dir, "parquet", f"user={username or '_shared'}")
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self.legacy_csv_path = csv_file_path(username, data_dir)
+        self.lock = FileLock(self.root + '.lock')
+    
+    @_locked
+    def ensure_exists(self):
+        """Create the partition root, migrating a legacy CSV file if present"""
+        if os.path.exists(self.manifest_path):
+            return
+        
+        if os.path.exists(self.root):
+            # A store written before there was a manifest
+            self._write_manifest(self._adopt_parts())
+            return
+        
+        os.makedirs(self.root)
+        manifest = self._read_manifest()
+        
+        if os.path.exists(self.legacy_csv_path):
+            # Plain strings so values like phone numbers are stored unchanged;
+            # _to_table types the date and amount columns
+            legacy_df = pd.read_csv(self.legacy_csv_path, dtype=str, keep_default_na=False)
+            if not legacy_df.empty:
+                legacy_df = legacy_df.mask(legacy_df == '')
+                legacy_df['date'] = pd.to_datetime(legacy_df['date'])
+                self._write_frame(_fill_transaction_ids(legacy_df), manifest)
+        
+        self._write_manifest(manifest)
+        if os.path.exists(self.legacy_csv_path):
+            os.replace(self.legacy_csv_path, self.legacy_csv_path + '.migrated')
+    
+    @classmethod
+    def list_users(cls, data_dir="data"):
+        """List the users with a partition root or a CSV file to migrate
+        
+        Args:
+            data_dir (str): Base directory for data storage
+        
+        Returns:
+            set: Usernames, with None for the shared store
+        """
+        return _partition_users(os.path.join(data_dir, "parquet")) | _csv_users(data_dir)
+    
+    def identity(self):
+        """Identify the user's partition root, for caching
+        
+        Returns:
+            tuple: Backend name and absolute partition root
+        """
+        return (self.name, os.path.abspath(self.root))
+    
+    def signature(self):
+        """Get the generation of the manifest
+        
+        Every write replaces the manifest with the next generation, so this
+        changes whenever the set of live part files does.
+        
+        Returns:
+            tuple: Modification time in nanoseconds of the manifest and its generation
+        """
+        stat = os.stat(self.manifest_path)
+        return (stat.st_mtime_ns, self._read_manifest()['generation'])
+    
+    def read(self, columns=None, start_date=None, end_date=None, categories=None,
+             types=None, sources=None, user_id=None, order=None, limit=None):
+        """Read transactions with projection and predicate pushdown
+        
+        Args:
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+            order: Column name or list of them to sort by, '-' prefix for
+                descending (default: storage order)
+            limit (int): Maximum number of rows to return (optional)
+        
+        Returns:
+            DataFrame: Transactions with a datetime 'date' column
+        """
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=columns or TRANSACTION_COLUMNS)
+        
+        stored_columns = [name for name in dataset.schema.names if name != 'month']
+        
+        expression, possible = self._filter_expression(
+            stored_columns, start_date, end_date, categories, types, sources, user_id
+        )
+        if not possible:
+            return pd.DataFrame(columns=columns or stored_columns)
+        
+        if columns is None:
+            projection = stored_columns
+        else:
+            # Sort columns have to be read even if they are not returned
+            needed = set(columns) | set(_sort_keys(order)[0])
+            projection = [column for column in stored_columns if column in needed]
+        
+        table = dataset.to_table(columns=projection, filter=expression)
+        df = self._to_frame(table)
+        
+        df = _order_frame(df.reset_index(drop=True), order, limit)
+        if columns is not None:
+            df = df[[column for column in columns if column in df.columns]]
+        
+        return df
+    
+    def iter_chunks(self, chunk_size, columns=None, start_date=None, end_date=None, categories=None,
+                    types=None, sources=None, user_id=None):
+        """Stream record batches with projection and predicate pushdown
+        
+        Args:
+            chunk_size (int): Maximum number of rows per chunk
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+        
+        Yields:
+            DataFrame: Non-empty chunks of transactions in storage order
+        """
+        dataset = self._dataset()
+        if dataset is None:
+            return
+        
+        stored_columns = [name for name in dataset.schema.names if name != 'month']
+        expression, possible = self._filter_expression(
+            stored_columns, start_date, end_date, categories, types, sources, user_id
+        )
+        if not possible:
+            return
+        
+        projection = stored_columns if columns is None else [
+            column for column in stored_columns if column in columns
+        ]
+        for batch in dataset.to_batches(columns=projection, filter=expression, batch_size=chunk_size):
+            if batch.num_rows:
+                yield self._to_frame(batch)
+    
+    def _to_frame(self, table):
+        """Convert a pyarrow table or record batch to a DataFrame
+        
+        Args:
+            table (pyarrow.Table): Data read from the dataset
+        
+        Returns:
+            DataFrame: Transactions with the low-cardinality columns as categoricals
+        """
+        df = table.to_pandas()
+        
+        # Keep the categorical dtype for the low-cardinality columns
+        for column in self.CATEGORICAL_COLUMNS:
+            if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+                df[column] = df[column].astype('category')
+        
+        return df
+    
+    def _filter_expression(self, stored_columns, start_date=None, end_date=None, categories=None,
+                           types=None, sources=None, user_id=None):
+        """Build the pyarrow filter for the read filters
+        
+        Args:
+            stored_columns (list): Columns of the dataset
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+        
+        Returns:
+            tuple: (expression or None, False if no row can match)
+        """
+        import pyarrow.dataset as ds
+        
+        expression = None
+        conditions = []
+        if start_date is not None:
+            start = pd.Timestamp(start_date)
+            conditions.append(ds.field('month') >= start.strftime('%Y-%m'))
+            conditions.append(ds.field('date') >= start)
+        if end_date is not None:
+            end = pd.Timestamp(end_date)
+            conditions.append(ds.field('month') <= end.strftime('%Y-%m'))
+            conditions.append(ds.field('date') <= end)
+        for column, values in (('category', categories), ('type', types), ('source', sources)):
+            if values is None:
+                continue
+            if column not in stored_columns:
+                return None, False
+            conditions.append(ds.field(column).isin(list(values)))
+        if user_id is not None and 'user_id' in stored_columns:
+            conditions.append(ds.field('user_id') == user_id)
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        
+        return expression, True
+    
+    @_locked
+    def append(self, rows):
+        """Write new transactions into their month partitions
+        
+        Each batch adds one part file per month it touches; a month with
+        many small parts is merged into a single file.
+        
+        Args:
+            rows (list): Normalized transaction dictionaries
+        
+        Returns:
+            int: Number of rows stored
+        """
+        df = pd.DataFrame(rows)
+        df['date'] = pd.to_datetime(df['date'])
+        
+        manifest = self._read_manifest()
+        retired = []
+        for month in self._write_frame(df, manifest):
+            retired += self._compact_month(month, manifest)
+        
+        self._write_manifest(manifest)
+        self._remove_parts(retired)
+        
+        return len(rows)
+    
+    @_locked
+    def replace(self, df):
+        """Rewrite all partitions with the given DataFrame
+        
+        The new parts are written next to the old ones and swapped in with
+        the manifest; the old parts are deleted afterwards.
+        
+        Args:
+            df (DataFrame): Complete new contents of the store
+        """
+        manifest = self._read_manifest()
+        manifest['months'] = {}
+        
+        if not df.empty:
+            df = df.copy()
+            df['date'] = pd.to_datetime(df['date'])
+            self._write_frame(df, manifest)
+        
+        self._write_manifest(manifest)
+        
+        # Everything not in the new manifest, including parts left behind by
+        # a write that failed before its manifest was written
+        live = {(month, name) for month, names in manifest['months'].items() for name in names}
+        self._remove_parts([
+            (name[len('month='):], part)
+            for name in os.listdir(self.root) if name.startswith('month=')
+            for part in os.listdir(os.path.join(self.root, name))
+            if part.endswith('.parquet') and (name[len('month='):], part) not in live
+        ])
+    
+    def _find_part(self, transaction_id):
+        """Find the part file holding a transaction
+        
+        Only the transaction_id column of each part is scanned.
+        
+        Args:
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            tuple: (month, part file name), or None if the id is unknown
+        """
+        import pyarrow.parquet as pq
+        
+        condition = [('transaction_id', '==', str(transaction_id))]
+        for month, names in self._read_manifest()['months'].items():
+            for name in names:
+                path = self._part_path(month, name)
+                if 'transaction_id' not in pq.read_schema(path).names:
+                    continue
+                if pq.read_table(path, columns=['transaction_id'], filters=condition).num_rows:
+                    return month, name
+        return None
+        
+    def _rewrite_part(self, part, transaction_id, change, user_id=None):
+        """Apply a change to one transaction and rewrite only its part file
+        
+        The changed rows go to a new part file that takes the place of the
+        old one in the manifest.
+        
+        Args:
+            part (tuple): (month, part file name) holding the transaction
+            transaction_id (str): Id of the transaction
+            change (callable): Takes the part's DataFrame and the row's
+                index and returns the new DataFrame
+            user_id (str): Only change the row if it belongs to this user
+        
+        Returns:
+            bool: True if the part file was rewritten
+        """
+        import pyarrow.parquet as pq
+        
+        month, name = part
+        df = pq.read_table(self._part_path(month, name)).to_pandas()
+        index = self._index_of_id(df, transaction_id)
+        if index is None:
+            return False
+        if user_id and 'user_id' in df.columns and df.loc[index, 'user_id'] != user_id:
+            return False
+        
+        df = change(df, index)
+        manifest = self._read_manifest()
+        names = manifest['months'][month]
+        position = names.index(name)
+        if df.empty:
+            del names[position]
+            if not names:
+                del manifest['months'][month]
+        else:
+            names[position] = self._write_part(month, self._to_table(df.reset_index(drop=True)), manifest)
+        
+        self._write_manifest(manifest)
+        self._remove_parts([part])
+        return True
+    
+    def get_by_id(self, transaction_id):
+        """Get one transaction by its id
+        
+        Args:
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            dict: The transaction, or None if the id is unknown
+        """
+        import pyarrow.dataset as ds
+        
+        dataset = self._dataset()
+        if dataset is None or 'transaction_id' not in dataset.schema.names:
+            return None
+        
+        columns = [name for name in dataset.schema.names if name != 'month']
+        table = dataset.to_table(columns=columns, filter=ds.field('transaction_id') == str(transaction_id))
+        if not table.num_rows:
+            return None
+        return _typed_record(table.slice(0, 1).to_pylist()[0])
+    
+    @_locked
+    def update_category_by_id(self, transaction_id, category, user_id=None):
+        """Update the category of one transaction, rewriting only its part file
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            category (str): The new category to assign
+            user_id (str): Only update the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was updated
+        """
+        part = self._find_part(transaction_id)
+        if part is None:
+            return False
+        
+        def change(df, index):
+            df['category'] = df['category'].astype(object)
+            df.loc[index, 'category'] = category
+            return df
+        
+        return self._rewrite_part(part, transaction_id, change, user_id)
+    
+    @_locked
+    def delete_by_id(self, transaction_id, user_id=None):
+        """Delete one transaction, rewriting only its part file
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            user_id (str): Only delete the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was deleted
+        """
+        part = self._find_part(transaction_id)
+        if part is None:
+            return False
+        
+        return self._rewrite_part(part, transaction_id, lambda df, index: df.drop(index), user_id)
+    
+    def _dataset(self):
+        """Open the live part files of the user as one dataset
+        
+        Returns:
+            pyarrow.dataset.Dataset: The dataset, or None if it has no files
+        """
+        # A writer may retire a part between reading the manifest and
+        # opening the part; the manifest it wrote first lists its successor
+        for _ in range(self.OPEN_ATTEMPTS - 1):
+            try:
+                return self._open_dataset(self._read_manifest())
+            except FileNotFoundError:
+                continue
+        return self._open_dataset(self._read_manifest())
+    
+    def _open_dataset(self, manifest):
+        """Open the part files listed in a manifest as one dataset
+        
+        Args:
+            manifest (dict): Manifest listing the parts
+        
+        Returns:
+            pyarrow.dataset.Dataset: The dataset, or None if it has no files
+        """
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+        
+        # Memory-mapped up front, so the parts stay readable after a writer deletes them
+        parts = [
+            (month, pa.memory_map(self._part_path(month, name)))
+            for month, names in sorted(manifest['months'].items())
+            for name in names
+        ]
+        if not parts:
+            return None
+        
+        # Files written before a column was introduced lack it, so read
+        # with the union of all file schemas
+        schema = pa.unify_schemas([pq.read_schema(source) for _, source in parts])
+        file_format = ds.ParquetFileFormat()
+        fragments = [
+            file_format.make_fragment(source, partition_expression=ds.field('month') == month)
+            for month, source in parts
+        ]
+        
+        return ds.FileSystemDataset(fragments, schema.append(pa.field('month', pa.string())), file_format)
+    
+    def _part_path(self, month, name):
+        """Get the path of a part file
+        
+        Args:
+            month (str): Month partition in YYYY-MM format
+            name (str): Part file name
+        
+        Returns:
+            str: Path of the part file
+        """
+        return os.path.join(self.root, f"month={month}", name)
+        
+    def _read_manifest(self):
+        """Read the manifest of live part files
+        
+        Returns:
+            dict: 'months' (month -> part file names in write order),
+                'next_part' (number of the next part file) and 'generation'
+        """
+        if not os.path.exists(self.manifest_path):
+            return {'version': 1, 'generation': 0, 'next_part': 0, 'months': {}}
+        with open(self.manifest_path, 'r') as f:
+            return json.load(f)
+    
+    def _write_manifest(self, manifest):
+        """Replace the manifest in one step, as its next generation
+        
+        Args:
+            manifest (dict): Manifest to write (see _read_manifest)
+        """
+        manifest['generation'] += 1
+        with atomic_write(self.manifest_path) as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+    
+    def _adopt_parts(self):
+        """Build a manifest for part files written before there was one
+        
+        Returns:
+            dict: Manifest listing every part, oldest first
+        """
+        manifest = self._read_manifest()
+        for name in sorted(os.listdir(self.root)):
+            if not name.startswith('month='):
+                continue
+            month_dir = os.path.join(self.root, name)
+            parts = [part for part in os.listdir(month_dir) if part.endswith('.parquet')]
+            if parts:
+                # Modification time is the best record of the order they were written in
+                parts.sort(key=lambda part: (os.stat(os.path.join(month_dir, part)).st_mtime_ns, part))
+                manifest['months'][name[len('month='):]] = parts
+                # New parts must not reuse the name of a numbered part
+                numbers = [int(part[5:-8]) for part in parts if part[5:-8].isdigit()]
+                manifest['next_part'] = max([manifest['next_part']] + [number + 1 for number in numbers])
+        return manifest
+    
+    def _remove_parts(self, parts):
+        """Delete retired part files, and month directories left empty
+        
+        Args:
+            parts (list): (month, part file name) pairs no manifest lists anymore
+        """
+        for month, name in parts:
+            path = self._part_path(month, name)
+            if os.path.exists(path):
+                os.remove(path)
+        for month in {month for month, _ in parts}:
+            month_dir = os.path.join(self.root, f"month={month}")
+            if os.path.isdir(month_dir) and not os.listdir(month_dir):
+                os.rmdir(month_dir)
+    
+    def _to_table(self, df):
+        """Convert a DataFrame to an Arrow table with the storage types
+        
+        Args:
+            df (DataFrame): Transactions with a datetime 'date' column
+        
+        Returns:
+            pyarrow.Table: Typed table ready to be written
+        """
+        import pyarrow as pa
+        
+        arrays = []
+        names = []
+        for column in df.columns:
+            values = df[column]
+            if column == 'date':
+                array = pa.array(pd.to_datetime(values), type=pa.timestamp('us'))
+            elif column == 'amount':
+                array = pa.array(pd.to_numeric(values), type=pa.float64())
+            else:
+                # Everything else is text; missing values stay null
+                text = values.astype(object).where(values.notna(), None)
+                array = pa.array([None if value is None else str(value) for value in text], type=pa.string())
+                if column in self.CATEGORICAL_COLUMNS:
+                    array = array.dictionary_encode()
+            arrays.append(array)
+            names.append(column)
+        
+        return pa.Table.from_arrays(arrays, names=names)
+    
+    def _write_part(self, month, table, manifest):
+        """Write a table as the next numbered part file of a month
+        
+        The part is not live until a manifest listing it is written.
+        
+        Args:
+            month (str): Month partition in YYYY-MM format
+            table (pyarrow.Table): Rows of the part
+            manifest (dict): Manifest whose part counter is advanced
+        
+        Returns:
+            str: Name of the new part file
+        """
+        import pyarrow.parquet as pq
+        
+        month_dir = os.path.join(self.root, f"month={month}")
+        os.makedirs(month_dir, exist_ok=True)
+        
+        name = f"part-{manifest['next_part']:012d}.parquet"
+        manifest['next_part'] += 1
+        
+        # Write to a hidden temp name first so a partial file is never left under a part name
+        temp_path = os.path.join(month_dir, f".{name}.tmp")
+        pq.write_table(table, temp_path)
+        os.replace(temp_path, os.path.join(month_dir, name))
+        return name
+    
+    def _write_frame(self, df, manifest):
+        """Write a DataFrame as new part files, one per month
+        
+        Args:
+            df (DataFrame): Transactions with a datetime 'date' column
+            manifest (dict): Manifest the new parts are added to
+        
+        Returns:
+            list: Months that received a new part file
+        """
+        # Every file carries the full typed schema, plus any extra columns
+        extra_columns = [column for column in df.columns if column not in TRANSACTION_COLUMNS]
+        df = df.reindex(columns=TRANSACTION_COLUMNS + extra_columns)
+        months = df['date'].dt.strftime('%Y-%m')
+        written = []
+        
+        for month, month_df in df.groupby(months, sort=True):
+            name = self._write_part(month, self._to_table(month_df.reset_index(drop=True)), manifest)
+            manifest['months'].setdefault(month, []).append(name)
+            written.append(month)
+        
+        return written
+    
+    def _compact_month(self, month, manifest):
+        """Merge the part files of a month once there are too many
+        
+        Args:
+            month (str): Month partition in YYYY-MM format
+            manifest (dict): Manifest the merged part replaces the parts in
+        
+        Returns:
+            list: (month, part file name) of the parts merged away
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        names = manifest['months'][month]
+        if len(names) < self.MAX_PARTS_PER_MONTH:
+            return []
+        
+        tables = [pq.read_table(self._part_path(month, name)) for name in names]
+        merged = pa.concat_tables(tables, promote_options='default')
+        
+        manifest['months'][month] = [self._write_part(month, merged, manifest)]
+        return [(month, name) for name in names]
+
+class SQLiteStorage(StorageBackend):
+    """Store transactions in an embedded SQLite database
+    
+    All users share one `transactions` table in `<data_dir>/transactions.db`,
+    indexed on (user_id, date), (user_id, category) and a transaction_id
+    unique per user. Point updates and deletes address rows by their rowid,
+    which is also the index of the DataFrames this backend returns, so they
+    touch a single row instead of rewriting the whole store. The database
+    runs in WAL mode so readers do not block the writer and several
+    processes can write safely.
+    
+    Every write also bumps the user's counter in the `user_changes` table,
+    in the same database transaction, so the signature of one user's store
+    only changes with that user's writes.
+    
+    Rows repeating an existing transaction_id are ignored on insert. A
+    user's legacy CSV file is imported once on first access and left in
+    place, so the CSV backend can still be used for comparison.
+    """
+    
+    name = "sqlite"
+    
+    # Column types of the transactions table; extra columns are stored as TEXT
+    COLUMN_TYPES = {
+        'date': 'TEXT NOT NULL',
+        'description': 'TEXT',
+        'amount': 'REAL NOT NULL',
+        'type': 'TEXT',
+        'category': 'TEXT',
+        'source': 'TEXT',
+        'user_id': 'TEXT',
+        'transaction_id': 'TEXT',
+    }
+    
+    def __init__(self, username=None, data_dir="data"):
+        """Initialize the SQLite backend for a user
+        
+        Args:
+            username (str): Username for per-user storage (if None, uses shared storage)
+            data_dir (str): Base directory for data storage
+        """
+        super().__init__(username, data_dir)
+        self.db_path = os.path.join(data_dir, "transactions.db")
+        self.legacy_csv_path = csv_file_path(username, data_dir)
+    
+    def _connect(self):
+        """Open a connection to the database
+        
+        Returns:
+            sqlite3.Connection: Connection with WAL mode and a busy timeout
+        """
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+    
+    def ensure_exists(self):
+        """Create the database schema and import a legacy CSV file once"""
+        directory = os.path.dirname(self.db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        
+        columns = ', '.join(f"{name} {column_type}" for name, column_type in self.COLUMN_TYPES.items())
+        with closing(self._connect()) as connection, connection:
+            connection.execute(f"CREATE TABLE IF NOT EXISTS transactions (id INTEGER PRIMARY KEY, {columns})")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_date ON transactions (user_id, date)")
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_transactions_user_category ON transactions (user_id, category)")
+            # Receipt numbers are unique per user: a transfer between two users is stored for both
+            connection.execute("DROP INDEX IF EXISTS idx_transactions_transaction_id")
+            connection.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_user_transaction_id "
+                "ON transactions (user_id, transaction_id) WHERE user_id IS NOT NULL"
+            )
+            connection.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_shared_transaction_id "
+                "ON transactions (transaction_id) WHERE user_id IS NULL"
+            )
+            connection.execute("CREATE TABLE IF NOT EXISTS imported_files (path TEXT PRIMARY KEY)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS user_changes (user_key TEXT PRIMARY KEY, changes INTEGER NOT NULL)"
+            )
+            
+            legacy_path = os.path.abspath(self.legacy_csv_path)
+            already_imported = connection.execute(
+                "SELECT 1 FROM imported_files WHERE path = ?", (legacy_path,)
+            ).fetchone()
+        
+        if already_imported or not os.path.exists(self.legacy_csv_path):
+            return
+        
+        legacy_df = pd.read_csv(self.legacy_csv_path, dtype=str, keep_default_na=False)
+        rows = [
+            {column: (value if value != '' else None) for column, value in record.items()}
+            for record in legacy_df.to_dict('records')
+        ]
+        for row in rows:
+            row['date'] = pd.Timestamp(row['date']).strftime('%Y-%m-%d')
+            row['amount'] = float(row['amount'])
+            row['transaction_id'] = row.get('transaction_id') or new_transaction_id()
+            if self.username:
+                row['user_id'] = self.username
+        
+        with closing(self._connect()) as connection, connection:
+            self._insert(connection, rows)
+            connection.execute("INSERT INTO imported_files (path) VALUES (?)", (legacy_path,))
+    
+    @classmethod
+    def list_users(cls, data_dir="data"):
+        """List the users with rows in the database or a CSV file to import
+        
+        Args:
+            data_dir (str): Base directory for data storage
+        
+        Returns:
+            set: Usernames, with None for rows without a user
+        """
+        users = _csv_users(data_dir)
+        db_path = os.path.join(data_dir, "transactions.db")
+        if not os.path.exists(db_path):
+            return users
+        
+        with closing(sqlite3.connect(db_path, timeout=30)) as connection:
+            try:
+                rows = connection.execute("SELECT DISTINCT user_id FROM transactions").fetchall()
+            except sqlite3.OperationalError:
+                # The database exists but the schema was never created
+                return users
+        return users | {row[0] for row in rows}
+    
+    def identity(self):
+        """Identify the database and user, for caching
+        
+        Returns:
+            tuple: Backend name, absolute database path and username
+        """
+        return (self.name, os.path.abspath(self.db_path), self.username)
+    
+    def signature(self):
+        """Get the change counter of the user's rows
+        
+        The database file's inode is included so a recreated database
+        does not reuse the counters of the old one.
+        
+        Returns:
+            tuple: Inode of the database and the number of writes to the user's rows
+        """
+        inode = os.stat(self.db_path).st_ino
+        with closing(self._connect()) as connection:
+            row = connection.execute(
+                "SELECT changes FROM user_changes WHERE user_key = ?", (self._user_key(),)
+            ).fetchone()
+        return (inode, row[0] if row else 0)
+    
+    def _user_key(self):
+        """Get the key of the user in the user_changes table
+        
+        Returns:
+            str: Username, or an empty string for the shared store
+        """
+        return self.username or ''
+    
+    def _record_change(self, connection):
+        """Bump the user's change counter
+        
+        Args:
+            connection (sqlite3.Connection): Open connection inside the
+                transaction that changed the user's rows
+        """
+        connection.execute(
+            "INSERT INTO user_changes (user_key, changes) VALUES (?, 1) "
+            "ON CONFLICT(user_key) DO UPDATE SET changes = changes + 1",
+            (self._user_key(),)
+        )
+    
+    def _table_columns(self, connection):
+        """List the columns of the transactions table
+        
+        Args:
+            connection (sqlite3.Connection): Open connection
+        
+        Returns:
+            list: Column names, without the rowid column
+        """
+        info = connection.execute("PRAGMA table_info(transactions)").fetchall()
+        return [row[1] for row in info if row[1] != 'id']
+    
+    def _user_clause(self):
+        """Build the WHERE clause that scopes queries to the current user
+        
+        Returns:
+            tuple: SQL condition and its parameters
+        """
+        if self.username:
+            return "user_id = ?", [self.username]
+        return "user_id IS NULL", []
+    
+    def read(self, columns=None, start_date=None, end_date=None, categories=None,
+             types=None, sources=None, user_id=None, order=None, limit=None):
+        """Read transactions with the filters evaluated by SQLite
+        
+        Sorting and the row limit are part of the query too. Rows are always
+        scoped to the backend's user, so user_id only exists for
+        compatibility with the other backends.
+        
+        Args:
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+            order: Column name or list of them to sort by, '-' prefix for
+                descending (default: storage order)
+            limit (int): Maximum number of rows to return (optional)
+        
+        Returns:
+            DataFrame: Transactions indexed by rowid, with a datetime 'date' column
+        
+        Raises:
+            ValueError: If the order refers to an unknown column
+        """
+        with closing(self._connect()) as connection:
+            stored_columns = self._table_columns(connection)
+            selected = stored_columns if columns is None else [
+                column for column in columns if column in stored_columns
+            ]
+            
+            where, params = self._where_clause(start_date, end_date, categories, types, sources)
+            
+            sort_columns, ascending = _sort_keys(order)
+            ordering = []
+            for column, is_ascending in zip(sort_columns, ascending):
+                if column not in stored_columns:
+                    raise ValueError(f"Unknown order column '{column}'")
+                ordering.append(f"{column} {'ASC' if is_ascending else 'DESC'}")
+            ordering.append("id")
+            
+            select_list = ', '.join(['id'] + selected)
+            query = (
+                f"SELECT {select_list} FROM transactions WHERE {where} "
+                f"ORDER BY {', '.join(ordering)}"
+            )
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(int(limit))
+            df = pd.read_sql_query(query, connection, params=params, index_col='id')
+        
+        df.index.name = None
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'])
+        
+        return df
+    
+    def iter_chunks(self, chunk_size, columns=None, start_date=None, end_date=None, categories=None,
+                    types=None, sources=None, user_id=None):
+        """Stream query results from SQLite in chunks
+        
+        Args:
+            chunk_size (int): Maximum number of rows per chunk
+            columns (list): Columns to read (default: all)
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+            user_id (str): Only keep rows of this user (optional)
+        
+        Yields:
+            DataFrame: Non-empty chunks of transactions in storage order
+        """
+        with closing(self._connect()) as connection:
+            stored_columns = self._table_columns(connection)
+            selected = stored_columns if columns is None else [
+                column for column in columns if column in stored_columns
+            ]
+            where, params = self._where_clause(start_date, end_date, categories, types, sources)
+            
+            query = f"SELECT {', '.join(['id'] + selected)} FROM transactions WHERE {where} ORDER BY id"
+            for chunk in pd.read_sql_query(query, connection, params=params, index_col='id', chunksize=chunk_size):
+                chunk.index.name = None
+                if 'date' in chunk.columns:
+                    chunk['date'] = pd.to_datetime(chunk['date'])
+                if not chunk.empty:
+                    yield chunk
+    
+    def _where_clause(self, start_date=None, end_date=None, categories=None, types=None, sources=None):
+        """Build the WHERE clause for the read filters, scoped to the user
+        
+        Args:
+            start_date: Inclusive lower bound for the date (optional)
+            end_date: Inclusive upper bound for the date (optional)
+            categories (list): Categories to keep (optional)
+            types (list): Transaction types to keep (optional)
+            sources (list): Sources to keep (optional)
+        
+        Returns:
+            tuple: SQL condition and its parameters
+        """
+        condition, params = self._user_clause()
+        conditions = [condition]
+        if start_date is not None:
+            start = pd.Timestamp(start_date)
+            # Stored dates are whole days, so a start time after midnight
+            # excludes that day
+            if start != start.normalize():
+                start = start.normalize() + pd.Timedelta(days=1)
+            conditions.append("date >= ?")
+            params.append(start.strftime('%Y-%m-%d'))
+        if end_date is not None:
+            conditions.append("date <= ?")
+            params.append(pd.Timestamp(end_date).strftime('%Y-%m-%d'))
+        for column, values in (('category', categories), ('type', types), ('source', sources)):
+            if values is not None:
+                values = list(values)
+                conditions.append(f"{column} IN ({', '.join('?' for _ in values)})" if values else "0")
+                params.extend(values)
+            
+        return ' AND '.join(conditions), params
+    
+    def _insert(self, connection, rows):
+        """Insert rows, adding table columns for unknown fields
+        
+        Args:
+            connection (sqlite3.Connection): Open connection inside a transaction
+            rows (list): Normalized transaction dictionaries
+        
+        Returns:
+            int: Number of rows inserted
+        """
+        columns = self._table_columns(connection)
+        for row in rows:
+            for column in row:
+                if column not in columns:
+                    if not column.isidentifier():
+                        raise ValueError(f"Invalid column name '{column}'")
+                    connection.execute(f"ALTER TABLE transactions ADD COLUMN {column} TEXT")
+                    # Every user's rows gain the column
+                    connection.execute("UPDATE user_changes SET changes = changes + 1")
+                    columns.append(column)
+        
+        before = connection.total_changes
+        for row in rows:
+            names = list(row)
+            values = [None if isinstance(value, float) and math.isnan(value) else value for value in row.values()]
+            connection.execute(
+                f"INSERT OR IGNORE INTO transactions ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+                values
+            )
+        inserted = connection.total_changes - before
+        if inserted:
+            self._record_change(connection)
+        return inserted
+    
+    def append(self, rows):
+        """Insert new transactions in a single database transaction
+        
+        Args:
+            rows (list): Normalized transaction dictionaries
+        
+        Returns:
+            int: Number of rows stored (duplicates of a transaction_id the
+                user already has are ignored)
+        """
+        with closing(self._connect()) as connection, connection:
+            return self._insert(connection, rows)
+    
+    def replace(self, df):
+        """Replace all of the user's transactions
+        
+        Args:
+            df (DataFrame): Complete new contents of the user's store
+        """
+        records = df.astype(object).where(df.notna(), None).to_dict('records')
+        for record in records:
+            if record.get('date') is not None:
+                record['date'] = pd.Timestamp(record['date']).strftime('%Y-%m-%d')
+        
+        condition, params = self._user_clause()
+        with closing(self._connect()) as connection, connection:
+            connection.execute(f"DELETE FROM transactions WHERE {condition}", params)
+            self._insert(connection, records)
+            self._record_change(connection)
+    
+    def update_category(self, index, category, user_id=None):
+        """Update the category of one transaction by rowid
+        
+        Args:
+            index (int): Rowid of the transaction
+            category (str): The new category to assign
+            user_id (str): Only update the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was updated
+        """
+        condition, params = self._user_clause()
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                f"UPDATE transactions SET category = ? WHERE id = ? AND {condition}",
+                [category, int(index)] + params
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._record_change(connection)
+            return True
+    
+    def update_categories(self, categories):
+        """Update the categories of many transactions by rowid in one transaction
+        
+        Args:
+            categories (Series): New categories, indexed by rowid
+        """
+        condition, params = self._user_clause()
+        with closing(self._connect()) as connection, connection:
+            connection.executemany(
+                f"UPDATE transactions SET category = ? WHERE id = ? AND {condition}",
+                [[category, int(index)] + params for index, category in categories.items()]
+            )
+            self._record_change(connection)
+    
+    def get_by_id(self, transaction_id):
+        """Get one transaction of the user through the unique transaction_id index
+        
+        Args:
+            transaction_id (str): Id of the transaction
+        
+        Returns:
+            dict: The transaction, or None if the id is unknown
+        """
+        condition, params = self._user_clause()
+        with closing(self._connect()) as connection:
+            connection.row_factory = sqlite3.Row
+            row = connection.execute(
+                f"SELECT * FROM transactions WHERE transaction_id = ? AND {condition}",
+                [str(transaction_id)] + params
+            ).fetchone()
+        
+        if row is None:
+            return None
+        record = dict(row)
+        record.pop('id')
+        return _typed_record(record)
+    
+    def update_category_by_id(self, transaction_id, category, user_id=None):
+        """Update the category of one transaction by its id
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            category (str): The new category to assign
+            user_id (str): Only update the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was updated
+        """
+        condition, params = self._user_clause()
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                f"UPDATE transactions SET category = ? WHERE transaction_id = ? AND {condition}",
+                [category, str(transaction_id)] + params
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._record_change(connection)
+            return True
+    
+    def delete_by_id(self, transaction_id, user_id=None):
+        """Delete one transaction by its id
+        
+        Args:
+            transaction_id (str): Id of the transaction
+            user_id (str): Only delete the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was deleted
+        """
+        condition, params = self._user_clause()
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                f"DELETE FROM transactions WHERE transaction_id = ? AND {condition}",
+                [str(transaction_id)] + params
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._record_change(connection)
+            return True
+    
+    def delete(self, index, user_id=None):
+        """Delete one transaction by rowid
+        
+        Args:
+            index (int): Rowid of the transaction
+            user_id (str): Only delete the row if it belongs to this user
+        
+        Returns:
+            bool: True if the transaction was deleted
+        """
+        condition, params = self._user_clause()
+        with closing(self._connect()) as connection, connection:
+            cursor = connection.execute(
+                f"DELETE FROM transactions WHERE id = ? AND {condition}",
+                [int(index)] + params
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._record_change(connection)
+            return True
+
+# Registry of the available backends by name
+STORAGE_BACKENDS = {
+    CSVStorage.name: CSVStorage,
+    PartitionedCSVStorage.name: PartitionedCSVStorage,
+    ParquetStorage.name: ParquetStorage,
+    SQLiteStorage.name: SQLiteStorage,
+}
+
+def csv_file_path(username=None, data_dir="data"):
+    """Get the path of a user's flat CSV transaction file
+    
+    Args:
+        username (str): Username (if None, the shared file is used)
+        data_dir (str): Base directory for data storage
+    
+    Returns:
+        str: Path to the CSV file
+    """
+    if username:
+        # Use user-specific file
+        return os.path.join(data_dir, f"transactions_{username}.csv")
+    else:
+        # Use shared file (for backward compatibility)
+        return os.path.join(data_dir, "transactions.csv")
+
+def get_storage_backend(name=None, username=None, data_dir="data"):
+    """Create a storage backend by name
+    
+    Args:
+        name (str): Backend name (default: EROPIA_STORAGE_BACKEND or 'csv')
+        username (str): Username for per-user storage
+        data_dir (str): Base directory for data storage
+    
+    Returns:
+        StorageBackend: The backend instance
+    
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    name = (name or os.getenv(STORAGE_BACKEND_ENV) or CSVStorage.name).lower()
+    
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}'. Available: {', '.join(STORAGE_BACKENDS)}")
+    
+    return STORAGE_BACKENDS[name](username=username, data_dir=data_dir)
+
+def list_storage_users(name=None, data_dir="data"):
+    """List the users that have transactions stored with a backend
+    
+    Args:
+        name (str): Backend name (default: EROPIA_STORAGE_BACKEND or 'csv')
+        data_dir (str): Base directory for data storage
+    
+    Returns:
+        list: Usernames sorted by name, with None (the shared store) first
+    
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    name = (name or os.getenv(STORAGE_BACKEND_ENV) or CSVStorage.name).lower()
+    
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{name}'. Available: {', '.join(STORAGE_BACKENDS)}")
+    
+    users = STORAGE_BACKENDS[name].list_users(data_dir)
+    return sorted(users, key=lambda username: (username is not None, username or ''))
@@ -7,6 +7,9 @@ from datetime import date
 from auth_manager import AuthManager
 from data_manager import DataManager
 
+# Storage backends the backend fixture runs tests on
+BACKENDS = ['csv', 'partitioned', 'parquet', 'sqlite']
+
 @pytest.fixture
 def temp_config_file():
     """Create a temporary YAML config file for testing"""
@@ -54,6 +57,20 @@ def temp_data_dir():
     if os.path.exists(temp_dir):
         shutil.rmtree(temp_dir)
         
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    """Name each storage backend in turn, skipping parquet without pyarrow"""
+    if request.param == 'parquet':
+        pytest.importorskip('pyarrow')
+    return request.param
+
+@pytest.fixture
+def backend_manager(backend, temp_data_dir, sample_transactions):
+    """Create a DataManager on each storage backend with sample data"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend=backend)
+    dm.add_transactions(sample_transactions)
+    return dm
+        
 @pytest.fixture
 def data_manager(temp_data_dir):
     """Create a DataManager instance for testing"""
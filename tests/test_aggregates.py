@@ -0,0 +1,66 @@
+import pytest
+import pandas as pd
+from datetime import date
+from aggregates import sum_amounts, sum_by_category, sum_by_month, sum_by_type
+
+@pytest.fixture
+def backend_manager(backend_manager):
+    """Add a transaction in a second month to the sample data"""
+    backend_manager.add_transaction({
+        'date': date(2025, 5, 10),
+        'description': 'Supermarket',
+        'amount': 700.0,
+        'type': 'expense',
+        'category': 'Food'
+    })
+    return backend_manager
+
+def test_iter_transactions_chunks(backend_manager):
+    """Test that streamed chunks add up to the whole history"""
+    chunks = list(backend_manager.iter_transactions(chunk_size=2))
+    
+    assert all(len(chunk) <= 2 for chunk in chunks)
+    combined = pd.concat(chunks)
+    assert len(combined) == 6
+    assert combined['amount'].sum() == 9800.0
+    assert isinstance(chunks[0]['category'].dtype, pd.CategoricalDtype)
+
+def test_iter_transactions_filters(backend_manager):
+    """Test that filters and projection apply to streamed chunks"""
+    chunks = list(backend_manager.iter_transactions(chunk_size=2, types=['expense'], columns=['amount']))
+    
+    combined = pd.concat(chunks)
+    assert list(combined.columns) == ['amount']
+    assert combined['amount'].sum() == 2800.0
+
+def test_streaming_sums(backend_manager):
+    """Test the streaming sums by category, type and month"""
+    by_category = sum_by_category(backend_manager, chunk_size=2, types=['expense'])
+    assert dict(zip(by_category['category'], by_category['amount'])) == {
+        'Food': 2500.0, 'Transport': 300.0
+    }
+    
+    by_type = sum_by_type(backend_manager, chunk_size=2)
+    assert dict(zip(by_type['type'], by_type['amount'])) == {'expense': 2800.0, 'income': 7000.0}
+    
+    by_month = sum_by_month(backend_manager, chunk_size=2)
+    assert by_month.to_dict('records') == [
+        {'month': '2025-04', 'type': 'expense', 'amount': 2100.0},
+        {'month': '2025-04', 'type': 'income', 'amount': 7000.0},
+        {'month': '2025-05', 'type': 'expense', 'amount': 700.0},
+    ]
+
+def test_sum_amounts_rejects_unknown_key():
+    """Test that only the supported keys can be aggregated by"""
+    with pytest.raises(ValueError):
+        sum_amounts([], ['description'])
+    
+    assert sum_amounts([], ['category']).empty
+
+def test_iter_transactions_skips_torn_tail(data_manager):
+    """Test that a half-written last line is not streamed"""
+    with open(data_manager.file_path, 'a') as f:
+        f.write("2025-04-09,Half writ")
+    
+    chunks = list(data_manager.iter_transactions(chunk_size=1))
+    assert sum(len(chunk) for chunk in chunks) == 3
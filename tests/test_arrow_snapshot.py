@@ -0,0 +1,93 @@
+import os
+import pytest
+import pandas as pd
+from datetime import date
+from data_manager import DataManager
+from transaction_cache import transaction_cache
+
+pytest.importorskip('pyarrow')
+
+from arrow_snapshot import ARROW_SNAPSHOTS_ENV, ArrowSnapshots
+
+@pytest.fixture
+def snapshot_manager(monkeypatch, data_manager):
+    """Create a DataManager with Arrow snapshots turned on"""
+    monkeypatch.setenv(ARROW_SNAPSHOTS_ENV, '1')
+    ArrowSnapshots._mapped.clear()
+    transaction_cache.clear()
+    return DataManager(username='testuser', data_dir=data_manager.data_dir)
+
+def snapshot_files(dm):
+    """List the snapshot files under a manager's data directory"""
+    files = []
+    for root, _, names in os.walk(os.path.join(dm.data_dir, 'snapshots')):
+        files.extend(os.path.join(root, name) for name in names if name.endswith('.arrow'))
+    return files
+
+def test_snapshots_are_opt_in(data_manager):
+    """Test that snapshots are off unless the environment turns them on"""
+    assert data_manager.snapshots is None
+
+def test_snapshot_is_published_and_shared(snapshot_manager, monkeypatch):
+    """Test that a second process maps the snapshot instead of parsing"""
+    first = snapshot_manager.get_transactions()
+    assert len(snapshot_files(snapshot_manager)) == 1
+    
+    # A new process has neither mapped frames nor cached frames
+    ArrowSnapshots._mapped.clear()
+    transaction_cache.clear()
+    other = DataManager(username='testuser', data_dir=snapshot_manager.data_dir)
+    monkeypatch.setattr(other, '_read_storage', lambda **filters: pytest.fail("parsed the store"))
+    
+    second = other.get_transactions()
+    assert second.equals(first)
+    assert second.index.equals(first.index)
+    assert list(second.dtypes) == list(first.dtypes)
+    assert isinstance(second['category'].dtype, pd.CategoricalDtype)
+
+def test_snapshot_frames_can_be_modified(snapshot_manager):
+    """Test that changing a returned frame does not change the snapshot"""
+    df = snapshot_manager.get_transactions()
+    df.loc[df.index[0], 'amount'] = 1.0
+    df['note'] = 'edited'
+    
+    again = snapshot_manager.get_transactions()
+    assert again.iloc[0]['amount'] == 1000.0
+    assert 'note' not in again.columns
+
+def test_write_publishes_new_version(snapshot_manager):
+    """Test that a write replaces the snapshot with a new version"""
+    snapshot_manager.get_transactions()
+    old = snapshot_files(snapshot_manager)
+    
+    snapshot_manager.add_transaction({'date': date(2025, 4, 9), 'description': 'Taxi', 'amount': 200.0,
+                                      'type': 'expense', 'category': 'Transport'})
+    df = snapshot_manager.get_transactions()
+    
+    assert len(df) == 4
+    new = snapshot_files(snapshot_manager)
+    assert len(new) == 1 and new != old
+
+def test_older_version_never_replaces_newer(snapshot_manager):
+    """Test that publishing an older version after a newer one keeps the newer snapshot"""
+    snapshots = snapshot_manager.snapshots
+    identity = snapshot_manager._cache_identity()
+    df = snapshot_manager.get_transactions()
+    
+    snapshots.publish(identity, 7, ('newer',), df.head(2))
+    stale = snapshots.publish(identity, 6, ('older',), df)
+    
+    assert len(stale) == 3
+    assert [os.path.basename(path)[:12] for path in snapshot_files(snapshot_manager)] == ['000000000007']
+    assert snapshots.get(identity, 6, ('older',)) is None
+    assert len(snapshots.get(identity, 7, ('newer',))) == 2
+
+def test_frames_are_full_copies_without_copy_on_write(snapshot_manager, monkeypatch):
+    """Test that pandas without copy-on-write gets frames that do not share the mapped buffers"""
+    import arrow_snapshot
+    monkeypatch.setattr(arrow_snapshot, '_copy_on_write', lambda: False)
+    
+    df = snapshot_manager.get_transactions()
+    df['amount'] *= 2
+    
+    assert snapshot_manager.get_transactions().iloc[0]['amount'] == 1000.0
@@ -0,0 +1,48 @@
+import pytest
+from datetime import date
+from data_manager import DataManager
+from storage import list_storage_users
+from batch_analytics import run, user_aggregates
+
+@pytest.fixture
+def platform(backend, temp_data_dir, sample_transactions):
+    """Store transactions for two users on each storage backend"""
+    DataManager(username='alice', data_dir=temp_data_dir, backend=backend).add_transactions(sample_transactions)
+    DataManager(username='bob', data_dir=temp_data_dir, backend=backend).add_transactions([
+        {'date': date(2025, 4, 20), 'description': 'Lunch', 'amount': 400.0, 'type': 'expense', 'category': 'Food'},
+        {'date': date(2025, 5, 2), 'description': 'Rent', 'amount': 9000.0, 'type': 'expense', 'category': 'Housing'},
+    ])
+    return temp_data_dir, backend
+
+def test_list_storage_users(platform):
+    """Test that every user with a store is found"""
+    data_dir, backend = platform
+    assert list_storage_users(backend, data_dir) == ['alice', 'bob']
+
+def test_list_storage_users_includes_unmigrated_csv(temp_data_dir):
+    """Test that users still on a flat CSV file are found by other backends"""
+    DataManager(username='carol', data_dir=temp_data_dir, backend='csv')
+    assert list_storage_users('sqlite', temp_data_dir) == ['carol']
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_merges_users(platform, workers):
+    """Test platform-wide category and monthly totals"""
+    data_dir, backend = platform
+    result = run(data_dir, backend, workers=workers, chunk_size=2)
+    
+    assert result['users'] == 2 and result['failed'] == 0
+    
+    categories = {(r['category'], r['type']): r for r in result['categories'].to_dict('records')}
+    assert categories[('Food', 'expense')]['amount'] == 2200.0
+    assert categories[('Food', 'expense')]['transactions'] == 3
+    assert categories[('Food', 'expense')]['users'] == 2
+    assert categories[('Housing', 'expense')]['users'] == 1
+    
+    assert result['months'].to_dict('records') == [
+        {'month': '2025-04', 'income': 7000.0, 'expense': 2500.0, 'transactions': 6, 'active_users': 2},
+        {'month': '2025-05', 'income': 0.0, 'expense': 9000.0, 'transactions': 1, 'active_users': 1},
+    ]
+
+def test_unreadable_store_is_reported(temp_data_dir):
+    """Test that a user whose store cannot be read is counted as failed"""
+    assert user_aggregates('ghost', temp_data_dir, backend='nosuch') == {'error': "Unknown storage backend 'nosuch'. Available: csv, partitioned, parquet, sqlite"}
@@ -0,0 +1,117 @@
+import os
+import pytest
+from data_manager import DataManager
+from batch_ingest import find_statements, line_chunks, parse_chunk, run
+from merchant_memo import get_merchant_memo
+
+def statement_text(count, start=0):
+    """Build a full statement export with count Completed transactions
+    
+    Args:
+        count (int): Number of transactions
+        start (int): Number of the first receipt
+    
+    Returns:
+        str: The statement text
+    """
+    lines = ["M-PESA STATEMENT\n", "Receipt No. Completion Time Details Transaction Status Paid In Withdrawn Balance\n"]
+    for i in range(start, start + count):
+        lines.append(f"RKT{i:07d} 2024-{1 + i // 28:02d}-{1 + i % 28:02d} 10:{i % 60:02d}:00 Merchant Payment to 123456 - "
+                     f"NAIVAS SUPERMARKET Completed 0.00 -{100 + i:,}.00 {5000 + i:,}.00\n")
+    return ''.join(lines)
+
+@pytest.fixture
+def statements_dir(tmp_path):
+    """A statement file for alice and a directory of two statements for bob"""
+    (tmp_path / 'alice.txt').write_text(statement_text(40))
+    (tmp_path / 'bob').mkdir()
+    (tmp_path / 'bob' / '2024.txt').write_text(statement_text(5, start=100))
+    (tmp_path / 'bob' / '2025.txt').write_text(
+        "RKT1XYZ987 Confirmed.You have received Ksh5,000.00 from JANE WANJIKU 254722000111 on 14/3/25 at 10:00 AM\n"
+    )
+    return str(tmp_path)
+
+def test_find_statements(statements_dir):
+    """Test that users are named after their statement file or directory"""
+    assert [(user, os.path.basename(path)) for user, path in find_statements(statements_dir)] == [
+        ('alice', 'alice.txt'), ('bob', '2024.txt'), ('bob', '2025.txt')
+    ]
+
+def test_line_chunks_cover_whole_lines(statements_dir):
+    """Test that chunks split the file on line boundaries without gaps"""
+    path = os.path.join(statements_dir, 'alice.txt')
+    chunks = line_chunks(path, chunk_bytes=500)
+    
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert len(chunks) > 1
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(chunks, chunks[1:]))
+    assert all(data[start - 1:start] == b'\n' for start, _ in chunks[1:])
+
+def test_find_statements_keeps_users_together(tmp_path):
+    """Test that a user whose name prefixes another's gets all statements in one run"""
+    (tmp_path / 'alice').mkdir()
+    (tmp_path / 'alice' / '2024.txt').write_text(statement_text(1))
+    (tmp_path / 'alice-x.txt').write_text(statement_text(1, start=50))
+    (tmp_path / 'alice.txt').write_text(statement_text(1, start=100))
+    
+    assert [(user, os.path.basename(path)) for user, path in find_statements(str(tmp_path))] == [
+        ('alice', '2024.txt'), ('alice', 'alice.txt'), ('alice-x', 'alice-x.txt')
+    ]
+
+def test_parse_chunk_categorizes(statements_dir, temp_data_dir):
+    """Test that a chunk is parsed and categorized with the user's rules and corrections"""
+    get_merchant_memo(temp_data_dir).record('bob', 'NAIVAS SUPERMARKET', 'Groceries')
+    path = os.path.join(statements_dir, 'bob', '2024.txt')
+    result = parse_chunk('bob', path, 0, os.path.getsize(path), 'statement', temp_data_dir)
+    
+    assert [t['transaction_id'] for t in result['transactions']] == [f"RKT{i:07d}" for i in range(100, 105)]
+    assert {t['category'] for t in result['transactions']} == {'Groceries'}
+    
+    result = parse_chunk('alice', path, 0, os.path.getsize(path), 'statement', temp_data_dir)
+    assert {t['category'] for t in result['transactions']} == {'Food'}
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_imports_every_user_in_order(statements_dir, temp_data_dir, backend, workers):
+    """Test importing chunks in parallel, in statement order, and skipping them on re-import"""
+    summary = run(statements_dir, temp_data_dir, backend, workers=workers, chunk_bytes=500, batch_size=7)
+    counts = summary.set_index('user').to_dict('index')
+    
+    assert counts['alice']['statements'] == 1 and counts['alice']['chunks'] > 1
+    assert counts['alice']['parsed'] == counts['alice']['inserted'] == 40
+    assert counts['bob']['chunks'] > 2
+    assert {key: counts['bob'][key] for key in ('statements', 'failed', 'parsed', 'inserted', 'skipped', 'rejected')} == {
+        'statements': 2, 'failed': 0, 'parsed': 6, 'inserted': 6, 'skipped': 0, 'rejected': 0
+    }
+    
+    alice = DataManager(username='alice', data_dir=temp_data_dir, backend=backend).get_transactions()
+    assert alice['transaction_id'].tolist() == [f"RKT{i:07d}" for i in range(40)]
+    assert set(alice['category'].astype(str)) == {'Food'}
+    bob = DataManager(username='bob', data_dir=temp_data_dir, backend=backend).get_transactions()
+    assert bob['transaction_id'].tolist()[-1] == 'RKT1XYZ987'
+    assert bob['counterparty'].tolist()[-1] == 'JANE WANJIKU'
+    
+    again = run(statements_dir, temp_data_dir, backend, workers=workers, chunk_bytes=500)
+    assert again['inserted'].sum() == 0 and again['skipped'].sum() == 46
+
+def test_users_with_interleaved_statements(tmp_path, temp_data_dir, backend):
+    """Test that every statement is stored for its own user when user names share a prefix"""
+    statements = tmp_path / 'statements'
+    (statements / 'alice').mkdir(parents=True)
+    (statements / 'alice' / '2024.txt').write_text(statement_text(3))
+    (statements / 'alice-x.txt').write_text(statement_text(2, start=50))
+    (statements / 'alice.txt').write_text(statement_text(3, start=100))
+    
+    summary = run(str(statements), temp_data_dir, backend, workers=1, batch_size=2)
+    assert summary.set_index('user')['inserted'].to_dict() == {'alice': 6, 'alice-x': 2}
+    
+    alice = DataManager(username='alice', data_dir=temp_data_dir, backend=backend).get_transactions()
+    other = DataManager(username='alice-x', data_dir=temp_data_dir, backend=backend).get_transactions()
+    assert alice['transaction_id'].tolist() == [f"RKT{i:07d}" for i in (0, 1, 2, 100, 101, 102)]
+    assert other['transaction_id'].tolist() == ['RKT0000050', 'RKT0000051']
+
+def test_unreadable_chunk_is_reported(temp_data_dir):
+    """Test that a chunk whose file cannot be read is counted as failed"""
+    result = parse_chunk('ghost', os.path.join(temp_data_dir, 'missing.txt'), 0, 10, 'statement', temp_data_dir)
+    assert 'error' in result
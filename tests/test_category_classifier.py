@@ -0,0 +1,167 @@
+import pytest
+import numpy as np
+import pandas as pd
+from datetime import date, timedelta
+from category_classifier import (
+    CategoryModels, NaiveBayesCategorizer, hashed_ngrams, train_category_model, MIN_TRAINING_ROWS,
+    RETRAIN_LABELED_ROWS
+)
+from data_manager import DataManager
+
+# Merchants the built-in rules do not know, labeled with the user's own categories
+HISTORY = {
+    'Mama Mboga stall': 'Groceries',
+    'Kamau hardware': 'Home',
+    'Wanjiku salon': 'Personal care',
+    'Otieno tuition': 'Education',
+}
+
+def labeled_history(repeats=10):
+    """Build a labeled history with varying reference numbers
+    
+    Args:
+        repeats (int): Transactions per merchant
+    
+    Returns:
+        DataFrame: 'description' and 'category' columns
+    """
+    rows = [
+        (f"M-PESA Payment to {merchant} Ref {1000 + i * 37}", category)
+        for i in range(repeats) for merchant, category in HISTORY.items()
+    ]
+    return pd.DataFrame(rows, columns=['description', 'category'])
+
+def test_hashed_ngrams_shape_and_mask():
+    """Test that every n-gram within a padded description is kept"""
+    hashes, mask = hashed_ngrams(['abcdef', None, 'xy'], buckets=1024)
+    
+    assert hashes.shape == mask.shape
+    assert hashes.max() < 1024
+    # ' abcdef ' has 6 trigrams, 5 4-grams and 4 5-grams
+    assert mask.sum(axis=1).tolist() == [15, 0, 3]
+
+def test_hashed_ngrams_fold_case_and_digits():
+    """Test that case and reference numbers do not change the features"""
+    first, first_mask = hashed_ngrams(['Paid KPLC Ref 12345'])
+    second, second_mask = hashed_ngrams(['paid kplc ref 98761'])
+    
+    assert np.array_equal(first[first_mask], second[second_mask])
+
+def test_naive_bayes_learns_merchants():
+    """Test that the model predicts the categories of unseen references"""
+    history = labeled_history()
+    model = NaiveBayesCategorizer().fit(history['description'], history['category'])
+    
+    labels, confidence = model.predict(pd.Series([
+        "M-PESA Payment to Mama Mboga stall Ref 99999",
+        "Kamau Hardware Till 4455",
+        "M-PESA Payment to Otieno tuition Ref 31",
+    ]))
+    
+    assert labels.tolist() == ['Groceries', 'Home', 'Education']
+    assert ((confidence > 0.5) & (confidence <= 1.0)).all()
+
+def test_naive_bayes_predicts_empty_batch():
+    """Test that predicting no rows returns empty arrays"""
+    history = labeled_history()
+    model = NaiveBayesCategorizer().fit(history['description'], history['category'])
+    
+    labels, confidence = model.predict(pd.Series([], dtype=object))
+    assert len(labels) == 0 and len(confidence) == 0
+
+@pytest.mark.parametrize('history', [
+    labeled_history().head(MIN_TRAINING_ROWS - 1),
+    labeled_history().assign(category='Other'),
+    labeled_history().assign(category='Groceries'),
+])
+def test_too_little_history_trains_no_model(history):
+    """Test that no model is trained from too few labels or a single category"""
+    assert train_category_model(history) is None
+
+def test_models_are_retrained_after_enough_new_labels():
+    """Test that a model is kept until enough labels changed since training"""
+    models = CategoryModels(max_models=1)
+    reads = []
+    
+    def read():
+        reads.append(1)
+        return labeled_history()
+    
+    first = models.get(('csv', 'a'), {'Groceries': 40, 'Home': 40}, read)
+    assert models.get(('csv', 'a'), {'Groceries': 40, 'Home': 40, 'Other': 500}, read) is first
+    assert models.get(('csv', 'a'), {'Groceries': 40 + RETRAIN_LABELED_ROWS - 1, 'Home': 40}, read) is first
+    assert models.get(('csv', 'a'), {'Groceries': 40 + RETRAIN_LABELED_ROWS, 'Home': 40}, read) is not first
+    assert len(reads) == 2
+    
+    # The least recently used store is evicted
+    models.get(('csv', 'b'), {'Groceries': 40}, read)
+    models.get(('csv', 'a'), {'Groceries': 40 + RETRAIN_LABELED_ROWS, 'Home': 40}, read)
+    assert len(reads) == 4
+
+def test_adding_transactions_reuses_the_model(temp_data_dir, monkeypatch):
+    """Test that categorizing new transactions one at a time does not retrain every time"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    dm.add_transactions([
+        {'date': date(2025, 1, 1) + timedelta(days=i), 'description': row.description, 'amount': 100 + i,
+         'type': 'expense', 'category': row.category}
+        for i, row in enumerate(labeled_history().itertuples())
+    ])
+    model = dm.category_model()
+    assert model is not None
+    
+    monkeypatch.setattr(dm, 'query', lambda **kwargs: pytest.fail("retrained the model"))
+    for i in range(5):
+        assert dm.add_transaction({'date': date(2025, 6, 1 + i), 'description': f'Wanjiku salon Ref {i}',
+                                   'amount': 800, 'type': 'expense'})
+    assert dm.category_model() is model
+    assert set(dm.get_transactions()['category'].astype(str).tail(5)) == {'Personal care'}
+
+def test_data_manager_categorizes_from_history(temp_data_dir):
+    """Test that new transactions get the user's categories once there is history"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    new = [{'date': date(2025, 6, 1), 'description': 'M-PESA Payment to Wanjiku salon Ref 777',
+            'amount': 800, 'type': 'expense'}]
+    assert dm.categorize(pd.Series([new[0]['description']])).tolist() == ['Other']
+    
+    start = date(2025, 1, 1)
+    dm.add_transactions([
+        {'date': start + timedelta(days=i), 'description': row.description, 'amount': 100 + i,
+         'type': 'expense', 'category': row.category}
+        for i, row in enumerate(labeled_history().itertuples())
+    ])
+    
+    dm.add_transactions(new)
+    df = dm.get_transactions()
+    assert df.iloc[-1]['category'] == 'Personal care'
+    
+    # Descriptions the model is unsure of keep the rule-based category
+    categories = dm.categorize(pd.Series(['Uber ride', None]))
+    assert categories.tolist() == ['Transport', 'Other']
+
+def test_recategorize_uses_the_model(temp_data_dir):
+    """Test that recategorizing assigns the categories new transactions would get"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    dm.add_transactions([
+        {'date': date(2025, 1, 1) + timedelta(days=i), 'description': row.description, 'amount': 100 + i,
+         'type': 'expense', 'category': row.category}
+        for i, row in enumerate(labeled_history().itertuples())
+    ])
+    dm.add_transaction({'date': date(2025, 6, 1), 'description': 'M-PESA Payment to Otieno tuition Ref 5',
+                        'amount': 900, 'type': 'expense', 'category': 'Other'})
+    
+    assert dm.recategorize_transactions() == 1
+    assert dm.get_transactions().iloc[-1]['category'] == 'Education'
+    assert dm.categorize(pd.Series(['M-PESA Payment to Otieno tuition Ref 5'])).tolist() == ['Education']
+
+def test_corrections_win_over_the_model(temp_data_dir):
+    """Test that a merchant the user corrected keeps the corrected category"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    dm.add_transactions([
+        {'date': date(2025, 1, 1) + timedelta(days=i), 'description': row.description, 'amount': 100 + i,
+         'type': 'expense', 'category': row.category}
+        for i, row in enumerate(labeled_history().itertuples())
+    ])
+    
+    dm.memo.record('testuser', "M-PESA Payment to Kamau hardware", "Business")
+    categories = dm.categorize(pd.Series(["Kamau hardware Ref 1", "Otieno tuition Ref 2"]))
+    assert categories.tolist() == ['Business', 'Education']
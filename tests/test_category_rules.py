@@ -0,0 +1,139 @@
+import os
+import json
+import pytest
+from category_rules import CATEGORY_KEYWORDS, CategoryRules, parse_rules
+
+REPO_RULES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'category_rules.yaml')
+
+def _write(path, text):
+    """Write a rules file and give it a new modification time"""
+    with open(path, 'w') as f:
+        f.write(text)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+def _categorize_sequentially(description):
+    """Check each built-in category's keywords in turn"""
+    description = description.lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in description for keyword in keywords):
+            return category
+    return None
+
+def test_missing_file_uses_built_in_rules(temp_data_dir):
+    """Test that the built-in keyword tables apply without a rules file"""
+    rules = CategoryRules(os.path.join(temp_data_dir, 'missing.yaml'), check_interval=0)
+    assert rules.matcher().match("uber eats order") == "Food"
+    assert rules.matcher().match("random transaction") is None
+
+def test_shipped_rules_match_built_in_rules():
+    """Test that the shipped rules file categorizes like the built-in tables"""
+    matcher = CategoryRules(REPO_RULES, check_interval=0).matcher()
+    keywords = [keyword for _, words in CATEGORY_KEYWORDS for keyword in words]
+    descriptions = keywords + [a + ' ' + b for a in keywords[::7] for b in keywords[::5]] + ["nothing here"]
+    
+    for description in descriptions:
+        assert matcher.match(description) == _categorize_sequentially(description), description
+
+def test_default_rules_file_does_not_depend_on_working_directory(temp_data_dir, monkeypatch):
+    """Test that the shipped rules file is found when the app starts elsewhere"""
+    monkeypatch.delenv('EROPIA_CATEGORY_RULES', raising=False)
+    monkeypatch.chdir(temp_data_dir)
+    assert CategoryRules().path == REPO_RULES
+
+def test_priority_then_file_order(temp_data_dir):
+    """Test that higher priorities are checked first and ties keep file order"""
+    path = os.path.join(temp_data_dir, 'rules.yaml')
+    _write(path, """
+rules:
+  - {category: Travel, keywords: [transport]}
+  - {category: Transport, priority: 5, keywords: [transport, taxi]}
+  - {category: Leisure, keywords: [taxi]}
+  - {category: Rides, keywords: [taxi]}
+""")
+    matcher = CategoryRules(path, check_interval=0).matcher()
+    
+    assert matcher.match("transport levy") == "Transport"
+    assert matcher.match("taxi") == "Transport"
+    assert matcher.categories == ["Transport", "Travel", "Leisure", "Rides"]
+
+def test_patterns(temp_data_dir):
+    """Test regex rules and their precedence over lower ranked keywords"""
+    path = os.path.join(temp_data_dir, 'rules.yaml')
+    _write(path, r"""
+rules:
+  - {category: Savings, priority: 10, patterns: ['^m-shwari (deposit|lock)']}
+  - {category: Fast food, priority: 5, patterns: ['\bkfc\b']}
+  - {category: Food, keywords: [kfc, deposit]}
+""")
+    matcher = CategoryRules(path, check_interval=0).matcher()
+    
+    assert matcher.match("m-shwari deposit") == "Savings"
+    assert matcher.match("deposit to m-shwari") == "Food"
+    assert matcher.match("kfc westlands") == "Fast food"
+    assert matcher.match("kfcx") == "Food"
+
+def test_user_overrides(temp_data_dir):
+    """Test that a user's rules apply to that user before the shared ones"""
+    path = os.path.join(temp_data_dir, 'rules.yaml')
+    _write(path, """
+rules:
+  - {category: Transport, priority: 10, keywords: [uber]}
+users:
+  jane:
+    - {category: Business, keywords: [uber, printing]}
+""")
+    rules = CategoryRules(path, check_interval=0)
+    
+    assert rules.matcher('jane').match("uber ride") == "Business"
+    assert rules.matcher('jane').match("printing") == "Business"
+    assert rules.matcher('john').match("uber ride") == "Transport"
+    assert rules.matcher().match("printing") is None
+
+def test_reloads_only_when_file_changes(temp_data_dir):
+    """Test that rules are recompiled after the file changes and only then"""
+    path = os.path.join(temp_data_dir, 'rules.json')
+    _write(path, json.dumps({'rules': [{'category': 'Food', 'keywords': ['lunch']}]}))
+    rules = CategoryRules(path, check_interval=0)
+    
+    matcher = rules.matcher()
+    assert matcher.match("lunch") == "Food"
+    assert rules.matcher() is matcher
+    
+    _write(path, json.dumps({'rules': [{'category': 'Meals', 'keywords': ['lunch']}]}))
+    assert rules.matcher().match("lunch") == "Meals"
+
+def test_invalid_file_keeps_rules_in_use(temp_data_dir, capsys):
+    """Test that a broken edit is reported and the previous rules stay"""
+    path = os.path.join(temp_data_dir, 'rules.yaml')
+    _write(path, "rules:\n  - {category: Food, keywords: [lunch]}\n")
+    rules = CategoryRules(path, check_interval=0)
+    assert rules.matcher().match("lunch") == "Food"
+    
+    _write(path, "rules:\n  - {category: Food, patterns: ['(unclosed']}\n")
+    assert rules.matcher().match("lunch") == "Food"
+    assert "Error loading categorization rules" in capsys.readouterr().out
+
+def test_check_interval_defers_reload(temp_data_dir):
+    """Test that the file is not checked again within the check interval"""
+    path = os.path.join(temp_data_dir, 'rules.yaml')
+    _write(path, "rules:\n  - {category: Food, keywords: [lunch]}\n")
+    rules = CategoryRules(path, check_interval=3600)
+    assert rules.matcher().match("lunch") == "Food"
+    
+    _write(path, "rules:\n  - {category: Meals, keywords: [lunch]}\n")
+    assert rules.matcher().match("lunch") == "Food"
+
+@pytest.mark.parametrize('config', [
+    [],
+    {'rules': {'category': 'Food'}},
+    {'rules': [{'keywords': ['lunch']}]},
+    {'rules': [{'category': 'Food'}]},
+    {'rules': [{'category': 'Food', 'keywords': 'lunch'}]},
+    {'rules': [{'category': 'Food', 'keywords': ['lunch'], 'priority': 'high'}]},
+    {'rules': [], 'users': ['jane']},
+])
+def test_parse_rules_rejects_malformed_files(config):
+    """Test that malformed rules files raise ValueError"""
+    with pytest.raises(ValueError):
+        parse_rules(config)
@@ -0,0 +1,106 @@
+import os
+import pytest
+import multiprocessing
+import threading
+from datetime import date
+from data_manager import DataManager
+from file_lock import FileLock, atomic_write
+
+BACKENDS = ['csv', 'parquet']
+
+def _append_worker(data_dir, backend, worker, count):
+    """Insert transactions from a separate process"""
+    data_manager = DataManager(username='testuser', data_dir=data_dir, backend=backend)
+    for i in range(count):
+        data_manager.add_transaction({
+            'date': date(2025, 4, 1 + i % 28),
+            'description': f'Worker {worker} row {i}',
+            'amount': 100.0 + i,
+            'type': 'expense',
+            'category': 'Other',
+            'source': 'manual',
+            'transaction_id': f'w{worker}-{i}'
+        })
+
+def _update_worker(data_dir, backend, transaction_ids):
+    """Re-categorize transactions by id from a separate process"""
+    data_manager = DataManager(username='testuser', data_dir=data_dir, backend=backend)
+    for transaction_id in transaction_ids:
+        data_manager.update_transaction_category(transaction_id, 'Updated')
+
+def _run(processes):
+    """Start processes, wait for them and check they succeeded"""
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=120)
+        assert process.exitcode == 0
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_concurrent_writers_lose_no_rows(temp_data_dir, backend):
+    """Test that concurrent appends and updates from several processes all land"""
+    data_manager = DataManager(username='testuser', data_dir=temp_data_dir, backend=backend)
+    data_manager.add_transactions([
+        {'date': date(2025, 3, 1), 'description': f'Seed {i}', 'amount': 10.0,
+         'type': 'expense', 'category': 'Food', 'transaction_id': f'seed-{i}'}
+        for i in range(20)
+    ])
+    
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=_append_worker, args=(temp_data_dir, backend, worker, 15))
+        for worker in range(4)
+    ]
+    processes.append(context.Process(
+        target=_update_worker, args=(temp_data_dir, backend, [f'seed-{i}' for i in range(20)])
+    ))
+    _run(processes)
+    
+    transactions = DataManager(username='testuser', data_dir=temp_data_dir, backend=backend).get_transactions()
+    
+    assert len(transactions) == 20 + 4 * 15
+    assert transactions['transaction_id'].is_unique
+    seeds = transactions[transactions['transaction_id'].str.startswith('seed-')]
+    assert (seeds['category'] == 'Updated').all()
+
+def test_file_lock_is_reentrant(temp_data_dir):
+    """Test that a thread can take the same lock again while holding it"""
+    lock = FileLock(f'{temp_data_dir}/store.lock')
+    
+    with lock:
+        with FileLock(f'{temp_data_dir}/store.lock'):
+            pass
+        assert lock.path.endswith('store.lock')
+
+def test_file_lock_excludes_other_threads(temp_data_dir):
+    """Test that a second thread waits until the lock is released"""
+    lock = FileLock(f'{temp_data_dir}/store.lock')
+    events = []
+    
+    def contender():
+        with lock:
+            events.append('contender')
+    
+    with lock:
+        thread = threading.Thread(target=contender)
+        thread.start()
+        thread.join(timeout=0.2)
+        events.append('owner')
+    thread.join()
+    
+    assert events == ['owner', 'contender']
+
+def test_atomic_write_replaces_whole_file(temp_data_dir):
+    """Test that a failed write leaves the old file and no temp file behind"""
+    path = f'{temp_data_dir}/nested/state.json'
+    with atomic_write(path) as f:
+        f.write('old')
+    
+    with pytest.raises(RuntimeError):
+        with atomic_write(path) as f:
+            f.write('new')
+            raise RuntimeError("interrupted")
+    
+    with open(path) as f:
+        assert f.read() == 'old'
+    assert os.listdir(f'{temp_data_dir}/nested') == ['state.json']
@@ -0,0 +1,99 @@
+import pytest
+import os
+from csv_index import CSVOffsetIndex, iter_csv_records, parse_csv_record
+
+@pytest.fixture
+def csv_file(temp_data_dir):
+    """Create a small CSV file with a transaction_id column"""
+    path = os.path.join(temp_data_dir, 'transactions_testuser.csv')
+    with open(path, 'w') as f:
+        f.write("date,description,amount,transaction_id\n")
+        f.write("2025-04-01,Lunch,500.0,A1\n")
+        f.write('2025-04-02,"Rent, April\nflat 4",20000.0,B2\n')
+        f.write("2025-04-03,Uber,300.0,C3\n")
+    return path
+
+def _read_range(path, location):
+    """Read the bytes an index entry points at"""
+    offset, length = location
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+def test_iter_csv_records_handles_quoted_newlines(csv_file):
+    """Test that quoted newlines do not split a record"""
+    with open(csv_file, 'rb') as f:
+        records = [record for offset, record in iter_csv_records(f, 0)]
+    
+    assert len(records) == 4
+    assert parse_csv_record(records[2]) == ['2025-04-02', 'Rent, April\nflat 4', '20000.0', 'B2']
+
+def test_iter_csv_records_skips_torn_tail(csv_file):
+    """Test that a record without its trailing newline is not returned"""
+    with open(csv_file, 'a') as f:
+        f.write("2025-04-04,Half written")
+    
+    with open(csv_file, 'rb') as f:
+        records = list(iter_csv_records(f, 0))
+    
+    assert len(records) == 4
+
+def test_lookup_points_at_row(csv_file):
+    """Test that lookups return the byte range of the row"""
+    index = CSVOffsetIndex(csv_file)
+    
+    assert _read_range(csv_file, index.lookup('A1')) == b"2025-04-01,Lunch,500.0,A1\n"
+    assert parse_csv_record(_read_range(csv_file, index.lookup('B2')))[3] == 'B2'
+    assert index.lookup('missing') is None
+    assert os.path.exists(csv_file + '.idx')
+
+def test_index_extends_on_append(csv_file):
+    """Test that appended rows are indexed without a rebuild"""
+    index = CSVOffsetIndex(csv_file)
+    index.refresh()
+    with open(csv_file + '.idx') as f:
+        first_entries = f.read().splitlines()[1:]
+    
+    with open(csv_file, 'a') as f:
+        f.write("2025-04-04,Airtime,100.0,D4\n")
+    
+    assert _read_range(csv_file, index.lookup('D4')) == b"2025-04-04,Airtime,100.0,D4\n"
+    with open(csv_file + '.idx') as f:
+        entries = f.read().splitlines()[1:]
+    
+    # Existing entries are kept and the new one is appended
+    assert entries[:len(first_entries)] == first_entries
+    assert entries[-1].startswith('D4\t')
+
+def test_index_is_loaded_from_disk(csv_file):
+    """Test that a fresh process can reuse the persisted index"""
+    CSVOffsetIndex(csv_file).refresh()
+    CSVOffsetIndex._loaded.clear()
+    
+    index = CSVOffsetIndex(csv_file)
+    assert _read_range(csv_file, index.lookup('C3')) == b"2025-04-03,Uber,300.0,C3\n"
+
+def test_index_rebuilds_after_rewrite(csv_file):
+    """Test that a rewritten file is indexed again"""
+    index = CSVOffsetIndex(csv_file)
+    index.refresh()
+    
+    # Replace the file the way the storage backend does
+    replacement = csv_file + '.tmp'
+    with open(replacement, 'w') as f:
+        f.write("date,description,amount,transaction_id\n")
+        f.write("2025-04-03,Uber,300.0,C3\n")
+    os.replace(replacement, csv_file)
+    
+    assert _read_range(csv_file, index.lookup('C3')) == b"2025-04-03,Uber,300.0,C3\n"
+    assert index.lookup('A1') is None
+
+def test_index_counts_missing_ids(temp_data_dir):
+    """Test that rows without an id are counted"""
+    path = os.path.join(temp_data_dir, 'transactions_testuser.csv')
+    with open(path, 'w') as f:
+        f.write("date,description,amount,transaction_id\n")
+        f.write("2025-04-01,Lunch,500.0,\n")
+        f.write("2025-04-02,Uber,300.0,C3\n")
+    
+    assert CSVOffsetIndex(path).missing_ids() == 1
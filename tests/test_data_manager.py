@@ -149,4 +149,275 @@ def test_get_transactions_by_category(data_manager, sample_transactions):
     assert 'Restaurant dinner' in descriptions
     assert 'Uber ride' not in descriptions
     assert 'Salary deposit' not in descriptions
-    assert 'Side hustle payment' not in descriptions
\ No newline at end of file
+    assert 'Side hustle payment' not in descriptions
+
+def test_add_transaction_appends_to_file(data_manager):
+    """Test that adding a transaction leaves existing rows untouched"""
+    with open(data_manager.file_path, 'rb') as f:
+        before = f.read()
+    
+    data_manager.add_transaction({
+        'date': date(2025, 4, 4),
+        'description': 'Restaurant dinner',
+        'amount': 800.0,
+        'type': 'expense',
+        'category': 'Food'
+    })
+    
+    with open(data_manager.file_path, 'rb') as f:
+        after = f.read()
+    
+    # The old content is a prefix of the new content
+    assert after.startswith(before)
+    assert after[len(before):].decode('utf-8').count('\n') == 1
+    
+    df = data_manager.get_transactions()
+    assert len(df) == 4
+    assert df.iloc[3]['description'] == 'Restaurant dinner'
+
+def test_add_transaction_keeps_column_order(data_manager):
+    """Test that appended values follow the header order, not the dict order"""
+    data_manager.add_transaction({
+        'category': 'Food',
+        'type': 'expense',
+        'amount': 250.0,
+        'description': 'Coffee',
+        'date': date(2025, 4, 5),
+        'user_id': 'testuser'
+    })
+    
+    df = data_manager.get_transactions()
+    last = df.iloc[-1]
+    assert last['description'] == 'Coffee'
+    assert last['amount'] == 250.0
+    assert last['category'] == 'Food'
+    assert last['date'] == pd.Timestamp(2025, 4, 5)
+
+def test_add_transaction_with_new_columns(data_manager):
+    """Test that transactions with extra fields widen the header"""
+    data_manager.add_transaction({
+        'date': date(2025, 4, 6),
+        'description': 'M-PESA Payment to KPLC',
+        'amount': 1500.0,
+        'type': 'expense',
+        'category': 'Housing',
+        'phone_number': '254712345678',
+        'status': 'completed',
+        'transaction_id': 'QK12ABC3DE'
+    })
+    
+    raw_df = pd.read_csv(data_manager.file_path)
+    for col in ['phone_number', 'status', 'transaction_id']:
+        assert col in raw_df.columns
+    
+    # Existing rows are kept with empty values for the new columns
+    assert len(raw_df) == 4
+    assert raw_df.iloc[0]['description'] == 'Grocery shopping'
+    assert pd.isna(raw_df.iloc[0]['phone_number'])
+    assert raw_df.iloc[3]['transaction_id'] == 'QK12ABC3DE'
+    
+    # Later rows without the extra fields still append cleanly
+    data_manager.add_transaction({
+        'date': date(2025, 4, 7),
+        'description': 'Lunch',
+        'amount': 400.0,
+        'type': 'expense',
+        'category': 'Food'
+    })
+    
+    df = data_manager.get_transactions()
+    assert len(df) == 5
+    assert df.iloc[4]['description'] == 'Lunch'
+    assert df.iloc[3]['status'] == 'completed'
+
+def test_add_transactions_batch(data_manager, sample_transactions):
+    """Test adding a batch of transactions in one call"""
+    with open(data_manager.file_path, 'rb') as f:
+        before = f.read()
+    
+    # The first three rows repeat the fixture's transactions
+    result = data_manager.add_transactions(sample_transactions, dedupe=False)
+    
+    assert result == {'inserted': 5, 'skipped': 0, 'rejected': 0}
+    
+    df = data_manager.get_transactions()
+    assert len(df) == 8
+    assert (df['user_id'] == 'testuser').all()
+    assert df.iloc[-1]['description'] == 'Side hustle payment'
+    
+    with open(data_manager.file_path, 'rb') as f:
+        assert f.read().startswith(before)
+
+def test_add_transactions_rejects_and_skips(temp_data_dir):
+    """Test that invalid rows are rejected and repeated ids are skipped"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    
+    result = dm.add_transactions([
+        {'date': '2025-04-01', 'description': 'Airtime', 'amount': '100', 'type': 'expense',
+         'category': 'Utilities', 'transaction_id': 'QK1'},
+        {'date': date(2025, 4, 1), 'description': 'Airtime', 'amount': 100.0, 'type': 'expense',
+         'category': 'Utilities', 'transaction_id': 'QK1'},
+        {'date': date(2025, 4, 2), 'description': 'No amount', 'type': 'expense'},
+        {'date': date(2025, 4, 2), 'description': 'Bad type', 'amount': 10.0, 'type': 'refund'},
+        {'date': 'not a date', 'description': 'Bad date', 'amount': 10.0, 'type': 'income'},
+        {'date': date(2025, 4, 3), 'description': 'Negative', 'amount': -5.0, 'type': 'expense'},
+    ])
+    
+    assert result == {'inserted': 1, 'skipped': 1, 'rejected': 4}
+    
+    df = dm.get_transactions()
+    assert len(df) == 1
+    assert df.iloc[0]['amount'] == 100.0
+    assert df.iloc[0]['date'] == pd.Timestamp(2025, 4, 1)
+
+def test_add_transactions_empty_batch(temp_data_dir):
+    """Test that an empty batch does not touch the file"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    mtime = os.path.getmtime(dm.file_path)
+    
+    result = dm.add_transactions([])
+    
+    assert result == {'inserted': 0, 'skipped': 0, 'rejected': 0}
+    assert os.path.getmtime(dm.file_path) == mtime
+
+def test_transactions_get_stable_ids(data_manager):
+    """Test that every stored transaction carries a unique id"""
+    data_manager.add_transaction({
+        'date': date(2025, 4, 6), 'description': 'M-PESA Payment to KPLC', 'amount': 1500.0,
+        'type': 'expense', 'category': 'Housing', 'transaction_id': 'QK12ABC3DE'
+    })
+    
+    df = data_manager.get_transactions()
+    assert df['transaction_id'].notna().all()
+    assert df['transaction_id'].is_unique
+    
+    # The M-Pesa id is reused as is
+    assert df.iloc[-1]['transaction_id'] == 'QK12ABC3DE'
+
+def test_get_transaction_by_id(data_manager):
+    """Test point lookups by transaction id"""
+    df = data_manager.get_transactions()
+    transaction_id = df.iloc[1]['transaction_id']
+    
+    transaction = data_manager.get_transaction(transaction_id)
+    assert transaction['description'] == 'Salary deposit'
+    assert transaction['amount'] == 5000.0
+    assert transaction['date'] == pd.Timestamp(2025, 4, 2)
+    
+    assert data_manager.get_transaction('does-not-exist') is None
+    
+    # Another user cannot read it
+    other = DataManager(username='otheruser', data_dir=data_manager.data_dir)
+    assert other.get_transaction(transaction_id) is None
+
+def test_update_and_delete_by_id(data_manager):
+    """Test that ids stay valid after other rows change"""
+    ids = data_manager.get_transactions()['transaction_id'].tolist()
+    
+    # Deleting the first row shifts positions but not ids
+    assert data_manager.delete_transaction(ids[0])
+    assert data_manager.update_transaction_category(ids[2], 'Travel')
+    
+    df = data_manager.get_transactions()
+    assert df['transaction_id'].tolist() == ids[1:]
+    assert df.iloc[1]['category'] == 'Travel'
+    assert df.iloc[1]['description'] == 'Uber ride'
+    
+    # Unknown ids are refused
+    assert not data_manager.delete_transaction(ids[0])
+    assert not data_manager.update_transaction_category('does-not-exist', 'Food')
+
+def test_legacy_rows_get_ids(temp_data_dir):
+    """Test that rows stored before ids existed are given one on first lookup"""
+    file_path = os.path.join(temp_data_dir, 'transactions_testuser.csv')
+    with open(file_path, 'w') as f:
+        f.write("date,description,amount,type,category,source,user_id\n")
+        f.write("2025-04-01,Grocery shopping,1000.0,expense,Food,,testuser\n")
+        f.write("2025-04-02,Salary deposit,5000.0,income,Salary,,testuser\n")
+    
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    assert dm.get_transaction('does-not-exist') is None
+    
+    df = dm.get_transactions()
+    assert df['transaction_id'].notna().all()
+    assert dm.get_transaction(df.iloc[1]['transaction_id'])['description'] == 'Salary deposit'
+
+def test_transactions_use_compact_schema(data_manager):
+    """Test that loaded transactions use categoricals, cents and datetimes"""
+    data_manager.add_transaction({
+        'date': date(2025, 4, 4),
+        'description': 'Airtime',
+        'amount': 49.999,
+        'type': 'expense',
+        'category': 'Utilities',
+        'source': 'manual'
+    })
+    
+    df = data_manager.get_transactions()
+    
+    for column in ['type', 'category', 'source', 'user_id']:
+        assert isinstance(df[column].dtype, pd.CategoricalDtype)
+    assert pd.api.types.is_datetime64_any_dtype(df['date'])
+    assert df['amount'].dtype == 'float64'
+    assert df.iloc[-1]['amount'] == 50.0
+    
+    # Filtered reads come back with the same schema
+    food = data_manager.query(categories=['Food'], columns=['category', 'amount'])
+    assert isinstance(food['category'].dtype, pd.CategoricalDtype)
+
+def test_add_transactions_categorizes_missing_categories(data_manager):
+    """Test that rows imported without a category are categorized in a batch"""
+    data_manager.add_transactions([
+        {'date': date(2025, 4, 6), 'description': 'Netflix subscription', 'amount': 1100, 'type': 'expense'},
+        {'date': date(2025, 4, 7), 'description': 'Bolt taxi', 'amount': 450, 'type': 'expense', 'category': ''},
+        {'date': date(2025, 4, 8), 'description': 'Bolt taxi home', 'amount': 500, 'type': 'expense', 'category': 'Work'}
+    ])
+    
+    df = data_manager.get_transactions()
+    assert df['category'].astype(str).tolist()[-3:] == ['Utilities', 'Transport', 'Work']
+
+def test_import_mpesa_statement_in_batches(temp_data_dir):
+    """Test that a statement is stored in fixed-size batches and imported once"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    statement = [f"{day:02d}/04/2025 MPESA Payment to Uber {100 + day}.00 debit\n" for day in range(1, 8)]
+    version = dm.current_version()
+    
+    assert dm.import_mpesa_statement(iter(statement), batch_size=3) == {'inserted': 7, 'skipped': 0, 'rejected': 0}
+    # One write per batch
+    assert dm.current_version() == version + 3
+    
+    df = dm.get_transactions()
+    assert len(df) == 7
+    assert set(df['category'].astype(str)) == {'Transport'}
+    
+    assert dm.import_mpesa_statement(''.join(statement), batch_size=3) == {'inserted': 0, 'skipped': 7, 'rejected': 0}
+
+def test_recategorize_transactions(temp_data_dir, sample_transactions, backend):
+    """Test that recategorizing rewrites only the categories that changed"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend=backend)
+    dm.add_transactions(sample_transactions)
+    
+    # 'Salary deposit' and 'Side hustle payment' match no keyword
+    assert dm.recategorize_transactions() == 2
+    df = dm.get_transactions()
+    assert df['category'].astype(str).tolist() == ['Food', 'Other', 'Transport', 'Food', 'Other']
+    assert len(df) == 5
+    assert dm.get_totals()['expense'] == 2100.0
+    assert dm.get_rollup('day', categories=['Other'])['amount'].sum() == 7000.0
+    
+    version = dm.current_version()
+    assert dm.recategorize_transactions() == 0
+    assert dm.current_version() == version
+
+def test_recategorize_keeps_other_columns(temp_data_dir, backend):
+    """Test that recategorizing leaves text that looks numeric as it was stored"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend=backend)
+    dm.add_transaction({'date': date(2025, 4, 9), 'description': 'Uber ride', 'amount': 300.0,
+                        'type': 'expense', 'category': 'Other', 'phone_number': '0712345678'})
+    dm.add_transaction({'date': date(2025, 4, 10), 'description': 'Salary deposit', 'amount': 5000.0,
+                        'type': 'income', 'category': 'Income'})
+    
+    assert dm.recategorize_transactions() == 2
+    df = dm.get_transactions()
+    assert df['category'].astype(str).tolist() == ['Transport', 'Other']
+    assert dm.storage.get_by_id(df['transaction_id'].iloc[0])['phone_number'] == '0712345678'
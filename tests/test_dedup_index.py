@@ -0,0 +1,79 @@
+import os
+import pytest
+from datetime import date
+from data_manager import DataManager
+from dedup_index import DedupIndex, transaction_fingerprint, transaction_keys
+
+def test_reimport_is_skipped(backend_manager, sample_transactions):
+    """Test that importing the same statement twice stores it once"""
+    result = backend_manager.add_transactions(sample_transactions)
+    
+    assert result == {'inserted': 0, 'skipped': 5, 'rejected': 0}
+    assert len(backend_manager.get_transactions()) == 5
+
+def test_retried_callback_is_skipped(backend_manager):
+    """Test that a transaction id already stored is skipped, whatever its details"""
+    transaction = {'date': date(2025, 4, 6), 'description': 'M-PESA Payment to 174379', 'amount': 250.0,
+                   'type': 'expense', 'category': 'Other', 'transaction_id': 'QKX1Y2Z3'}
+    assert backend_manager.add_transaction(transaction)
+    
+    retried = dict(transaction, date=date(2025, 4, 7))
+    assert not backend_manager.add_transaction(retried, dedupe=False)
+    assert len(backend_manager.get_transactions()) == 6
+
+def test_fingerprint_normalizes_description():
+    """Test that descriptions differing only in case and spacing match"""
+    first = {'date': date(2025, 4, 1), 'amount': 1000, 'description': 'Grocery  Shopping'}
+    second = {'date': '2025-04-01', 'amount': 1000.0, 'description': ' grocery shopping\n'}
+    
+    assert transaction_fingerprint(first) == transaction_fingerprint(second) == '2025-04-01|1000.00|grocery shopping'
+    assert transaction_keys(dict(first, transaction_id='QK1')) == ['id:QK1']
+
+def test_manual_entries_can_repeat(data_manager):
+    """Test that dedupe=False stores identical transactions without ids"""
+    transaction = {'date': date(2025, 4, 3), 'description': 'Uber ride', 'amount': 300.0,
+                   'type': 'expense', 'category': 'Transport'}
+    
+    assert not data_manager.add_transaction(transaction)
+    assert data_manager.add_transaction(transaction, dedupe=False)
+    assert len(data_manager.get_transactions()) == 4
+
+def test_deleted_transaction_can_be_added_again(data_manager):
+    """Test that deleting a transaction removes it from the index"""
+    df = data_manager.get_transactions()
+    transaction_id = df.iloc[2]['transaction_id']
+    assert data_manager.delete_transaction(transaction_id)
+    
+    assert data_manager.add_transaction({'date': date(2025, 4, 3), 'description': 'Uber ride',
+                                         'amount': 300.0, 'type': 'expense', 'category': 'Transport'})
+
+def test_index_persists_across_processes(data_manager):
+    """Test that a new process reuses the stored index without a rebuild"""
+    log_path = data_manager.dedup.path
+    mtime = os.stat(log_path).st_mtime_ns
+    DedupIndex._loaded.clear()
+    
+    dm = DataManager(username='testuser', data_dir=data_manager.data_dir)
+    assert not dm.add_transaction({'date': date(2025, 4, 2), 'description': 'Salary deposit',
+                                   'amount': 5000.0, 'type': 'income', 'category': 'Salary'})
+    assert os.stat(log_path).st_mtime_ns == mtime
+
+def test_out_of_band_write_triggers_rebuild(data_manager):
+    """Test that rows written outside DataManager are seen by the index"""
+    with open(data_manager.file_path, 'a') as f:
+        f.write("2025-04-09,Taxi,200.0,expense,Transport,manual,testuser,QKTAXI01\n")
+    
+    assert not data_manager.add_transaction({'date': date(2025, 4, 9), 'description': 'Taxi', 'amount': 200.0,
+                                             'type': 'expense', 'transaction_id': 'QKTAXI01'})
+
+def test_torn_record_triggers_rebuild(data_manager):
+    """Test that a damaged index log is rebuilt from the store"""
+    with open(data_manager.dedup.path, 'a') as f:
+        f.write('{"add": ["id:half\n')
+    DedupIndex._loaded.clear()
+    
+    result = data_manager.add_transactions([
+        {'date': date(2025, 4, 1), 'description': 'Grocery shopping', 'amount': 1000.0, 'type': 'expense'},
+        {'date': date(2025, 4, 9), 'description': 'Taxi', 'amount': 200.0, 'type': 'expense'},
+    ])
+    assert result == {'inserted': 1, 'skipped': 1, 'rejected': 0}
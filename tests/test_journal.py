@@ -0,0 +1,98 @@
+import pytest
+import os
+import pandas as pd
+from data_manager import DataManager
+from journal import TransactionJournal, JOURNAL_COMPACT_BYTES_ENV
+
+@pytest.fixture
+def journal(temp_data_dir):
+    """Create an empty journal in the temporary data directory"""
+    return TransactionJournal(os.path.join(temp_data_dir, 'transactions_testuser.csv.journal'))
+
+def test_journal_apply(journal):
+    """Test that updates and deletes are applied by transaction id"""
+    journal.append([
+        {'op': 'update', 'transaction_id': 'A1', 'category': 'Travel'},
+        {'op': 'delete', 'transaction_id': 'B2'},
+        {'op': 'update', 'transaction_id': 'A1', 'category': 'Food'}
+    ])
+    df = pd.DataFrame({'transaction_id': ['A1', 'B2', 'C3'], 'category': ['Other', 'Other', 'Other']})
+    
+    result = journal.apply(df)
+    
+    assert list(result['transaction_id']) == ['A1', 'C3']
+    assert list(result['category']) == ['Food', 'Other']
+
+def test_journal_ignores_torn_tail(journal):
+    """Test that an entry without its trailing newline is not applied yet"""
+    journal.append([{'op': 'delete', 'transaction_id': 'A1'}])
+    with open(journal.path, 'a') as f:
+        f.write('{"op": "delete", "transaction_id": "B')
+    
+    assert journal.state()[1] == {'A1'}
+    
+    # The next append starts on a new line
+    journal.append([{'op': 'delete', 'transaction_id': 'C3'}])
+    assert journal.state()[1] == {'A1', 'C3'}
+
+def test_journal_detects_new_file(journal):
+    """Test that a cleared and recreated journal is parsed from the start"""
+    journal.append([{'op': 'delete', 'transaction_id': 'A1'}])
+    assert journal.state()[1] == {'A1'}
+    
+    os.remove(journal.path)
+    journal.append([{'op': 'delete', 'transaction_id': 'B2'}])
+    
+    assert journal.state()[1] == {'B2'}
+
+def test_update_and_delete_do_not_rewrite_file(data_manager):
+    """Test that updates and deletes by id only append to the journal"""
+    transaction_id = data_manager.get_transactions().iloc[0]['transaction_id']
+    before = os.stat(data_manager.file_path)
+    
+    assert data_manager.update_transaction_category(transaction_id, 'Travel')
+    assert data_manager.delete_transaction(data_manager.get_transactions().iloc[1]['transaction_id'])
+    
+    after = os.stat(data_manager.file_path)
+    assert (after.st_ino, after.st_size) == (before.st_ino, before.st_size)
+    
+    transactions = data_manager.get_transactions()
+    assert len(transactions) == 2
+    assert transactions.iloc[0]['category'] == 'Travel'
+    assert data_manager.get_transaction(transaction_id)['category'] == 'Travel'
+
+def test_positional_update_uses_journal(data_manager):
+    """Test that positional indexes refer to rows with the journal applied"""
+    first_id = data_manager.get_transactions().iloc[0]['transaction_id']
+    assert data_manager.delete_transaction(first_id)
+    
+    # Position 0 is now the salary deposit
+    assert data_manager.update_transaction_category(0, 'Bonus')
+    
+    transactions = data_manager.get_transactions()
+    assert list(transactions['category']) == ['Bonus', 'Transport']
+
+def test_journal_compacts_in_background(data_manager, monkeypatch):
+    """Test that a journal over the threshold is folded into the file"""
+    monkeypatch.setenv(JOURNAL_COMPACT_BYTES_ENV, '1')
+    transaction_id = data_manager.get_transactions().iloc[0]['transaction_id']
+    
+    assert data_manager.update_transaction_category(transaction_id, 'Travel')
+    data_manager.storage._compactor.join(timeout=10)
+    
+    assert not os.path.exists(data_manager.storage.journal.path)
+    raw = pd.read_csv(data_manager.file_path)
+    assert raw.iloc[0]['category'] == 'Travel'
+
+def test_journal_replayed_on_startup(data_manager):
+    """Test that a journal left by a previous run is folded in on startup"""
+    transaction_id = data_manager.get_transactions().iloc[2]['transaction_id']
+    assert data_manager.delete_transaction(transaction_id)
+    
+    # Simulate a new process
+    type(data_manager.storage)._recovered.discard(data_manager.file_path)
+    reopened = DataManager(username='testuser', data_dir=os.path.dirname(data_manager.file_path))
+    
+    assert not os.path.exists(reopened.storage.journal.path)
+    assert len(pd.read_csv(reopened.file_path)) == 2
+    assert len(reopened.get_transactions()) == 2
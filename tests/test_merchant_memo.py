@@ -0,0 +1,94 @@
+import pytest
+from datetime import date
+from category_rules import RuleMatcher, default_rules
+from data_manager import DataManager
+from merchant_memo import MerchantMemo, normalize_merchant
+
+@pytest.fixture
+def matcher():
+    """Compile the built-in categorization rules"""
+    return RuleMatcher(default_rules())
+
+@pytest.mark.parametrize('description, merchant', [
+    ("M-PESA Payment to KPLC", "kplc"),
+    ("M-PESA Payment to Uber Ref 4F7K2", "uber"),
+    ("Pay Bill Online Naivas Acc 0123", "naivas"),
+    ("Customer Transfer to John Kamau 0712345678", "john kamau"),
+    ("Merchant Payment Java House Till 556677", "java house"),
+    ("Salary from Employer via M-PESA", "salary from employer"),
+    ("  Uber   ride ", "uber ride"),
+    ("1234 5678", ""),
+])
+def test_normalize_merchant(description, merchant):
+    """Test that boilerplate, references and numbers are stripped"""
+    assert normalize_merchant(description) == merchant
+
+def test_repeats_are_memoized(matcher):
+    """Test that a repeated description is resolved from the memo"""
+    memo = MerchantMemo(data_dir=None)
+    
+    assert memo.categorize("M-PESA Payment to Uber", matcher) == "Transport"
+    assert memo.categorize("m-pesa payment to UBER", matcher) == "Transport"
+    assert (memo.hits, memo.misses) == (1, 1)
+    assert memo.categorize("Random transaction", matcher) == "Other"
+
+def test_memo_is_bounded(matcher):
+    """Test that the least recently used descriptions are evicted"""
+    memo = MerchantMemo(data_dir=None, max_entries=2)
+    for description in ["Uber ride", "Lunch", "Uber ride", "Netflix"]:
+        memo.categorize(description, matcher)
+    
+    assert len(memo._entries) == 2
+    memo.categorize("Lunch", matcher)
+    assert memo.misses == 4
+
+def test_reloaded_rules_are_not_served_from_memo(matcher):
+    """Test that descriptions memoized under older rules are categorized again"""
+    memo = MerchantMemo(data_dir=None)
+    assert memo.categorize("Uber ride", matcher) == "Transport"
+    
+    reloaded = RuleMatcher([{'category': 'Rides', 'keywords': ['uber']}])
+    assert memo.categorize("Uber ride", reloaded) == "Rides"
+
+def test_corrections_apply_per_user_and_merchant(matcher):
+    """Test that a user's correction wins over the rules for that user only"""
+    memo = MerchantMemo(data_dir=None)
+    assert memo.categorize("M-PESA Payment to Uber Ref 111", matcher, 'jane') == "Transport"
+    
+    assert memo.record('jane', "M-PESA Payment to Uber Ref 111", "Business")
+    assert memo.categorize("M-PESA Payment to Uber Ref 111", matcher, 'jane') == "Business"
+    assert memo.categorize("Merchant Payment UBER Till 42", matcher, 'jane') == "Business"
+    assert memo.categorize("M-PESA Payment to Uber Ref 111", matcher, 'john') == "Transport"
+    assert not memo.record('jane', "0712345678", "Business")
+
+def test_corrections_are_shared_across_processes(temp_data_dir, matcher):
+    """Test that corrections persist and reach other memos of the same directory"""
+    first = MerchantMemo(temp_data_dir, check_interval=0)
+    second = MerchantMemo(temp_data_dir, check_interval=0)
+    assert second.categorize("M-PESA Payment to KPLC", matcher, 'jane') == "Housing"
+    
+    first.record('jane', "M-PESA Payment to KPLC", "Utilities")
+    
+    assert second.categorize("M-PESA Payment to KPLC", matcher, 'jane') == "Utilities"
+    assert MerchantMemo(temp_data_dir).correction('jane', "kplc") == "Utilities"
+
+def test_update_category_feeds_memo(temp_data_dir):
+    """Test that a correction through DataManager categorizes later imports"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    dm.add_transactions([
+        {'date': date(2025, 4, 1), 'description': 'M-PESA Payment to KPLC Ref A1', 'amount': 3200, 'type': 'expense'}
+    ])
+    df = dm.get_transactions()
+    assert df.iloc[0]['category'] == 'Housing'
+    
+    assert dm.update_transaction_category(df.iloc[0]['transaction_id'], 'Utilities')
+    dm.add_transactions([
+        {'date': date(2025, 5, 1), 'description': 'M-PESA Payment to KPLC Ref B2', 'amount': 3100, 'type': 'expense'},
+        {'date': date(2025, 5, 2), 'description': 'Rent payment', 'amount': 18000, 'type': 'expense'}
+    ])
+    
+    df = dm.get_transactions()
+    assert df['category'].astype(str).tolist() == ['Utilities', 'Utilities', 'Housing']
+    
+    # Recategorizing keeps what the user chose
+    assert dm.recategorize_transactions() == 0
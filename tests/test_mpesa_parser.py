@@ -1,5 +1,5 @@
 import pytest
-from utils import parse_mpesa_statement
+from utils import iter_mpesa_statement, parse_mpesa_statement
 from datetime import date
 
 def test_parse_mpesa_statement():
@@ -36,4 +36,35 @@ def test_parse_mpesa_statement_malformed():
     """
     
     transactions = parse_mpesa_statement(statement_text)
-    assert len(transactions) == 0  # Should not match the pattern
\ No newline at end of file
+    assert len(transactions) == 0  # Should not match the pattern
+
+
+def test_iter_mpesa_statement_reads_lines_lazily():
+    """Test that transactions are yielded as their lines are read"""
+    def lines():
+        yield "01/04/2025 MPESA Payment to Naivas 1,200.50 debit\n"
+        yield "02/04/2025 MPESA Salary from Employer 50,000.00 credit\n"
+        raise AssertionError("Read past the transactions asked for")
+    
+    transactions = iter_mpesa_statement(lines())
+    first = next(transactions)
+    assert first == {
+        'date': date(2025, 4, 1), 'description': 'MPESA Payment to Naivas', 'amount': 1200.5,
+        'type': 'expense', 'source': 'mpesa'
+    }
+    assert next(transactions)['type'] == 'income'
+
+def test_iter_mpesa_statement_reads_files(tmp_path):
+    """Test parsing a statement from a binary file, skipping invalid dates"""
+    statement = tmp_path / "statement.txt"
+    statement.write_bytes(
+        b"Date Description Amount Type\n"
+        b"03/04/2025 MPESA Payment to Uber 450.75 debit 04/04/2025 MPESA Payment to Bolt 300 debit\n"
+        b"31/02/2025 MPESA Payment to Nowhere 10 debit\n"
+    )
+    
+    with open(statement, 'rb') as f:
+        transactions = list(iter_mpesa_statement(f))
+    
+    assert [t['description'] for t in transactions] == ['MPESA Payment to Uber', 'MPESA Payment to Bolt']
+    assert 'category' not in transactions[0]
@@ -0,0 +1,77 @@
+import os
+import pytest
+import pandas as pd
+from datetime import date
+from data_manager import DataManager
+
+def rollup_records(dm, level='day'):
+    """Get a rollup table as a sorted list of records"""
+    df = dm.get_rollup(level)
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    return sorted(df.to_dict('records'), key=lambda r: (r['date'], str(r['category']), r['type']))
+
+def test_totals(backend_manager):
+    """Test total income, expenses and balance"""
+    assert backend_manager.get_totals() == {'income': 7000.0, 'expense': 2100.0, 'balance': 4900.0}
+
+def test_incremental_updates_match_rebuild(backend_manager):
+    """Test that rollups kept up to date on write equal a full rebuild"""
+    # Build the rollups so the writes below are applied incrementally
+    backend_manager.get_totals()
+    
+    backend_manager.add_transaction({
+        'date': date(2025, 5, 10),
+        'description': 'Supermarket',
+        'amount': 700.0,
+        'type': 'expense',
+        'category': 'Food'
+    })
+    transactions = backend_manager.get_transactions()
+    ids = dict(zip(transactions['description'], transactions['transaction_id']))
+    assert backend_manager.update_transaction_category(ids['Uber ride'], 'Travel')
+    assert backend_manager.delete_transaction(ids['Side hustle payment'])
+    
+    rollups_file = backend_manager.rollups.path
+    stored = backend_manager.rollups._load()
+    assert stored['source'] == backend_manager.rollups._source()
+    mtime = os.stat(rollups_file).st_mtime_ns
+    
+    incremental = {level: rollup_records(backend_manager, level) for level in ('day', 'month')}
+    # Reading did not need a rebuild
+    assert os.stat(rollups_file).st_mtime_ns == mtime
+    
+    assert backend_manager.rebuild_rollups()
+    for level in ('day', 'month'):
+        assert rollup_records(backend_manager, level) == incremental[level]
+    
+    assert backend_manager.get_totals() == {'income': 5000.0, 'expense': 2800.0, 'balance': 2200.0}
+    categories = {r['category'] for r in incremental['day']}
+    assert 'Travel' in categories and 'Transport' not in categories
+
+def test_month_rollup(backend_manager):
+    """Test amounts and counts per month, category and type"""
+    monthly = backend_manager.get_rollup('month', types=['expense'])
+    
+    assert monthly['date'].eq(pd.Timestamp(2025, 4, 1)).all()
+    assert dict(zip(monthly['category'], monthly['amount'])) == {'Food': 1800.0, 'Transport': 300.0}
+    assert dict(zip(monthly['category'], monthly['count'])) == {'Food': 2, 'Transport': 1}
+
+def test_rollup_filters(backend_manager):
+    """Test date and category filters on the daily rollup"""
+    daily = backend_manager.get_rollup('day', start=date(2025, 4, 2), end=date(2025, 4, 4), categories=['Food'])
+    
+    assert daily['date'].dt.strftime('%Y-%m-%d').tolist() == ['2025-04-04']
+    assert daily['amount'].tolist() == [800.0]
+
+def test_stale_rollups_are_rebuilt(data_manager):
+    """Test that a write made outside DataManager triggers a rebuild"""
+    assert data_manager.get_totals()['expense'] == 1300.0
+    
+    with open(data_manager.file_path, 'a') as f:
+        f.write("2025-04-09,Taxi,200.0,expense,Transport,manual,testuser,TXOUTOFBAND\n")
+    
+    assert data_manager.get_totals()['expense'] == 1500.0
+
+def test_unknown_rollup_level(data_manager):
+    """Test that an unknown level returns an empty frame"""
+    assert data_manager.get_rollup('week').empty
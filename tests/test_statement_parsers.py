@@ -0,0 +1,128 @@
+import pytest
+from datetime import date
+from data_manager import DataManager
+from statement_parsers import (
+    StatementParser, STATEMENT_PARSERS, detect_statement_format, get_statement_parser, iter_statement,
+    register_statement_parser
+)
+from utils import parse_mpesa_statement
+
+FULL_STATEMENT = """M-PESA STATEMENT
+Customer Name: JANE DOE
+Receipt No. Completion Time Details Transaction Status Paid In Withdrawn Balance
+RKT2ABCD12 2024-11-29 14:03:22 Pay Bill to 888880 - KPLC PREPAID Acc. 37123456789 Completed 0.00 -1,500.00 2,340.50
+RKT1XYZ987 2024-11-28 09:15:01 Funds received from - 254712345678 JOHN DOE Completed 5,000.00 0.00 3,840.50
+RKT0XYZ986 2024-11-27 19:15:01 Merchant Payment to 123456 - NAIVAS SUPERMARKET Completed -450.00 1,160.50
+RKT0XYZ985 2024-11-27 19:10:01 Customer Transfer to - 0712***678 MARY WANJIKU Failed 0.00 -100.00 1,610.50
+Page 1 of 3
+"""
+
+SMS = (
+    "QGH7XK2LP1 Confirmed. Ksh1,500.00 sent to JOHN DOE 0712345678 on 12/3/24 at 2:15 PM. "
+    "New M-PESA balance is Ksh3,200.50. Transaction cost, Ksh23.00.\n"
+    "QGH7XK2LP2 Confirmed. Ksh2,000.00 sent to KPLC PREPAID for account 37123456789 on 12/3/24 at 9:05 AM "
+    "New M-PESA balance is Ksh1,200.50. Transaction cost, Ksh0.00.\n"
+    "QGH7XK2LP3 Confirmed. Ksh450.00 paid to NAIVAS SUPERMARKET. on 13/3/24 at 6:40 PM.New M-PESA balance is "
+    "Ksh750.50. QGH7XK2LP4 Confirmed.You have received Ksh5,000.00 from JANE WANJIKU 254722000111 on 14/3/24 "
+    "at 10:00 AM  New M-PESA balance is Ksh5,750.50.\n"
+    "QGH7XK2LP5 Confirmed.on 15/3/24 at 1:10 PMWithdraw Ksh1,000.00 from 123456 - AGENT NAME "
+    "New M-PESA balance is Ksh4,700.50. Transaction cost, Ksh29.00.\n"
+    "QGH7XK2LP6 confirmed.You bought Ksh100.00 of airtime on 16/3/24 at 12:05 AM.New M-PESA balance is Ksh4,600.50.\n"
+    "Your one-time PIN is 1234.\n"
+)
+
+@pytest.mark.parametrize('text, expected', [
+    (FULL_STATEMENT, 'statement'),
+    (SMS, 'sms'),
+    ("03/04/2025 MPESA Payment to Uber 450.75 debit\n", 'simple'),
+    ("Nothing to see here\n", None),
+])
+def test_detect_statement_format(text, expected):
+    """Test that the format is detected from the lines it recognizes"""
+    assert detect_statement_format(text.splitlines()) == expected
+
+def test_full_statement():
+    """Test parsing receipts, timestamps, balances and counterparties of a statement"""
+    transactions = list(iter_statement(FULL_STATEMENT))
+    
+    # The failed transfer is left out
+    assert [t['transaction_id'] for t in transactions] == ['RKT2ABCD12', 'RKT1XYZ987', 'RKT0XYZ986']
+    assert transactions[0] == {
+        'date': date(2024, 11, 29),
+        'description': 'Pay Bill to 888880 - KPLC PREPAID Acc. 37123456789',
+        'amount': 1500.0,
+        'type': 'expense',
+        'source': 'mpesa',
+        'transaction_id': 'RKT2ABCD12',
+        'timestamp': '2024-11-29 14:03:22',
+        'balance': 2340.5,
+        'counterparty': 'KPLC PREPAID',
+    }
+    assert [(t['type'], t['amount'], t['counterparty']) for t in transactions[1:]] == [
+        ('income', 5000.0, 'JOHN DOE'), ('expense', 450.0, 'NAIVAS SUPERMARKET')
+    ]
+
+def test_sms():
+    """Test parsing every kind of confirmation message, several per line"""
+    transactions = list(iter_statement(SMS))
+    
+    assert [(t['transaction_id'], t['description'], t['type'], t['amount']) for t in transactions] == [
+        ('QGH7XK2LP1', 'Sent to JOHN DOE', 'expense', 1500.0),
+        ('QGH7XK2LP2', 'Pay Bill to KPLC PREPAID Acc. 37123456789', 'expense', 2000.0),
+        ('QGH7XK2LP3', 'Paid to NAIVAS SUPERMARKET', 'expense', 450.0),
+        ('QGH7XK2LP4', 'Received from JANE WANJIKU', 'income', 5000.0),
+        ('QGH7XK2LP5', 'Withdrawal from AGENT NAME', 'expense', 1000.0),
+        ('QGH7XK2LP6', 'Airtime purchase', 'expense', 100.0),
+    ]
+    assert [t['timestamp'] for t in transactions[:2]] == ['2024-03-12 14:15:00', '2024-03-12 09:05:00']
+    assert transactions[-1]['timestamp'] == '2024-03-16 00:05:00'
+    assert [t['balance'] for t in transactions] == [3200.5, 1200.5, 750.5, 5750.5, 4700.5, 4600.5]
+    assert transactions[3]['counterparty'] == 'JANE WANJIKU'
+    assert transactions[-1]['counterparty'] is None
+
+def test_explicit_format_and_binary_lines():
+    """Test parsing bytes lines with the format given"""
+    lines = [line.encode('utf-8') for line in SMS.splitlines(keepends=True)]
+    assert len(list(iter_statement(lines, 'sms'))) == 6
+    
+    with pytest.raises(ValueError):
+        get_statement_parser('pdf')
+
+def test_register_statement_parser():
+    """Test that a registered parser is detected and used"""
+    @register_statement_parser
+    class PipeParser(StatementParser):
+        name = "pipe"
+        
+        def detect(self, line):
+            return line.count('|') == 3
+        
+        def parse(self, lines):
+            for line in lines:
+                day, description, amount, kind = line.strip().split('|')
+                yield {'date': date.fromisoformat(day), 'description': description,
+                       'amount': float(amount), 'type': kind, 'source': 'bank'}
+    
+    try:
+        transactions = list(iter_statement("2025-01-02|Rent|18000|expense\n"))
+        assert transactions[0]['description'] == 'Rent'
+    finally:
+        del STATEMENT_PARSERS['pipe']
+
+def test_parse_mpesa_statement_detects_format():
+    """Test that pasted statements of any format are parsed and categorized"""
+    transactions = parse_mpesa_statement(SMS)
+    
+    assert len(transactions) == 6
+    assert transactions[2]['category'] == 'Food'
+
+def test_import_statement_keeps_receipts(temp_data_dir):
+    """Test that re-importing a statement skips it by receipt number"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    
+    assert dm.import_mpesa_statement(FULL_STATEMENT) == {'inserted': 3, 'skipped': 0, 'rejected': 0}
+    assert dm.import_mpesa_statement(FULL_STATEMENT) == {'inserted': 0, 'skipped': 3, 'rejected': 0}
+    
+    df = dm.get_transactions()
+    assert df['transaction_id'].tolist() == ['RKT2ABCD12', 'RKT1XYZ987', 'RKT0XYZ986']
+    assert df['counterparty'].tolist() == ['KPLC PREPAID', 'JOHN DOE', 'NAIVAS SUPERMARKET']
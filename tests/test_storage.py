@@ -0,0 +1,360 @@
+import pytest
+import os
+import json
+import sqlite3
+import pandas as pd
+from datetime import date
+from data_manager import DataManager
+from storage import CSVStorage, ParquetStorage, get_storage_backend
+
+def test_get_storage_backend_by_name(temp_data_dir):
+    """Test selecting a backend by name"""
+    assert isinstance(get_storage_backend('csv', 'testuser', temp_data_dir), CSVStorage)
+    
+    with pytest.raises(ValueError):
+        get_storage_backend('nosuchbackend', 'testuser', temp_data_dir)
+
+def test_get_storage_backend_from_env(temp_data_dir, monkeypatch):
+    """Test selecting a backend through the environment variable"""
+    pytest.importorskip('pyarrow')
+    monkeypatch.setenv('EROPIA_STORAGE_BACKEND', 'parquet')
+    
+    dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    assert isinstance(dm.storage, ParquetStorage)
+
+def test_backend_round_trip(backend_manager):
+    """Test that every backend returns what was stored"""
+    df = backend_manager.get_transactions()
+    
+    assert len(df) == 5
+    assert sorted(df['description'].tolist()) == sorted([
+        'Grocery shopping', 'Salary deposit', 'Uber ride', 'Restaurant dinner', 'Side hustle payment'
+    ])
+    assert pd.api.types.is_datetime64_any_dtype(df['date'])
+    assert df['amount'].sum() == 9100.0
+    assert (df['user_id'] == 'testuser').all()
+
+def test_backend_filters(backend_manager):
+    """Test date range and category filters on every backend"""
+    in_range = backend_manager.get_transactions_by_date_range(date(2025, 4, 2), date(2025, 4, 4))
+    assert sorted(in_range['description'].tolist()) == ['Restaurant dinner', 'Salary deposit', 'Uber ride']
+    
+    food = backend_manager.get_transactions_by_category('Food')
+    assert sorted(food['description'].tolist()) == ['Grocery shopping', 'Restaurant dinner']
+
+def test_backend_update_and_delete(backend_manager):
+    """Test category updates and deletes on every backend"""
+    df = backend_manager.get_transactions()
+    uber_idx = df.index[df['description'] == 'Uber ride'][0]
+    
+    assert backend_manager.update_transaction_category(uber_idx, 'Travel')
+    df = backend_manager.get_transactions()
+    assert df.loc[df['description'] == 'Uber ride', 'category'].iloc[0] == 'Travel'
+    
+    salary_idx = df.index[df['description'] == 'Salary deposit'][0]
+    assert backend_manager.delete_transaction(salary_idx)
+    df = backend_manager.get_transactions()
+    assert len(df) == 4
+    assert 'Salary deposit' not in df['description'].tolist()
+    
+    # Out of range indexes are refused
+    assert not backend_manager.delete_transaction(99)
+
+def test_parquet_typed_columns(temp_data_dir, sample_transactions):
+    """Test that the parquet backend returns typed columns"""
+    pytest.importorskip('pyarrow')
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='parquet')
+    dm.add_transactions(sample_transactions)
+    
+    df = dm.get_transactions()
+    assert pd.api.types.is_datetime64_any_dtype(df['date'])
+    assert df['amount'].dtype == 'float64'
+    for column in ['type', 'category', 'source']:
+        assert isinstance(df[column].dtype, pd.CategoricalDtype)
+
+def test_partitioned_layout_and_manifest(temp_data_dir):
+    """Test that partitioned data is split into month files with a manifest"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='partitioned')
+    dm.add_transactions([
+        {'date': date(2025, 3, 30), 'description': 'Rent', 'amount': 20000.0, 'type': 'expense', 'category': 'Housing'},
+        {'date': date(2025, 4, 2), 'description': 'Lunch', 'amount': 500.0, 'type': 'expense', 'category': 'Food'},
+        {'date': date(2025, 4, 9), 'description': 'Fare', 'amount': 100.0, 'type': 'expense', 'category': 'Transport'},
+    ])
+    
+    user_root = os.path.join(temp_data_dir, 'partitioned', 'user=testuser')
+    assert {'2025-03.csv', '2025-04.csv', 'manifest.json'} <= set(os.listdir(user_root))
+    
+    with open(os.path.join(user_root, 'manifest.json')) as f:
+        partitions = json.load(f)['partitions']
+    assert partitions['2025-04'] == {'min_date': '2025-04-02', 'max_date': '2025-04-09', 'rows': 2}
+    
+    assert dm.delete_transaction(dm.get_transactions().iloc[0]['transaction_id'])
+    with open(os.path.join(user_root, 'manifest.json')) as f:
+        assert json.load(f)['partitions']['2025-03']['rows'] == 0
+
+def test_partitioned_reads_and_writes_touch_only_their_months(temp_data_dir, monkeypatch):
+    """Test that date range reads open and inserts write only the overlapping months"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='partitioned')
+    dm.add_transactions([
+        {'date': date(2025, 3, 30), 'description': 'Rent', 'amount': 20000.0, 'type': 'expense', 'category': 'Housing'},
+        {'date': date(2025, 4, 2), 'description': 'Lunch', 'amount': 500.0, 'type': 'expense', 'category': 'Food'},
+    ])
+    march_path = os.path.join(temp_data_dir, 'partitioned', 'user=testuser', '2025-03.csv')
+    march_stat = os.stat(march_path)
+    
+    dm.add_transaction({'date': date(2025, 4, 20), 'description': 'Fare', 'amount': 100.0, 'type': 'expense', 'category': 'Transport'})
+    assert os.stat(march_path).st_mtime_ns == march_stat.st_mtime_ns
+    
+    opened = []
+    original = CSVStorage.read
+    monkeypatch.setattr(CSVStorage, 'read', lambda self, *args, **kwargs: opened.append(self.file_path) or original(self, *args, **kwargs))
+    
+    april = dm.get_transactions_by_date_range(date(2025, 4, 1), date(2025, 4, 30))
+    assert april['description'].tolist() == ['Lunch', 'Fare']
+    assert [os.path.basename(path) for path in opened] == ['2025-04.csv']
+
+def test_partitioned_migrates_csv(temp_data_dir, sample_transactions):
+    """Test that a flat CSV file is split into months on first access"""
+    csv_dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    csv_dm.add_transactions(sample_transactions)
+    ids = csv_dm.get_transactions()['transaction_id'].tolist()
+    
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='partitioned')
+    
+    assert not os.path.exists(csv_dm.file_path)
+    assert os.path.exists(csv_dm.file_path + '.migrated')
+    
+    df = dm.get_transactions()
+    assert df['transaction_id'].tolist() == ids
+    assert df['amount'].sum() == 9100.0
+    assert dm.get_transaction(ids[2])['description'] == 'Uber ride'
+
+def test_parquet_partitions_by_month(temp_data_dir):
+    """Test that parquet data is laid out by user and month"""
+    pytest.importorskip('pyarrow')
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='parquet')
+    dm.add_transactions([
+        {'date': date(2025, 3, 30), 'description': 'Rent', 'amount': 20000.0, 'type': 'expense', 'category': 'Housing'},
+        {'date': date(2025, 4, 2), 'description': 'Lunch', 'amount': 500.0, 'type': 'expense', 'category': 'Food'},
+    ])
+    
+    user_root = os.path.join(temp_data_dir, 'parquet', 'user=testuser')
+    assert sorted(os.listdir(user_root)) == ['manifest.json', 'month=2025-03', 'month=2025-04']
+    
+    april = dm.get_transactions_by_date_range(date(2025, 4, 1), date(2025, 4, 30))
+    assert april['description'].tolist() == ['Lunch']
+
+def test_parquet_keeps_write_order(temp_data_dir):
+    """Test that rows come back in the order they were appended, across compactions"""
+    pytest.importorskip('pyarrow')
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='parquet')
+    for i in range(20):
+        dm.add_transaction({'date': date(2025, 4, 1), 'description': f'Row {i}', 'amount': 10.0 + i,
+                            'type': 'expense', 'category': 'Food', 'transaction_id': f't{i}'})
+    
+    assert dm.get_transactions()['transaction_id'].tolist() == [f't{i}' for i in range(20)]
+    
+    # Positions stay put when a part is rewritten
+    assert dm.update_transaction_category(3, 'Transport')
+    df = dm.get_transactions()
+    assert df['transaction_id'].tolist() == [f't{i}' for i in range(20)]
+    assert df.loc[3, 'category'] == 'Transport'
+    
+    # Merged and rewritten parts are gone once the manifest no longer lists them
+    month_dir = os.path.join(temp_data_dir, 'parquet', 'user=testuser', 'month=2025-04')
+    assert len(os.listdir(month_dir)) == len(dm.storage._read_manifest()['months']['2025-04'])
+
+def test_parquet_readers_keep_their_parts(temp_data_dir, sample_transactions):
+    """Test that a dataset opened before a rewrite still reads its rows"""
+    pytest.importorskip('pyarrow')
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='parquet')
+    dm.add_transactions(sample_transactions)
+    
+    dataset = dm.storage._dataset()
+    dm.storage.replace(dm.storage.read().iloc[:2])
+    
+    assert dataset.to_table().num_rows == 5
+    assert len(dm.storage.read()) == 2
+
+def test_parquet_projection(temp_data_dir, sample_transactions):
+    """Test reading a subset of columns from parquet"""
+    pytest.importorskip('pyarrow')
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='parquet')
+    dm.add_transactions(sample_transactions)
+    
+    df = dm.storage.read(columns=['amount'], categories=['Food'])
+    assert list(df.columns) == ['amount']
+    assert df['amount'].sum() == 1800.0
+
+def test_parquet_migrates_csv(temp_data_dir, sample_transactions):
+    """Test that an existing CSV file is migrated on first access"""
+    pytest.importorskip('pyarrow')
+    csv_dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    csv_dm.add_transactions(sample_transactions)
+    
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='parquet')
+    
+    assert not os.path.exists(csv_dm.file_path)
+    assert os.path.exists(csv_dm.file_path + '.migrated')
+    
+    df = dm.get_transactions()
+    assert len(df) == 5
+    assert df['amount'].sum() == 9100.0
+
+def test_parquet_migration_keeps_text(temp_data_dir, sample_transactions):
+    """Test that migrated text columns are stored exactly as in the CSV file"""
+    pytest.importorskip('pyarrow')
+    csv_dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    csv_dm.add_transactions([dict(sample_transactions[0], phone_number='0712345678')] + sample_transactions[1:])
+    
+    df = DataManager(username='testuser', data_dir=temp_data_dir, backend='parquet').get_transactions()
+    
+    assert df['phone_number'].tolist()[0] == '0712345678'
+    assert df['phone_number'].isna().sum() == 4
+
+def test_parquet_new_columns(temp_data_dir, sample_transactions):
+    """Test that parquet files with different columns read together"""
+    pytest.importorskip('pyarrow')
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='parquet')
+    dm.add_transactions(sample_transactions)
+    dm.add_transaction({
+        'date': date(2025, 4, 6), 'description': 'M-PESA Payment to KPLC', 'amount': 1500.0,
+        'type': 'expense', 'category': 'Housing', 'phone_number': '254712345678'
+    })
+    
+    df = dm.get_transactions()
+    assert len(df) == 6
+    assert df['phone_number'].notna().sum() == 1
+
+def test_sqlite_schema_and_wal(temp_data_dir):
+    """Test that the SQLite backend creates its indexes and uses WAL mode"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='sqlite')
+    
+    connection = sqlite3.connect(dm.storage.db_path)
+    try:
+        indexes = {row[1] for row in connection.execute("PRAGMA index_list(transactions)")}
+        assert {'idx_transactions_user_date', 'idx_transactions_user_category',
+                'idx_transactions_user_transaction_id', 'idx_transactions_shared_transaction_id'} <= indexes
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    finally:
+        connection.close()
+
+def test_sqlite_users_share_database(temp_data_dir, sample_transactions):
+    """Test that users are isolated inside the shared SQLite table"""
+    alice = DataManager(username='alice', data_dir=temp_data_dir, backend='sqlite')
+    bob = DataManager(username='bob', data_dir=temp_data_dir, backend='sqlite')
+    alice.add_transactions(sample_transactions)
+    bob.add_transactions(sample_transactions[:2])
+    
+    assert len(alice.get_transactions()) == 5
+    assert len(bob.get_transactions()) == 2
+    
+    # Bob cannot change Alice's rows through their rowid
+    alice_idx = alice.get_transactions().index[0]
+    assert not bob.update_transaction_category(alice_idx, 'Hacked')
+    assert not bob.delete_transaction(alice_idx)
+    assert alice.get_transactions().loc[alice_idx, 'category'] == 'Food'
+
+def test_sqlite_signature_is_per_user(temp_data_dir, sample_transactions):
+    """Test that one user's writes do not change another user's signature"""
+    alice = DataManager(username='alice', data_dir=temp_data_dir, backend='sqlite')
+    bob = DataManager(username='bob', data_dir=temp_data_dir, backend='sqlite')
+    alice.add_transactions(sample_transactions)
+    signature = alice.storage.signature()
+    
+    bob.add_transactions(sample_transactions[:2])
+    bob.delete_transaction(bob.get_transactions().index[0])
+    assert alice.storage.signature() == signature
+    
+    alice.update_transaction_category(alice.get_transactions().index[0], 'Other')
+    assert alice.storage.signature() != signature
+
+def test_sqlite_ignores_duplicate_transaction_ids(temp_data_dir):
+    """Test that a repeated transaction_id is reported as skipped"""
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='sqlite')
+    transaction = {
+        'date': date(2025, 4, 6), 'description': 'M-PESA Payment to KPLC', 'amount': 1500.0,
+        'type': 'expense', 'category': 'Housing', 'transaction_id': 'QK12ABC3DE'
+    }
+    
+    assert dm.add_transactions([transaction]) == {'inserted': 1, 'skipped': 0, 'rejected': 0}
+    assert dm.add_transactions([transaction]) == {'inserted': 0, 'skipped': 1, 'rejected': 0}
+    assert len(dm.get_transactions()) == 1
+
+def test_sqlite_transaction_ids_are_unique_per_user(temp_data_dir):
+    """Test that two users can both store a transaction with the same receipt number"""
+    transaction = {
+        'date': date(2025, 4, 6), 'description': 'M-PESA transfer', 'amount': 500.0,
+        'type': 'expense', 'category': 'Other', 'transaction_id': 'RKT1'
+    }
+    alice = DataManager(username='alice', data_dir=temp_data_dir, backend='sqlite')
+    bob = DataManager(username='bob', data_dir=temp_data_dir, backend='sqlite')
+    shared = DataManager(data_dir=temp_data_dir, backend='sqlite')
+    
+    for dm in (alice, bob, shared):
+        assert dm.add_transactions([transaction]) == {'inserted': 1, 'skipped': 0, 'rejected': 0}
+        assert dm.add_transactions([transaction]) == {'inserted': 0, 'skipped': 1, 'rejected': 0}
+    assert bob.get_transactions()['transaction_id'].tolist() == ['RKT1']
+    
+    assert bob.update_transaction_category('RKT1', 'Transfers')
+    assert alice.storage.get_by_id('RKT1')['category'] == 'Other'
+    assert bob.delete_transaction('RKT1')
+    assert len(alice.get_transactions()) == 1 and bob.get_transactions().empty
+
+def test_sqlite_imports_csv_once(temp_data_dir, sample_transactions):
+    """Test that a legacy CSV file is imported on first access only"""
+    csv_dm = DataManager(username='testuser', data_dir=temp_data_dir)
+    csv_dm.add_transactions(sample_transactions)
+    
+    DataManager(username='testuser', data_dir=temp_data_dir, backend='sqlite')
+    dm = DataManager(username='testuser', data_dir=temp_data_dir, backend='sqlite')
+    
+    # The CSV file is kept for comparison with the CSV backend
+    assert os.path.exists(csv_dm.file_path)
+    
+    df = dm.get_transactions()
+    assert len(df) == 5
+    assert df['amount'].sum() == 9100.0
+
+def test_backend_operations_by_id(backend_manager):
+    """Test lookups, updates and deletes by transaction id on every backend"""
+    df = backend_manager.get_transactions()
+    uber_id = df.loc[df['description'] == 'Uber ride', 'transaction_id'].iloc[0]
+    salary_id = df.loc[df['description'] == 'Salary deposit', 'transaction_id'].iloc[0]
+    
+    assert backend_manager.get_transaction(uber_id)['amount'] == 300.0
+    
+    assert backend_manager.update_transaction_category(uber_id, 'Travel')
+    assert backend_manager.get_transaction(uber_id)['category'] == 'Travel'
+    
+    assert backend_manager.delete_transaction(salary_id)
+    assert backend_manager.get_transaction(salary_id) is None
+    
+    df = backend_manager.get_transactions()
+    assert len(df) == 4
+    assert df.loc[df['transaction_id'] == uber_id, 'category'].iloc[0] == 'Travel'
+    
+    assert not backend_manager.delete_transaction(salary_id)
+
+def test_backend_query_pushdown(backend_manager):
+    """Test query filters, projection, ordering and limit on every backend"""
+    backend_manager.add_transaction({
+        'date': date(2025, 4, 6),
+        'description': 'M-PESA payment',
+        'amount': 150.0,
+        'type': 'expense',
+        'category': 'Food',
+        'source': 'mpesa'
+    })
+    
+    expenses = backend_manager.query(types=['expense'], columns=['description', 'amount'], order='-amount')
+    assert list(expenses.columns) == ['description', 'amount']
+    assert expenses['description'].tolist() == ['Grocery shopping', 'Restaurant dinner', 'Uber ride', 'M-PESA payment']
+    
+    latest = backend_manager.query(categories=['Food'], order='-date', limit=2)
+    assert latest['description'].tolist() == ['M-PESA payment', 'Restaurant dinner']
+    
+    mpesa = backend_manager.query(sources=['mpesa'], start=date(2025, 4, 1), end=date(2025, 4, 30))
+    assert mpesa['description'].tolist() == ['M-PESA payment']
+    
+    assert backend_manager.query(types=[]).empty
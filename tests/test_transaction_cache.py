@@ -0,0 +1,107 @@
+import pytest
+import pandas as pd
+from datetime import date
+from data_manager import DataManager
+from transaction_cache import TransactionCache, transaction_cache
+
+def _frame(rows):
+    """Build a small transactions frame with the given number of rows"""
+    return pd.DataFrame({
+        'date': pd.date_range('2025-04-01', periods=rows),
+        'description': [f'Row {i}' for i in range(rows)],
+        'amount': [100.0] * rows
+    })
+
+def test_cache_hit_and_miss():
+    """Test that entries are only returned for a matching signature"""
+    cache = TransactionCache()
+    df = _frame(3)
+    
+    assert cache.get(('csv', 'a'), (1, 10)) is None
+    cache.put(('csv', 'a'), (1, 10), df)
+    
+    cached = cache.get(('csv', 'a'), (1, 10))
+    assert cached.equals(df)
+    assert cache.get(('csv', 'a'), (2, 20)) is None
+    
+    stats = cache.stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 2
+    assert stats['entries'] == 1
+
+def test_cache_returns_copies():
+    """Test that modifying a returned frame does not change the cache"""
+    cache = TransactionCache()
+    cache.put(('csv', 'a'), (1, 10), _frame(3))
+    
+    first = cache.get(('csv', 'a'), (1, 10))
+    first.loc[0, 'description'] = 'Changed'
+    
+    second = cache.get(('csv', 'a'), (1, 10))
+    assert second.loc[0, 'description'] == 'Row 0'
+
+def test_cache_lru_eviction():
+    """Test that the least recently used entry is evicted over budget"""
+    df = _frame(100)
+    size = int(df.memory_usage(deep=True).sum())
+    cache = TransactionCache(max_bytes=size * 2)
+    
+    cache.put(('csv', 'a'), (1,), df)
+    cache.put(('csv', 'b'), (1,), df)
+    
+    # Touch 'a' so that 'b' becomes the least recently used entry
+    assert cache.get(('csv', 'a'), (1,)) is not None
+    cache.put(('csv', 'c'), (1,), df)
+    
+    assert cache.get(('csv', 'b'), (1,)) is None
+    assert cache.get(('csv', 'a'), (1,)) is not None
+    assert cache.get(('csv', 'c'), (1,)) is not None
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] <= size * 2
+
+def test_cache_skips_frames_over_budget():
+    """Test that a frame larger than the whole budget is not cached"""
+    cache = TransactionCache(max_bytes=10)
+    cache.put(('csv', 'a'), (1,), _frame(100))
+    
+    assert cache.stats()['entries'] == 0
+
+def test_data_manager_uses_cache(data_manager):
+    """Test that repeated reads of an unchanged file hit the cache"""
+    transaction_cache.clear()
+    
+    first = data_manager.get_transactions()
+    second = DataManager(username='testuser', data_dir=data_manager.data_dir).get_transactions()
+    
+    assert second.equals(first)
+    assert transaction_cache.stats()['misses'] == 1
+    assert transaction_cache.stats()['hits'] == 1
+
+def test_data_manager_writes_invalidate_cache(data_manager):
+    """Test that the manager's own writes are visible on the next read"""
+    transaction_cache.clear()
+    assert len(data_manager.get_transactions()) == 3
+    
+    data_manager.add_transaction({
+        'date': date(2025, 4, 4), 'description': 'Restaurant dinner',
+        'amount': 800.0, 'type': 'expense', 'category': 'Food'
+    })
+    assert len(data_manager.get_transactions()) == 4
+    
+    data_manager.update_transaction_category(0, 'Shopping')
+    assert data_manager.get_transactions().iloc[0]['category'] == 'Shopping'
+    
+    data_manager.delete_transaction(0)
+    assert len(data_manager.get_transactions()) == 3
+
+def test_data_manager_sees_external_changes(data_manager):
+    """Test that a file changed by another writer is read again"""
+    transaction_cache.clear()
+    assert len(data_manager.get_transactions()) == 3
+    
+    with open(data_manager.file_path, 'a') as f:
+        f.write('2025-04-09,Written elsewhere,50.0,expense,Other,,testuser\n')
+    
+    df = data_manager.get_transactions()
+    assert len(df) == 4
+    assert df.iloc[-1]['description'] == 'Written elsewhere'
@@ -1,5 +1,10 @@
 import pytest
-from utils import categorize_transaction, format_currency
+import os
+import pandas as pd
+from utils import (
+    categorize_transaction, categorize_series, categorize_descriptions, format_currency, CATEGORY_KEYWORDS,
+    KeywordMatcher
+)
 
 def test_categorize_transaction_food():
     """Test that food-related transactions are correctly categorized"""
@@ -47,10 +52,83 @@ def test_categorize_transaction_default():
     assert categorize_transaction("123456789") == "Other"
     assert categorize_transaction("") == "Other"
 
+def _categorize_sequentially(description):
+    """Check each category's keywords in turn"""
+    description = description.lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in description for keyword in keywords):
+            return category
+    return 'Other'
+
+OVERLAPPING_DESCRIPTIONS = [
+    "Uber Eats order",         # 'uber eats' is Food although 'uber' is Transport
+    "Carrefour",               # 'car' (Transport) is a prefix of 'carrefour' (Food)
+    "Airtime top up",          # 'air' (Travel) is a prefix of 'airtime' (Utilities)
+    "Hotel booking",           # 'hotel' is both Housing and Travel
+    "Sportpesa bet",           # 'sportpesa' (Entertainment) contains 'port'
+    "Great deal at the mall",  # 'eat' inside 'great' is Food
+    "Bookshop",                # 'book' (Education) ranks above 'shop' (Shopping)
+    "WIFI BILL",
+    "",
+]
+
+@pytest.mark.parametrize('use_automaton', [False, True])
+def test_keyword_matcher_keeps_category_priority(use_automaton):
+    """Test that the compiled matcher picks the first matching category in order"""
+    if use_automaton:
+        pytest.importorskip('ahocorasick')
+    matcher = KeywordMatcher(CATEGORY_KEYWORDS, use_automaton=use_automaton)
+    
+    for description in OVERLAPPING_DESCRIPTIONS:
+        expected = _categorize_sequentially(description)
+        assert (matcher.match(description.lower()) or 'Other') == expected, description
+    assert categorize_transaction("Uber Eats order") == "Food"
+    assert categorize_transaction("Airtime top up") == "Utilities"
+
+def test_keyword_matcher_no_keywords():
+    """Test that a matcher without keywords matches nothing"""
+    assert KeywordMatcher([('Food', [])], use_automaton=False).match("lunch") is None
+
+def test_categorize_series_matches_scalar():
+    """Test that a column is categorized exactly like row by row"""
+    descriptions = OVERLAPPING_DESCRIPTIONS + ["Lunch at Restaurant", "Uber Eats order", "Random transaction"]
+    series = pd.Series(descriptions, index=range(10, 10 + len(descriptions)))
+    
+    categories = categorize_series(series)
+    
+    assert categories.index.equals(series.index)
+    assert categories.tolist() == [categorize_transaction(description) for description in descriptions]
+
+def test_categorize_series_missing_descriptions():
+    """Test that missing descriptions are categorized as 'Other'"""
+    categories = categorize_series(pd.Series(["Uber ride", None, float('nan')]))
+    assert categories.tolist() == ["Transport", "Other", "Other"]
+    assert categorize_series(pd.Series([], dtype=object)).tolist() == []
+
+def test_categorize_descriptions():
+    """Test the list variant of batch categorization"""
+    assert categorize_descriptions(["Doctor visit", "Flight ticket", "Doctor visit"]) == ["Health", "Travel", "Health"]
+    assert categorize_descriptions([]) == []
+
 def test_format_currency():
     """Test currency formatting"""
     assert format_currency(1000) == "KSh 1,000.00"
     assert format_currency(1000.5) == "KSh 1,000.50"
     assert format_currency(1234567.89) == "KSh 1,234,567.89"
     assert format_currency(0) == "KSh 0.00"
-    assert format_currency(0.5) == "KSh 0.50"
\ No newline at end of file
+    assert format_currency(0.5) == "KSh 0.50"
+
+
+def test_categorize_with_user_rules(temp_data_dir, monkeypatch):
+    """Test that categorization applies the rules of the given user"""
+    import utils
+    from category_rules import CategoryRules
+    
+    path = os.path.join(temp_data_dir, 'rules.yaml')
+    with open(path, 'w') as f:
+        f.write("rules:\n  - {category: Transport, keywords: [uber]}\nusers:\n  jane:\n    - {category: Business, keywords: [uber]}\n")
+    monkeypatch.setattr(utils, 'category_rules', CategoryRules(path, check_interval=0))
+    
+    assert categorize_transaction("Uber ride", username='jane') == "Business"
+    assert categorize_transaction("Uber ride") == "Transport"
+    assert categorize_descriptions(["Uber ride", "Lunch"], username='jane') == ["Business", "Other"]
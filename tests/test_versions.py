@@ -0,0 +1,165 @@
+import threading
+import time
+import pytest
+from datetime import date
+from data_manager import DataManager
+from transaction_cache import transaction_cache
+
+def _transaction(day, description='Taxi', amount=200.0):
+    """Build an expense transaction"""
+    return {'date': date(2025, 4, day), 'description': description, 'amount': amount,
+            'type': 'expense', 'category': 'Transport'}
+
+def test_writes_bump_version(data_manager):
+    """Test that each committed write bumps the version once and reads do not"""
+    version = data_manager.current_version()
+    data_manager.get_transactions()
+    assert data_manager.current_version() == version
+    
+    data_manager.add_transactions([_transaction(9), _transaction(10)])
+    assert data_manager.current_version() == version + 1
+    
+    df = data_manager.get_transactions()
+    data_manager.update_transaction_category(df.iloc[0]['transaction_id'], 'Shopping')
+    data_manager.delete_transaction(df.iloc[1]['transaction_id'])
+    assert data_manager.current_version() == version + 3
+    
+    # A batch with nothing to store does not write
+    data_manager.add_transactions([_transaction(9)])
+    assert data_manager.current_version() == version + 3
+
+def test_versions_are_shared_between_managers(data_manager):
+    """Test that another manager of the same store sees the same versions"""
+    other = DataManager(username='testuser', data_dir=data_manager.data_dir)
+    data_manager.add_transaction(_transaction(9))
+    
+    assert other.current_version() == data_manager.current_version()
+
+def test_read_as_of_version(data_manager):
+    """Test that a pinned version keeps its rows after newer writes"""
+    transaction_cache.clear()
+    version = data_manager.current_version()
+    assert len(data_manager.get_transactions(as_of_version=version)) == 3
+    
+    data_manager.add_transaction(_transaction(9))
+    data_manager.delete_transaction(data_manager.get_transactions().iloc[0]['transaction_id'])
+    
+    pinned = data_manager.get_transactions(as_of_version=version)
+    assert len(pinned) == 3
+    assert pinned.iloc[0]['description'] == 'Grocery shopping'
+    assert len(data_manager.get_transactions()) == 3
+    assert data_manager.get_transactions().iloc[0]['description'] == 'Salary deposit'
+
+def test_pinned_version_is_shared_between_processes(data_manager):
+    """Test that a pinned version stays readable once this process's cache forgot it"""
+    pytest.importorskip('pyarrow')
+    from arrow_snapshot import ArrowSnapshots
+    
+    version = data_manager.current_version()
+    data_manager.add_transaction(_transaction(9))
+    
+    # A new process has neither mapped frames nor cached frames
+    transaction_cache.clear()
+    ArrowSnapshots._mapped.clear()
+    other = DataManager(username='testuser', data_dir=data_manager.data_dir)
+    pinned = other.get_transactions(as_of_version=version)
+    
+    assert len(pinned) == 3
+    assert pinned.iloc[0]['description'] == 'Grocery shopping'
+    assert len(other.get_transactions()) == 4
+
+def test_unretained_version_raises(data_manager):
+    """Test that reading a version that is no longer retained fails loudly"""
+    version = data_manager.current_version()
+    for day in range(transaction_cache.max_versions):
+        data_manager.add_transaction(_transaction(9 + day))
+        data_manager.current_version()
+    transaction_cache.clear()
+    
+    with pytest.raises(ValueError):
+        data_manager.get_transactions(as_of_version=version)
+
+def test_external_write_is_a_new_version(data_manager):
+    """Test that a change made outside DataManager gets its own version"""
+    version = data_manager.current_version()
+    with open(data_manager.file_path, 'a') as f:
+        f.write('2025-04-09,Written elsewhere,50.0,expense,Other,,testuser\n')
+    
+    assert data_manager.current_version() == version + 1
+    assert len(data_manager.get_transactions()) == 4
+
+def test_reads_never_see_half_applied_batch(data_manager, monkeypatch):
+    """Test that reads during a slow multi-row write see all or none of it"""
+    storage = data_manager.storage
+    append = storage.append
+    
+    def slow_append(rows):
+        # Store the batch one row at a time, as an interrupted writer might
+        for row in rows:
+            append([row])
+            time.sleep(0.02)
+        return len(rows)
+    
+    monkeypatch.setattr(storage, 'append', slow_append)
+    batch = [_transaction(10 + i, description=f'Row {i}') for i in range(5)]
+    writer = threading.Thread(target=data_manager.add_transactions, args=(batch,))
+    
+    reader = DataManager(username='testuser', data_dir=data_manager.data_dir)
+    seen = set()
+    writer.start()
+    while writer.is_alive():
+        seen.add(len(reader.get_transactions()))
+        seen.add(len(reader.query(columns=['amount'])))
+    writer.join()
+    
+    seen.add(len(reader.get_transactions()))
+    assert seen <= {3, 8}
+    assert 8 in seen
+
+def test_reads_do_not_wait_for_writers(data_manager):
+    """Test that a read during a write gets the last committed version without waiting"""
+    committed = data_manager.get_transactions()
+    writing = threading.Event()
+    done = threading.Event()
+    
+    def write():
+        with data_manager.versions.committing():
+            data_manager.storage.append([{**_transaction(9), 'user_id': 'testuser'}])
+            writing.set()
+            done.wait(5)
+    
+    writer = threading.Thread(target=write)
+    writer.start()
+    writing.wait(5)
+    try:
+        reader = DataManager(username='testuser', data_dir=data_manager.data_dir)
+        started = time.monotonic()
+        df = reader.get_transactions()
+        assert time.monotonic() - started < 1
+        assert df.equals(committed)
+        assert reader.current_version() == data_manager.versions._last()[0]
+    finally:
+        done.set()
+        writer.join()
+    
+    assert len(reader.get_transactions()) == 4
+
+def test_read_racing_writes_takes_the_lock_once(data_manager, monkeypatch):
+    """Test that a read that keeps racing writes stops retrying and reads under the lock"""
+    import data_manager as data_manager_module
+    from file_lock import _lock_state
+    monkeypatch.setattr(data_manager_module, 'READ_RETRY_ATTEMPTS', 2)
+    monkeypatch.setattr(data_manager_module, 'READ_RETRY_SECONDS', 0)
+    transaction_cache.clear()
+    
+    read_version = data_manager._read_version
+    attempts = []
+    
+    def racing_read(identity, as_of_version=None):
+        # Every read outside the lock finds that a write landed meanwhile
+        attempts.append(_lock_state(data_manager.versions.lock.path)['depth'])
+        return read_version(identity, as_of_version) if attempts[-1] else None
+    
+    monkeypatch.setattr(data_manager, '_read_version', racing_read)
+    assert len(data_manager.get_transactions()) == 3
+    assert attempts == [0] * (data_manager_module.OPTIMISTIC_READ_ATTEMPTS + 2) + [1]
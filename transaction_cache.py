@@ -0,0 +1,166 @@
+"""
+Process-wide cache of parsed transaction DataFrames
+
+Streamlit reruns create a new DataManager on every interaction, so without a
+cache every rerun parses the user's whole transaction history again. This
+module keeps the parsed, date-typed DataFrame of each store in memory keyed
+by the store's version (see versions.py), so a changed store is always read
+again, and the last few versions of a store stay available (EROPIA_CACHE_VERSIONS,
+default 4) for readers pinned to one of them.
+
+Entries are evicted least-recently-used first once the total memory of the
+cached frames goes over the budget (EROPIA_CACHE_MAX_BYTES, default 256 MB).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+# Environment variable holding the memory budget of the cache in bytes
+CACHE_MAX_BYTES_ENV = "EROPIA_CACHE_MAX_BYTES"
+
+# Default memory budget of the cache
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Environment variable holding the number of versions cached per store
+CACHE_VERSIONS_ENV = "EROPIA_CACHE_VERSIONS"
+
+# Default number of versions cached per store
+DEFAULT_CACHE_VERSIONS = 4
+
+class TransactionCache:
+    """LRU cache of DataFrames keyed by store identity and signature
+    
+    Each store keeps its frames for the last few signatures it was read at
+    (DataManager uses version numbers as signatures), so a reader pinned to
+    a recent version can still get it after newer versions were cached.
+    """
+    
+    def __init__(self, max_bytes=DEFAULT_CACHE_MAX_BYTES, max_versions=1):
+        """Initialize an empty cache
+        
+        Args:
+            max_bytes (int): Memory budget for all cached frames together
+            max_versions (int): Number of signatures kept per store
+        """
+        self.max_bytes = max_bytes
+        self.max_versions = max_versions
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, identity, signature):
+        """Get a copy of the cached frame for a store
+        
+        Args:
+            identity (tuple): Identifies the store (backend, location, user)
+            signature: Signature (or version) of the store to get
+        
+        Returns:
+            DataFrame: A copy of the cached frame, or None on a miss
+        """
+        key = (identity, signature)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            df = entry[0]
+        
+        # Callers are free to modify what they get back
+        return df.copy()
+    
+    def put(self, identity, signature, df):
+        """Store the frame read for a store at a given signature
+        
+        Args:
+            identity (tuple): Identifies the store (backend, location, user)
+            signature: Signature (or version) of the store the frame was read at
+            df (DataFrame): Parsed transactions
+        """
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        
+        key = (identity, signature)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (df.copy(), size)
+            self._total_bytes += size
+            
+            # Keep only the most recent signatures of the store
+            versions = self._versions.setdefault(identity, [])
+            versions.append(signature)
+            while len(versions) > self.max_versions:
+                self._discard((identity, versions[0]))
+            
+            # Evict least recently used stores until we are within budget
+            while self._total_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+    
+    def invalidate(self, identity):
+        """Drop the cached frames of a store
+        
+        Args:
+            identity (tuple): Identifies the store (backend, location, user)
+        """
+        with self._lock:
+            for signature in list(self._versions.get(identity, [])):
+                self._discard((identity, signature))
+    
+    def clear(self):
+        """Drop all cached frames and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+    
+    def stats(self):
+        """Get the cache counters
+        
+        Returns:
+            dict: Hits, misses, evictions, number of entries and bytes in use
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+            }
+    
+    def _discard(self, key):
+        """Remove an entry; the caller holds the lock
+        
+        Args:
+            key (tuple): Store identity and signature
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry[1]
+        
+        identity, signature = key
+        versions = self._versions.get(identity)
+        if versions and signature in versions:
+            versions.remove(signature)
+            if not versions:
+                del self._versions[identity]
+
+# Cache shared by every DataManager in the process
+transaction_cache = TransactionCache(
+    max_bytes=int(os.getenv(CACHE_MAX_BYTES_ENV, DEFAULT_CACHE_MAX_BYTES)),
+    max_versions=int(os.getenv(CACHE_VERSIONS_ENV, DEFAULT_CACHE_VERSIONS))
+)
@@ -1,84 +1,73 @@
+import io
 import re
+from datetime import date
+import numpy as np
+import pandas as pd
+from category_rules import CATEGORY_KEYWORDS, KeywordMatcher, category_rules
 
-def categorize_transaction(description):
+# One M-Pesa statement transaction: date description amount transaction_type
+MPESA_STATEMENT_PATTERN = re.compile(r'(\d{2}/\d{2}/\d{4})\s+(MPESA[\w\s]+)\s+([\d,\.]+)\s+(debit|credit)')
+
+# Transactions per bulk insert when importing a statement
+STATEMENT_BATCH_SIZE = 5000
+
+def categorize_transaction(description, username=None, memo=None):
     """Automatically categorize a transaction based on its description
     
     Args:
         description (str): Transaction description
+        username (str): Also apply this user's rules (see category_rules.py)
+        memo (MerchantMemo): Memo of categories and the user's merchant
+            corrections to consult first (see merchant_memo.py)
         
     Returns:
         str: Assigned category
     """
-    description = description.lower()
+    matcher = category_rules.matcher(username)
+    if memo is not None:
+        return memo.categorize(description, matcher, username)
+    # Default to 'Other' if no match
+    return matcher.match(description.lower()) or 'Other'
+
+def categorize_series(descriptions, username=None, memo=None):
+    """Categorize a whole column of descriptions at once
     
-    # Food and Dining
-    if any(keyword in description for keyword in [
-        'restaurant', 'cafe', 'food', 'grocery', 'supermarket', 'naivas', 'carrefour', 
-        'quickmart', 'dinner', 'lunch', 'breakfast', 'eat', 'meal', 'coffee', 'java', 
-        'kfc', 'mcdonalds', 'jumia food', 'uber eats', 'bolt food', 'glovo'
-    ]):
-        return 'Food'
-        
-    # Transport
-    if any(keyword in description for keyword in [
-        'uber', 'bolt', 'little', 'taxi', 'matatu', 'bus', 'fare', 'transport', 'fuel',
-        'petrol', 'diesel', 'car', 'vehicle', 'parking', 'ride', 'travel', 'transport'
-    ]):
-        return 'Transport'
-        
-    # Housing & Utilities
-    if any(keyword in description for keyword in [
-        'rent', 'house', 'apartment', 'water', 'electricity', 'power', 'kplc',
-        'gas', 'housing', 'mortgage', 'accommodation', 'airbnb', 'hotel'
-    ]):
-        return 'Housing'
+    Each distinct description is lowercased and matched once and the result
+    is broadcast back to every row, giving the same categories as calling
+    categorize_transaction row by row. Missing descriptions are 'Other'.
     
-    # Bills & Utilities
-    if any(keyword in description for keyword in [
-        'bill', 'utility', 'internet', 'wifi', 'airtime', 'safaricom', 'telkom', 'airtel',
-        'phone', 'data', 'subscription', 'dstv', 'netflix', 'spotify', 'showmax', 'bundle', 
-        'wifi bill'
-    ]):
-        return 'Utilities'
-        
-    # Entertainment
-    if any(keyword in description for keyword in [
-        'cinema', 'movie', 'concert', 'event', 'game', 'betting', 'sportpesa',
-        'betika', 'entertainment', 'party', 'club', 'bar', 'alcohol', 'beer', 'fun',
-        'leisure', 'recreation'
-    ]):
-        return 'Entertainment'
-        
-    # Health
-    if any(keyword in description for keyword in [
-        'hospital', 'doctor', 'medical', 'health', 'pharmacy', 'medicine', 'clinic',
-        'dental', 'healthcare', 'insurance', 'nhif'
-    ]):
-        return 'Health'
-        
-    # Education
-    if any(keyword in description for keyword in [
-        'school', 'college', 'university', 'tuition', 'fee', 'education', 'course',
-        'class', 'training', 'book', 'learning', 'student'
-    ]):
-        return 'Education'
-        
-    # Shopping
-    if any(keyword in description for keyword in [
-        'shop', 'mall', 'store', 'purchase', 'buy', 'jumia', 'amazon', 'clothes',
-        'shopping', 'item', 'product', 'electronic', 'gadget', 'furniture'
-    ]):
-        return 'Shopping'
+    Args:
+        descriptions (Series): Transaction descriptions
+        username (str): Also apply this user's rules (see category_rules.py)
+        memo (MerchantMemo): Memo of categories and the user's merchant
+            corrections to consult first (see merchant_memo.py)
         
-    # Travel
-    if any(keyword in description for keyword in [
-        'flight', 'air', 'train', 'sgr', 'vacation', 'holiday', 'tour', 'travel',
-        'trip', 'hotel', 'accommodation', 'booking', 'ticket', 'transport', 'lodge'
-    ]):
-        return 'Travel'
+    Returns:
+        Series: Assigned categories, with the same index as descriptions
+    """
+    matcher = category_rules.matcher(username)
+    codes, uniques = pd.factorize(descriptions)
+    if memo is not None:
+        categories = [memo.categorize(str(description), matcher, username) for description in uniques]
+    else:
+        categories = [matcher.match(str(description).lower()) or 'Other' for description in uniques]
+    # factorize codes missing values as -1, which picks the trailing 'Other'
+    categories.append('Other')
+    return pd.Series(np.array(categories, dtype=object)[codes], index=descriptions.index, name='category')
+
+def categorize_descriptions(descriptions, username=None, memo=None):
+    """Categorize a list of descriptions at once (see categorize_series)
     
-    # Default to 'Other' if no match
-    return 'Other'
+    Args:
+        descriptions (iterable): Transaction descriptions
+        username (str): Also apply this user's rules (see category_rules.py)
+        memo (MerchantMemo): Memo of categories and the user's merchant
+            corrections to consult first (see merchant_memo.py)
+        
+    Returns:
+        list: Assigned categories, in the same order
+    """
+    return categorize_series(pd.Series(list(descriptions), dtype=object), username, memo).tolist()
 
 def format_currency(amount):
     """Format a number as Kenyan Shillings currency
@@ -91,54 +80,75 @@ def format_currency(amount):
     """
     return f"KSh {amount:,.2f}"
 
-def parse_mpesa_statement(statement_text):
+def iter_mpesa_statement(source):
+    """Parse an M-Pesa statement incrementally, one line at a time
+    
+    Each line is matched against a precompiled pattern and its transactions
+    are yielded as soon as they are read, so memory does not grow with the
+    size of the statement. Transactions are not categorized here; callers
+    categorize them in batches (see parse_mpesa_statement and
+    DataManager.import_mpesa_statement).
+    
+    Args:
+        source: Statement text, a file object (text or binary) or any
+            iterable of lines
+        
+    Yields:
+        dict: Transaction with date, description, amount, type and source
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+    
+    for line_number, line in enumerate(source, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        
+        for match in MPESA_STATEMENT_PATTERN.finditer(line):
+            date_str, description, amount_str, transaction_type = match.groups()
+            
+            # Slicing the fixed dd/mm/yyyy layout is much cheaper than strptime
+            try:
+                transaction_date = date(int(date_str[6:]), int(date_str[3:5]), int(date_str[:2]))
+                # Parse amount - remove commas for proper float conversion
+                amount = float(amount_str.replace(',', ''))
+            except ValueError as e:
+                print(f"Skipped statement line {line_number}: {e}")
+                continue
+            
+            yield {
+                'date': transaction_date,
+                'description': description.strip(),
+                'amount': amount,
+                # Credits are income, debits are expenses
+                'type': 'income' if transaction_type == 'credit' else 'expense',
+                'source': 'mpesa'
+            }
+
+def parse_mpesa_statement(statement_text, username=None):
     """Parse M-Pesa statement text into structured transaction data
     
+    The format (full statement export, confirmation SMS or the simple
+    layout) is detected from the text (see statement_parsers.py).
+    
     Args:
         statement_text (str): Raw M-Pesa statement text
+        username (str): Also apply this user's categorization rules
         
     Returns:
         list: List of transaction dictionaries
     """
-    from datetime import datetime
-    
-    transactions = []
+    # statement_parsers builds on this module
+    from statement_parsers import iter_statement
     
     # Skip processing if empty text
     if not statement_text or statement_text.strip() == "":
-        return transactions
+        return []
     
-    # Regular expression to match M-Pesa transaction patterns
-    # Format: date description amount transaction_type
-    pattern = r'(\d{2}/\d{2}/\d{4})\s+(MPESA[\w\s]+)\s+([\d,\.]+)\s+(debit|credit)'
+    transactions = list(iter_statement(statement_text))
     
-    matches = re.finditer(pattern, statement_text)
-    
-    for match in matches:
-        date_str, description, amount_str, transaction_type = match.groups()
-        
-        # Parse date
-        date = datetime.strptime(date_str, '%d/%m/%Y').date()
-        
-        # Parse amount - remove commas for proper float conversion
-        amount = float(amount_str.replace(',', ''))
-        
-        # Determine transaction type (income/expense)
-        if transaction_type.lower() == 'credit':
-            type_category = 'income'
-        else:
-            type_category = 'expense'
-            
-        # Categorize the transaction
-        category = categorize_transaction(description)
-        
-        transactions.append({
-            'date': date,
-            'description': description.strip(),
-            'amount': amount,
-            'type': type_category,
-            'category': category,
-            'source': 'mpesa'
-        })
+    # Categorize all transactions in one batch
+    categories = categorize_descriptions((transaction['description'] for transaction in transactions), username)
+    for transaction, category in zip(transactions, categories):
+        transaction['category'] = category
     
     return transactions
@@ -0,0 +1,145 @@
+"""
+Monotonic version numbers for a user's transaction store
+
+Every committed write made through DataManager appends a record with the
+next version number and the storage signature after the write to
+`data/versions/<username>.log`. Reads look up the version matching the
+store's current signature, so frames can be cached and pinned by a plain
+integer: `DataManager.get_transactions(as_of_version=n)` returns the rows of
+a version pinned with `DataManager.current_version()` from any process,
+whatever was written since.
+
+The record of a write is only appended once the write is complete. Readers
+never wait for writers: while a writer holds the lock, a reader that finds
+the store ahead of the last record is handed the last recorded version, the
+last committed one. If nobody holds the lock, the store was changed outside
+DataManager and the change is recorded as a new version.
+"""
+
+import os
+import json
+from contextlib import contextmanager
+from file_lock import FileLock, atomic_write
+
+# Size of the version log that triggers rewriting it down to the last record
+VERSION_LOG_COMPACT_BYTES = 1024 * 1024
+
+class VersionLog:
+    """Log of the versions of a user's transaction store"""
+    
+    def __init__(self, storage, username=None, data_dir="data"):
+        """Initialize the version log of a user's store
+        
+        Args:
+            storage (StorageBackend): The user's transaction store
+            username (str): Username (if None, the shared store is used)
+            data_dir (str): Base directory for data storage
+        """
+        self.storage = storage
+        self.path = os.path.join(data_dir, "versions", f"{username or '_shared'}.log")
+        self.lock = FileLock(self.path + '.lock')
+    
+    @contextmanager
+    def committing(self):
+        """Record the version created by a write
+        
+        Readers keep getting the last recorded version until the block
+        finishes, so they never take a half-applied write for a version. The new version is recorded even
+        if the write fails halfway, since the store changed all the same.
+        """
+        with self.lock:
+            try:
+                yield
+            finally:
+                version, recorded = self._last()
+                source = self.source()
+                if source != recorded:
+                    self._append(version + 1, source)
+    
+    def current(self):
+        """Get the last committed version of the store, without blocking
+        
+        Returns:
+            tuple: (version number, source) where source identifies the
+                store and its signature at that version; while a write is in
+                progress, the store no longer matches that source
+        """
+        source = self.source()
+        version, recorded = self._last()
+        if source == recorded:
+            return version, source
+        
+        # A writer holding the lock records its own version once it is done
+        if not self.lock.acquire(blocking=False):
+            return version, recorded
+        
+        # Nobody is writing, so the store was changed elsewhere
+        try:
+            source = self.source()
+            version, recorded = self._last()
+            if source != recorded:
+                version += 1
+                self._append(version, source)
+        finally:
+            self.lock.release()
+        return version, source
+    
+    def source(self):
+        """Identify the store and its current signature
+        
+        Returns:
+            list: Storage identity and signature, as stored in JSON
+        """
+        return self.storage.source()
+    
+    def _last(self):
+        """Read the last record of the log
+        
+        Returns:
+            tuple: (version number, source), or (0, None) if there is no log
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                end = f.seek(0, os.SEEK_END)
+                f.seek(max(0, end - 64 * 1024))
+                data = f.read()
+        except FileNotFoundError:
+            return 0, None
+        
+        for line in reversed(data.splitlines()):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Torn record from an interrupted write
+                continue
+            return record['version'], record['source']
+        return 0, None
+    
+    def _append(self, version, source):
+        """Append a version record, compacting the log when it is large
+        
+        Args:
+            version (int): New version number
+            source (list): Storage identity and signature at that version
+        """
+        line = (json.dumps({'version': version, 'source': source}) + '\n').encode('utf-8')
+        
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            size = 0
+        
+        if size + len(line) <= VERSION_LOG_COMPACT_BYTES:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a+b', buffering=0) as f:
+                if size:
+                    # Never glue a record to the torn tail of an interrupted write
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        line = b'\n' + line
+                f.write(line)
+            return
+        
+        # Only the last record is ever read, so it is all the log needs to keep
+        with atomic_write(self.path, 'wb') as f:
+            f.write(line)
@@ -26,10 +26,7 @@ def plot_transaction_overview(df):
     chart_df = df.copy()
     
     # Add sign to amount based on transaction type
-    chart_df['signed_amount'] = chart_df.apply(
-        lambda row: row['amount'] if row['type'] == 'income' else -row['amount'], 
-        axis=1
-    )
+    chart_df['signed_amount'] = chart_df['amount'].where(chart_df['type'] == 'income', -chart_df['amount'])
     
     # Group by date and calculate daily totals
     daily_totals = chart_df.groupby('date')['signed_amount'].sum().reset_index()
@@ -106,7 +103,7 @@ def plot_spending_by_category(df):
     expenses_df = df[df['type'] == 'expense']
     
     # Group by category and sum
-    category_totals = expenses_df.groupby('category')['amount'].sum().reset_index()
+    category_totals = expenses_df.groupby('category', observed=True)['amount'].sum().reset_index()
     
     # Create pie chart
     fig = px.pie(
@@ -153,7 +150,7 @@ def plot_spending_trend(df):
     expenses_df['month'] = expenses_df['date'].dt.strftime('%Y-%m')
     
     # Group by month and category
-    monthly_by_category = expenses_df.groupby(['month', 'category'])['amount'].sum().reset_index()
+    monthly_by_category = expenses_df.groupby(['month', 'category'], observed=True)['amount'].sum().reset_index()
     
     # Create line chart
     fig = px.line(
@@ -202,7 +199,7 @@ def plot_income_vs_expense(df):
     chart_df['month'] = chart_df['date'].dt.strftime('%Y-%m')
     
     # Group by month and transaction type
-    monthly_totals = chart_df.groupby(['month', 'type'])['amount'].sum().reset_index()
+    monthly_totals = chart_df.groupby(['month', 'type'], observed=True)['amount'].sum().reset_index()
     
     # Filter to keep only income and expense
     monthly_totals = monthly_totals[monthly_totals['type'].isin(['income', 'expense'])]